@@ -0,0 +1,5 @@
+"""Optimizer benchmarks: seeded synthetic clubs (synthetic) and a per-phase
+timing harness (run).
+
+    python -m benchmarks.run --sizes 50,200,1000,5000
+"""
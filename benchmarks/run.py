@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Time each optimizer phase on synthetic clubs and write the results as JSON.
+
+The phases are the optimizer's own ``collectStats`` timings (parse,
+eligibility, standards, pre-assignments, relay swimmers, individual or
+joint allocation, relays, results and total, see RunStats) plus the JSON
+serialization of the result, timed here.  Each case runs ``--repeat`` times;
+the file keeps the min and median of every phase in milliseconds and the
+optimizer's work counters, keyed by the optimizer source digest so runs of
+different versions can be compared with ``--baseline``.
+
+    python -m benchmarks.run --sizes 50,200,1000,5000 --competitions arena_league,custom
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.synthetic import COMPETITIONS, generate_club
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server'))
+import optimizer  # noqa: E402
+
+DEFAULT_SIZES = (50, 200, 1000, 5000)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+REGRESSION_RATIO = 1.2  # --baseline flags phases at least this much slower...
+REGRESSION_MIN_MS = 1.0  # ...and by at least this much, so sub-millisecond noise is ignored
+
+def run_phases(document):
+    """One optimizer run with ``collectStats``; returns (timings in ms, counters)."""
+    document = dict(document, config=dict(document['config'], collectStats=True))
+    result = optimizer.optimize_document(document)
+    start = time.perf_counter()
+    json.dumps(result.to_dict())
+    timings = dict(result.stats['timings'], serialization=(time.perf_counter() - start) * 1000)
+    counters = dict(result.stats['counters'], individualResults=len(result.individual), relayTeams=len(result.relay))
+    return timings, counters
+
+def run_case(competition, size, seed, repeat):
+    document = generate_club(size, competition, seed)
+    samples = {}
+    for _ in range(repeat):
+        timings, counters = run_phases(document)
+        for phase, ms in timings.items():
+            samples.setdefault(phase, []).append(ms)
+    return {
+        'competition': competition,
+        'swimmers': size,
+        'counters': counters,
+        'timings': {phase: {'min': round(min(values), 3), 'median': round(statistics.median(values), 3)}
+                    for phase, values in samples.items()},
+    }
+
+def compare(results, baseline):
+    """Lines for every phase whose median is REGRESSION_RATIO times the baseline's or worse."""
+    previous = {(case['competition'], case['swimmers']): case for case in baseline['results']}
+    lines = []
+    for case in results['results']:
+        old = previous.get((case['competition'], case['swimmers']))
+        if old is None:
+            continue
+        for phase, timing in case['timings'].items():
+            before = old['timings'].get(phase, {}).get('median')
+            if before and timing['median'] >= max(before * REGRESSION_RATIO, before + REGRESSION_MIN_MS):
+                lines.append(f"{case['competition']} {case['swimmers']} {phase}: "
+                             f"{before:.1f} -> {timing['median']:.1f} ms ({timing['median'] / before:.2f}x)")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time optimizer phases on synthetic clubs.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma-separated swimmer counts')
+    parser.add_argument('--competitions', default=','.join(COMPETITIONS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<optimizer digest>.json)')
+    parser.add_argument('--baseline', help='earlier results file to flag regressions against')
+    args = parser.parse_args(argv)
+
+    optimizer.log.configure('off')
+    digest = optimizer.optimizer_source_digest()[:12]
+    results = {
+        'optimizer': digest,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': [],
+    }
+    for competition in args.competitions.split(','):
+        for size in (int(size) for size in args.sizes.split(',')):
+            case = run_case(competition, size, args.seed, args.repeat)
+            results['results'].append(case)
+            print(f"{competition:>14} {size:>5}  " + '  '.join(
+                f"{phase} {timing['median']:.1f}" for phase, timing in case['timings'].items()), flush=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{digest}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Wrote {output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Seeded synthetic clubs in the optimizer's input formats.
+
+generate_club() returns an input document (the JSON read by
+``optimizer.py --stdin``) for a club of any size; write_club() writes the
+same data as the files ``optimizer.py`` reads from its working directory.
+The same (swimmers, competition, seed) always gives the same club.
+
+    python -m benchmarks.synthetic --swimmers 500 --competition arena_league --out /tmp/club
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+
+COMPETITIONS = ('arena_league', 'county_relays', 'custom')
+
+STROKES = ('Freestyle', 'Backstroke', 'Breaststroke', 'Butterfly')
+INDIVIDUAL_EVENTS = [f'{distance}m {stroke}' for distance in (50, 100, 200) for stroke in STROKES]
+INDIVIDUAL_EVENTS += ['100m Individual Medley', '200m Individual Medley']
+
+# Open male short-course qualifying time per event, in seconds
+FIFTY_TIMES = {'Freestyle': 26.0, 'Backstroke': 30.0, 'Breaststroke': 33.0, 'Butterfly': 28.0}
+BASE_TIMES = {f'{distance}m {stroke}': seconds * factor
+              for distance, factor in ((50, 1.0), (100, 2.2), (200, 4.7)) for stroke, seconds in FIFTY_TIMES.items()}
+BASE_TIMES['100m Individual Medley'] = 63.0
+BASE_TIMES['200m Individual Medley'] = 137.0
+
+STANDARD_AGES = range(11, 18)  # the county file's age categories; Open uses 17
+FEMALE_FACTOR = 1.1
+LC_FACTOR = 1.03
+CT_FACTOR = 1.04  # consideration times are slower than qualifying times
+
+# Mirrors ARENA_LEAGUE_CONFIG and COUNTY_RELAYS_CONFIG in shared/constants.ts
+ARENA_LEAGUE_EVENTS = (
+    [[f'50m {stroke}', 11, gender] for stroke in STROKES for gender in ('Male', 'Female')]
+    + [[f'100m {stroke}', age, gender] for age in (13, 15, 99) for stroke in STROKES for gender in ('Male', 'Female')]
+    + [['200m Individual Medley', 99, gender] for gender in ('Male', 'Female')]
+    + [[f'4x50m {kind}', age, gender] for age in (11, 13, 15, 99) for kind in ('Freestyle', 'Medley')
+       for gender in ('Male', 'Female')]
+    + [['Squadrun', 998, 'Mixed']]
+)
+COUNTY_RELAYS_EVENTS = (
+    [['4 x 50m Freestyle', age, gender] for age in (12, 14, 16) for gender in ('Male', 'Female')]
+    + [[f'4 x {distance}m Freestyle', 99, gender] for distance in (100, 200) for gender in ('Male', 'Female')]
+    + [['4 x 50m Medley', age, gender] for age in (12, 14, 16) for gender in ('Male', 'Female')]
+    + [['4 x 100m Medley', 99, gender] for gender in ('Male', 'Female')]
+)
+CUSTOM_AGE_GROUPS = (10, 11, 12, 13, 14, 15, 16, 99)
+
+CONFIGS = {
+    'arena_league': {'maxIndividualEvents': 2, 'competitionType': 'arena_league'},
+    'county_relays': {'maxIndividualEvents': 0, 'competitionType': 'county_relays'},
+    'custom': {'maxIndividualEvents': 3, 'competitionType': 'custom'},
+}
+
+MEMBER_PBS_HEADER = ['First_Name', 'Last_Name', 'ASA_No', 'Date_of_Birth', 'Meet', 'Date', 'Event', 'SC_Time',
+                     'Course', 'Gender', 'AgeTime', 'County_QT', 'Count_CT', 'County_Qualify', 'time_in_seconds',
+                     'isAvailable']
+FIRST_NAMES = {
+    'Male': ('Oliver', 'George', 'Harry', 'Jack', 'Jacob', 'Noah', 'Charlie', 'Thomas', 'Oscar', 'William'),
+    'Female': ('Olivia', 'Amelia', 'Isla', 'Ava', 'Emily', 'Sophia', 'Grace', 'Mia', 'Poppy', 'Ella'),
+}
+
+def qualifying_time(event_name, age, gender, course='SC'):
+    """Synthetic county QT in seconds (ages outside 11-17 are clamped)."""
+    age = min(max(age, 11), 17)
+    seconds = BASE_TIMES[event_name] * (1 + 0.05 * (17 - age))
+    if gender == 'Female':
+        seconds *= FEMALE_FACTOR
+    if course == 'LC':
+        seconds *= LC_FACTOR
+    return seconds
+
+def format_time(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f'00:{int(minutes):02d}:{seconds:05.2f}'
+
+def county_times_csv():
+    """county_times_cleaned.csv text covering every individual event."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(['Event', 'Time', 'Age Category', 'Course', 'Time Type', 'Gender'])
+    for event_name in INDIVIDUAL_EVENTS:
+        for age in STANDARD_AGES:
+            for gender in ('Male', 'Female'):
+                for course in ('LC', 'SC'):
+                    qt = qualifying_time(event_name, age, gender, course)
+                    writer.writerow([event_name, format_time(qt * CT_FACTOR), age, course, 'CT', gender])
+                    writer.writerow([event_name, format_time(qt), age, course, 'QT', gender])
+    return out.getvalue()
+
+def event_list(competition, rng):
+    """[event_name, age, gender] rows for a competition; ``custom`` is drawn from ``rng``."""
+    if competition == 'arena_league':
+        return [list(event) for event in ARENA_LEAGUE_EVENTS]
+    if competition == 'county_relays':
+        return [list(event) for event in COUNTY_RELAYS_EVENTS]
+    ages = sorted(rng.sample(CUSTOM_AGE_GROUPS, 4))
+    events = []
+    for age in ages:
+        for event_name in sorted(rng.sample(INDIVIDUAL_EVENTS, 5), key=INDIVIDUAL_EVENTS.index):
+            events.extend([[event_name, age, 'Male'], [event_name, age, 'Female']])
+    for age in ages:
+        for kind in ('Freestyle', 'Medley'):
+            events.extend([[f'4x50m {kind}', age, 'Male'], [f'4x50m {kind}', age, 'Female']])
+    return events
+
+def member_pbs_csv(swimmer_count, rng, available=0.9):
+    """member_pbs.csv text for ``swimmer_count`` swimmers aged 8-18.
+
+    Each swimmer has 4-12 events (50m strokes most often, so relays fill), an
+    ability factor shared by their events and about 10% of events swum in
+    both courses.  ``available`` is the share marked available.
+    """
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(MEMBER_PBS_HEADER)
+    weights = [3 if event_name.startswith('50m') else 1 for event_name in INDIVIDUAL_EVENTS]
+    for number in range(swimmer_count):
+        gender = rng.choice(('Male', 'Female'))
+        age = rng.randint(8, 18)
+        ability = max(0.9, rng.gauss(1.15, 0.1))
+        is_available = 'true' if rng.random() < available else 'false'
+        first_name = rng.choice(FIRST_NAMES[gender])
+        last_name = f'Synthetic{number:05d}'
+        asa_number = str(100000 + number)
+        date_of_birth = f'{2024 - age}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        event_count = rng.randint(4, 12)
+        events = set()
+        while len(events) < event_count:
+            events.add(rng.choices(INDIVIDUAL_EVENTS, weights)[0])
+        for event_name in sorted(events, key=INDIVIDUAL_EVENTS.index):
+            courses = ['SC', 'LC'] if rng.random() < 0.1 else [rng.choice(('SC', 'SC', 'SC', 'LC'))]
+            for course in courses:
+                seconds = qualifying_time(event_name, age, gender, course) * ability * rng.uniform(0.97, 1.03)
+                writer.writerow([first_name, last_name, asa_number, date_of_birth, 'Synthetic Open', '2024-06-01',
+                                 event_name, format_time(seconds), course, gender, age, '', '', 'No',
+                                 f'{seconds:.2f}', is_available])
+    return out.getvalue()
+
+def generate_club(swimmer_count, competition='arena_league', seed=0):
+    """Input document for a synthetic club (see read_input_document)."""
+    if competition not in COMPETITIONS:
+        raise ValueError(f"Unknown competition '{competition}'")
+    rng = random.Random(f'{seed}:{competition}:{swimmer_count}')
+    return {
+        'memberPbs': member_pbs_csv(swimmer_count, rng),
+        'countyTimes': county_times_csv(),
+        'events': event_list(competition, rng),
+        'preAssignments': {'individual': [], 'relay': []},
+        'config': dict(CONFIGS[competition]),
+    }
+
+def write_club(directory, document):
+    """Write a document as the input files optimizer.py reads from its working directory."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'member_pbs.csv'), 'w', newline='') as f:
+        f.write(document['memberPbs'])
+    with open(os.path.join(directory, 'county_times_cleaned.csv'), 'w', newline='') as f:
+        f.write(document['countyTimes'])
+    for filename, key in (('event_list.json', 'events'), ('pre_assignments.json', 'preAssignments'),
+                          ('optimization_config.json', 'config')):
+        with open(os.path.join(directory, filename), 'w') as f:
+            json.dump(document[key], f, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a seeded synthetic club for optimizer.py.')
+    parser.add_argument('--swimmers', type=int, default=200)
+    parser.add_argument('--competition', choices=COMPETITIONS, default='arena_league')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True, help='directory for the input files')
+    args = parser.parse_args(argv)
+    write_club(args.out, generate_club(args.swimmers, args.competition, args.seed))
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,160 @@
 #!/usr/bin/env python3
+import os
 import sys
 import json
+import copy
+import cProfile
 import csv
-from dataclasses import dataclass
+import dataclasses
+import hashlib
+import heapq
 import itertools
+import re
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+try:
+    import numpy as np
+except ImportError:  # optional: only the "numpy" index backend needs it
+    np = None
+
+LOG_LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40, 'off': 100}
+
+class Logger:
+    """Leveled logger writing to stderr (routes.ts echoes it to the server console).
+
+    Messages are str.format templates, formatted only when their level is
+    enabled, so a disabled call costs a comparison.  ``json_lines`` writes
+    each record as one JSON object ({"level", "msg"}) per line.  ``sampled``
+    is for per-row diagnostics: at debug level it keeps the first and then
+    every ``sample_every``-th call of each template (0 keeps none).
+    """
+
+    def __init__(self, level='warning', json_lines=False, sample_every=100, stream=None):
+        self.configure(level, json_lines, sample_every, stream)
+
+    def configure(self, level='warning', json_lines=False, sample_every=100, stream=None):
+        self.threshold = LOG_LEVELS[level]
+        self.json_lines = json_lines
+        self.sample_every = sample_every
+        self.stream = stream
+        self.sample_counts = {}
+
+    def enabled(self, level):
+        return LOG_LEVELS[level] >= self.threshold
+
+    def _emit(self, level, message, args):
+        text = message.format(*args)
+        stream = self.stream or sys.stderr
+        if self.json_lines:
+            stream.write(json.dumps({'level': level, 'msg': text}) + '\n')
+        else:
+            stream.write(text + '\n')
+
+    def debug(self, message, *args):
+        if self.threshold <= 10:
+            self._emit('debug', message, args)
+
+    def info(self, message, *args):
+        if self.threshold <= 20:
+            self._emit('info', message, args)
+
+    def warning(self, message, *args):
+        if self.threshold <= 30:
+            self._emit('warning', message, args)
+
+    def error(self, message, *args):
+        if self.threshold <= 40:
+            self._emit('error', message, args)
+
+    def sampled(self, message, *args):
+        if self.threshold > 10 or not self.sample_every:
+            return
+        count = self.sample_counts.get(message, 0)
+        self.sample_counts[message] = count + 1
+        if count % self.sample_every == 0:
+            self._emit('debug', message, args)
+
+log = Logger()
+
+def configure_logging(argv, environ):
+    """Set up ``log`` from --log-level/--log-json/--log-sample, falling back to
+    OPTIMIZER_LOG_LEVEL, OPTIMIZER_LOG_FORMAT=json and OPTIMIZER_LOG_SAMPLE."""
+    level = environ.get('OPTIMIZER_LOG_LEVEL', 'warning')
+    json_lines = environ.get('OPTIMIZER_LOG_FORMAT') == 'json'
+    sample_every = environ.get('OPTIMIZER_LOG_SAMPLE', 100)
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == '--log-level' and args:
+            level = args.pop(0)
+        elif arg == '--log-json':
+            json_lines = True
+        elif arg == '--log-sample' and args:
+            sample_every = args.pop(0)
+    if level not in LOG_LEVELS:
+        level = 'warning'
+    try:
+        sample_every = int(sample_every)
+    except ValueError:
+        sample_every = 100
+    log.configure(level, json_lines, sample_every)
+
+class RunStats:
+    """Phase timings and work counters for one optimization (``collectStats``).
+
+    ``lap(phase)`` charges the time since the previous lap to ``phase``, so
+    the pipeline marks the end of each stage instead of wrapping it; the
+    clock is time.perf_counter, which is monotonic.  Counters are plain sums.
+    """
+
+    def __init__(self):
+        self.started = self.mark = perf_counter()
+        self.timings = {}
+        self.counters = {}
+
+    def lap(self, phase):
+        now = perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0) + (now - self.mark) * 1000
+        self.mark = now
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_dict(self):
+        timings = {phase: round(ms, 3) for phase, ms in self.timings.items()}
+        timings['total'] = round((perf_counter() - self.started) * 1000, 3)
+        return {'timings': timings, 'counters': dict(self.counters)}
+
+run_stats = None  # RunStats being collected, see collecting_stats()
+
+@contextmanager
+def collecting_stats(config, stats=None):
+    """Collect into ``run_stats`` for this block when ``config`` has
+    ``collectStats`` (or ``stats`` is given); nested blocks add to the outer
+    collection.  Yields the active RunStats or None."""
+    global run_stats
+    if run_stats is not None or (stats is None and not (config or {}).get('collectStats')):
+        yield run_stats
+        return
+    run_stats = stats or RunStats()
+    try:
+        yield run_stats
+    finally:
+        run_stats = None
+
+def stats_lap(phase):
+    if run_stats is not None:
+        run_stats.lap(phase)
+
+def stats_count(counter, amount=1):
+    if run_stats is not None:
+        run_stats.count(counter, amount)
 
 def convert_to_seconds_with_milliseconds(time_str):
     if not time_str or time_str.strip() == '':
@@ -31,41 +182,1865 @@ def convert_to_seconds_with_milliseconds(time_str):
         seconds = int(seconds_part)
         hundredths = 0
 
-    total = hours * 3600 + minutes * 60 + seconds + hundredths / 100
-    return round(total, 2)
+    total = hours * 3600 + minutes * 60 + seconds + hundredths / 100
+    return round(total, 2)
+
+@dataclass
+class SwimmerPB:
+    """One available swimmer's PB in one event (a member_pbs.csv row)."""
+    first_name: str
+    last_name: str
+    event: str
+    gender: str
+    age: int
+    time: float  # seconds
+    asa_number: str
+
+    def as_row(self):
+        # Row layout used by the allocation code (swimmer_list)
+        return [self.first_name, self.last_name, self.event, self.gender, self.age, self.time, self.asa_number]
+
+@dataclass
+class OptimizationResult:
+    """Output of optimize(); ``to_dict()`` is the JSON printed for routes.ts."""
+    individual: list = field(default_factory=list)
+    relay: list = field(default_factory=list)
+    error: str = None
+    cache_hit: bool = None  # None when no result cache is configured
+    alternatives: list = None  # next-best individual line-ups, when requested
+    stats: dict = None  # {"timings", "counters"} when collectStats is set
+    search: dict = None  # anytime search report, when timeLimitMs is set
+
+    def to_dict(self):
+        if self.error is None:
+            result = {'individual': self.individual, 'relay': self.relay}
+            if self.alternatives is not None:
+                result['alternatives'] = self.alternatives
+            if self.search is not None:
+                result['search'] = self.search
+            if self.cache_hit is not None:
+                result['cacheHit'] = self.cache_hit
+            if self.stats is not None:
+                # The client reads these summary fields from ``stats`` when present
+                result['stats'] = {
+                    'qualifyingTimes': sum(1 for entry in self.individual if entry['status'] == 'QT'),
+                    'averageIndex': (sum(entry['index'] or 0 for entry in self.individual) / len(self.individual)
+                                     if self.individual else 0),
+                    'relayTeams': len(self.relay),
+                    'totalEvents': len(self.individual) + len(self.relay),
+                    **self.stats
+                }
+            return result
+        return {
+            'individual': self.individual,
+            'relay': self.relay,
+            'stats': {
+                'qualifyingTimes': 0,
+                'averageIndex': 0,
+                'relayTeams': 0,
+                'totalEvents': 0,
+                **(self.stats or {})
+            },
+            'error': self.error
+        }
+
+# Relay PBs are stored per (stroke, distance) in a flat list, at
+# stroke_code * len(RELAY_DISTANCES) + distance_code
+RELAY_STROKES = ('Freestyle', 'Backstroke', 'Breaststroke', 'Butterfly')
+RELAY_DISTANCES = (50, 100, 200)
+STROKE_CODES = {stroke: code for code, stroke in enumerate(RELAY_STROKES)}
+DISTANCE_CODES = {distance: code for code, distance in enumerate(RELAY_DISTANCES)}
+
+def relay_time_slot(stroke, distance):
+    """Position of a (stroke, distance) PB in RelaySwimmer.times."""
+    return STROKE_CODES[stroke] * len(RELAY_DISTANCES) + DISTANCE_CODES[distance]
+
+class RelaySwimmer:
+    """A swimmer's relay PBs; ``times[relay_time_slot(stroke, distance)]`` is
+    the time in seconds, or None without a PB."""
+    __slots__ = ('name', 'age', 'gender', 'times')
+
+    def __init__(self, name, age, gender):
+        self.name = name
+        self.age = age
+        self.gender = gender
+        self.times = [None] * (len(RELAY_STROKES) * len(RELAY_DISTANCES))
+
+    def __repr__(self):
+        return f"RelaySwimmer(name={self.name!r}, age={self.age!r}, gender={self.gender!r}, times={self.times!r})"
+
+def extract_relay_distance(event_name):
+    """Extract the distance per leg from relay event name"""
+    # Look for patterns like "4 x 100m" or "4x100m"
+    match = re.search(r'(\d+)\s*x\s*(\d+)m', event_name)
+    if match:
+        return int(match.group(2))  # Return the distance (100, 200, etc.)
+    return 50  # Default to 50m if no distance found
+
+def build_county_standards(lines):
+    """County standards from county_times_cleaned.csv lines (header first),
+    keyed by (event, age_category, gender, course, time_type).
+
+    Each (event, age_category, gender, time_type) is also stored under course
+    None, holding the first row in the file; that is what swims of unknown
+    course are compared with.  Empty times count as missing.  The fallback
+    rules are compiled in as aliases: Open (99) uses age 17 and ages 10 and
+    under use age 11 wherever they have no standard of their own.
+    """
+    standards = {}
+    reader = csv.reader(lines)
+    next(reader)  # Skip header
+    for row in reader:
+        if len(row) < 6:
+            continue
+        seconds = convert_to_seconds_with_milliseconds(row[1])
+        if not seconds:
+            continue
+        event_name, age, course, time_type, gender = row[0], int(row[2]), row[3], row[4], row[5]
+        standards.setdefault((event_name, age, gender, course, time_type), seconds)
+        standards.setdefault((event_name, age, gender, None, time_type), seconds)
+
+    aliases = {}
+    for (event_name, age, gender, course, time_type), seconds in standards.items():
+        if age == 17:
+            aliases.setdefault((event_name, 99, gender, course, time_type), seconds)
+        elif age == 11:
+            for younger in range(11):
+                aliases.setdefault((event_name, younger, gender, course, time_type), seconds)
+    for key, seconds in aliases.items():
+        standards.setdefault(key, seconds)
+    return standards
+
+def county_standard(standards, event_name, age, gender, time_type='QT', course=None):
+    """Standard time in seconds, or None if the county sets none."""
+    return standards.get((event_name, age, gender, course, time_type))
+
+def qualifying_status(swimmer_time, qualifying_time, consideration_time):
+    """'QT' or 'CT' for a swim that meets that standard, else None."""
+    if qualifying_time is not None and swimmer_time <= qualifying_time:
+        return 'QT'
+    if consideration_time is not None and swimmer_time <= consideration_time:
+        return 'CT'
+    return None
+
+def build_swimmer_index(swimmer_list):
+    """Index PB rows by (event_name, gender), youngest swimmer first.
+
+    Maps each key to (ages, entries) where ``entries`` holds
+    (age, position, row) sorted by age and ``ages`` is the parallel list for
+    bisecting; ``position`` is the row's place in ``swimmer_list``.
+    """
+    swimmer_index = {}
+    for position, row in enumerate(swimmer_list):
+        swimmer_index.setdefault((row[2], row[3]), []).append((int(row[4]), position, row))
+    for key, entries in swimmer_index.items():
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        swimmer_index[key] = ([entry[0] for entry in entries], entries)
+    return swimmer_index
+
+def eligible_rows(swimmer_index, event_name, age, gender):
+    """PB rows for an event that swimmers aged ``age`` or under may swim, in file order."""
+    if (event_name, gender) not in swimmer_index:
+        return []
+    ages, entries = swimmer_index[(event_name, gender)]
+    matches = entries[:bisect_right(ages, age)]
+    return [row for _, _, row in sorted(matches, key=lambda entry: entry[1])]
+
+def score_entries(full_list, standards):
+    """Append [qualifying_time, diff, index] (or [None, NO_STANDARD_INDEX] when
+    the event has no QT) to each row and sort full_list by index, in place."""
+    # Append qualifying time to each entry
+    for row in full_list:
+        qualifying_time = county_standard(standards, row[0], row[1], row[2], 'QT')
+        if qualifying_time is not None:
+            row.append(qualifying_time)
+
+    # Calculate differences and indices
+    for row in full_list:
+        if len(row) > 7:  # Now we have 8 elements: event, age, gender, first_name, last_name, time, asa_no, qualifying_time
+            swimmer_time = float(row[5])  # swimmer time
+            qualifying_time = row[7]      # qualifying time (appended in previous loop)
+            diff = round(swimmer_time - qualifying_time, 2)
+            index = round(diff / qualifying_time, 3)
+            row.append(diff)
+            row.append(index)
+        else:
+            # This should rarely happen now since Open category uses age 17 baseline
+            row.append(None)  # diff
+            row.append(NO_STANDARD_INDEX)  # High index for entries without qualifying time
+
+    # Sort by index
+    full_list.sort(key=lambda x: (x[-1] is None, x[-1]))
+
+def round_columns(values, ndigits):
+    """np.round() that agrees with Python's round() on every element.
+
+    NumPy rounds the scaled value, so near-ties (common here: two-decimal
+    diffs over one-decimal QTs) can go the other way; those few elements are
+    rounded with round() itself.
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for position in np.flatnonzero(near_tie).tolist():
+        rounded[position] = round(float(values[position]), ndigits)
+    return rounded
+
+def score_entries_columnar(full_list, standards):
+    """score_entries() on NumPy columns: one QT lookup per event, then diffs,
+    indices and the (stable) sort order as whole-array operations.  Gives the
+    same rows in the same order."""
+    if not full_list:
+        return
+    qt_by_event = {}
+    for row in full_list:
+        key = (row[0], row[1], row[2])
+        if key not in qt_by_event:
+            qualifying_time = county_standard(standards, row[0], row[1], row[2], 'QT')
+            qt_by_event[key] = float('nan') if qualifying_time is None else qualifying_time
+    times = np.fromiter((row[5] for row in full_list), dtype=np.float64, count=len(full_list))
+    qts = np.fromiter((qt_by_event[(row[0], row[1], row[2])] for row in full_list), dtype=np.float64, count=len(full_list))
+    has_standard = ~np.isnan(qts)
+    diffs = round_columns(times - qts, 2)
+    indices = np.where(has_standard, round_columns(diffs / qts, 3), NO_STANDARD_INDEX)
+    order = np.argsort(indices, kind='stable')
+
+    scored = []
+    for position, standard, qt, diff, index in zip(order.tolist(), has_standard[order].tolist(), qts[order].tolist(), diffs[order].tolist(), indices[order].tolist()):
+        row = full_list[position]
+        if standard:
+            row.extend((qt, diff, index))
+        else:
+            row.extend((None, NO_STANDARD_INDEX))
+        scored.append(row)
+    full_list[:] = scored
+
+INDEX_BACKENDS = {
+    'python': score_entries,
+    'numpy': score_entries_columnar,
+}
+
+# RelaySwimmer.times slot holding each relay stroke's PB
+RELAY_TIME_SLOTS = {
+    f'{distance}m {stroke}': relay_time_slot(stroke, distance)
+    for stroke in RELAY_STROKES
+    for distance in RELAY_DISTANCES
+}
+
+def build_relay_swimmers(swimmer_index):
+    """RelaySwimmer per swimmer with any relay-stroke PB, in file order.
+
+    Reads only the relay-stroke keys of the index; when a swimmer has several
+    rows for a stroke (SC and LC) the last row in the file wins.
+    """
+    stroke_rows = []
+    for (event_name, gender), (_, entries) in swimmer_index.items():
+        time_slot = RELAY_TIME_SLOTS.get(event_name)
+        if time_slot is None:
+            continue
+        for _, position, row in entries:
+            try:
+                time = float(row[5])
+            except (TypeError, ValueError):
+                continue
+            stroke_rows.append((position, time_slot, time, row))
+
+    relay_swimmers = {}
+    for position, time_slot, time, row in sorted(stroke_rows, key=lambda item: item[0]):
+        name = f"{row[0]} {row[1]}"
+        if name not in relay_swimmers:
+            relay_swimmers[name] = RelaySwimmer(name=name, age=int(row[4]), gender=row[3])
+        relay_swimmers[name].times[time_slot] = time
+    return relay_swimmers
+
+class MinCostFlow:
+    """Min-cost flow solver using successive shortest paths (Dijkstra with potentials).
+
+    Edges are stored in parallel lists; edge ``e`` and its residual twin ``e ^ 1``
+    are always added together.  Costs must be non-negative integers.
+    """
+
+    def __init__(self, node_count):
+        self.node_count = node_count
+        self.graph = [[] for _ in range(node_count)]
+        self.to = []
+        self.cap = []
+        self.cost = []
+        self.potential = [0] * node_count
+
+    def add_edge(self, u, v, cap, cost):
+        edge_id = len(self.to)
+        self.to.extend((v, u))
+        self.cap.extend((cap, 0))
+        self.cost.extend((cost, -cost))
+        self.graph[u].append(edge_id)
+        self.graph[v].append(edge_id + 1)
+        return edge_id
+
+    def residual_copy(self):
+        """A copy with its own flow and potentials that shares the edge lists;
+        neither may have edges added afterwards."""
+        other = MinCostFlow(0)
+        other.node_count, other.graph, other.to, other.cost = self.node_count, self.graph, self.to, self.cost
+        other.cap = list(self.cap)
+        other.potential = list(self.potential)
+        return other
+
+    def flow_on(self, edge_id):
+        return self.cap[edge_id ^ 1]
+
+    def _shortest_path(self, root, sink):
+        """Dijkstra on reduced costs; stops as soon as the sink is settled.
+
+        Returns (dist, prev_edge, settled) where ``settled`` lists the nodes
+        popped before the sink.
+        """
+        inf = float('inf')
+        graph, to, cap, cost, potential = self.graph, self.to, self.cap, self.cost, self.potential
+        dist = [inf] * self.node_count
+        prev_edge = [-1] * self.node_count
+        settled = []
+        dist[root] = 0
+        heap = [(0, root)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u == sink:
+                break
+            settled.append(u)
+            pu = potential[u]
+            for e in graph[u]:
+                if cap[e] <= 0:
+                    continue
+                v = to[e]
+                nd = d + cost[e] + pu - potential[v]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev_edge[v] = e
+                    heapq.heappush(heap, (nd, v))
+        return dist, prev_edge, settled
+
+    def augment(self, root, sink, limit=1):
+        """Push up to ``limit`` units along a shortest root -> sink path.
+
+        Returns (pushed, cost).  Rooting the search at a single node rather than
+        a super-source keeps each search local, which is what makes row-by-row
+        assignment (Hungarian style) fast on sparse eligibility graphs.
+        """
+        to, cap, cost, potential = self.to, self.cap, self.cost, self.potential
+        dist, prev_edge, settled = self._shortest_path(root, sink)
+        if run_stats is not None:
+            run_stats.count('flowSearches')
+            run_stats.count('flowNodesSettled', len(settled))
+        sink_dist = dist[sink]
+        if sink_dist == float('inf'):
+            return 0, 0
+        # Lower the potential of every node settled before the sink; unsettled
+        # nodes are left alone (a uniform shift), so reduced costs stay >= 0.
+        for v in settled:
+            potential[v] += dist[v] - sink_dist
+
+        push = limit
+        v = sink
+        while v != root:
+            e = prev_edge[v]
+            push = min(push, cap[e])
+            v = to[e ^ 1]
+        path_cost = 0
+        v = sink
+        while v != root:
+            e = prev_edge[v]
+            cap[e] -= push
+            cap[e ^ 1] += push
+            path_cost += cost[e]
+            v = to[e ^ 1]
+        return push, push * path_cost
+
+    def flow(self, source, sink, max_flow):
+        """Push up to ``max_flow`` units from source to sink; returns (flow, cost)."""
+        total_flow = 0
+        total_cost = 0
+        while total_flow < max_flow:
+            pushed, path_cost = self.augment(source, sink, max_flow - total_flow)
+            if not pushed:
+                break
+            total_flow += pushed
+            total_cost += path_cost
+        return total_flow, total_cost
+
+def index_to_cost(index):
+    """Integer edge cost for a qualifying-time index (lower index = better swim)."""
+    return int(round(index * 1000))
+
+class AllocationState:
+    """Individual-event allocation in progress.
+
+    Holds each swimmer's event count (pre-assignments included), the open
+    slots of each (event, age, gender) and the entry that won each filled
+    slot, so allocators check capacity and claim slots in O(1) and results
+    are read back without searching ``full_list``.  Slots are positions in
+    ``event_list``; ``swimmer_event_count`` is shared and kept up to date.
+    """
+
+    def __init__(self, event_list, protected_events, swimmer_event_count, full_list):
+        self.event_list = event_list
+        self.protected_events = protected_events
+        self.event_count = swimmer_event_count
+        self.assignments = 0
+        # Best entry of each swimmer for each event (full_list is sorted by index)
+        self.best_entries = {}
+        for entry in full_list:
+            self.best_entries.setdefault((entry[-1], (entry[0], entry[1], entry[2])), entry)
+        self.slots = {}  # event_key -> every slot for that event
+        self.open_slots = {}  # event_key -> slots still 'Not allocated', in list order
+        self.entries = {}  # slot -> winning full_list entry
+        allocated = {}
+        for slot, event in enumerate(event_list):
+            event_key = (event[0], event[1], event[2])
+            self.slots.setdefault(event_key, []).append(slot)
+            if event[-1] != 'Not allocated':
+                allocated[event[-1]] = allocated.get(event[-1], 0) + 1
+                self.entries[slot] = self.best_entries.get((event[-1], event_key))
+            elif event_key not in protected_events:
+                self.open_slots.setdefault(event_key, []).append(slot)
+        for swimmer_name, count in allocated.items():
+            if count > self.count(swimmer_name):
+                swimmer_event_count[swimmer_name] = count
+
+    def count(self, swimmer_name):
+        return self.event_count.get(swimmer_name, 0)
+
+    def has_capacity(self, swimmer_name, max_events):
+        return self.count(swimmer_name) < max_events
+
+    def open_slot(self, event_key):
+        """First unallocated slot for an event, or None."""
+        open_slots = self.open_slots.get(event_key)
+        return open_slots[0] if open_slots else None
+
+    def assign(self, slot, swimmer_name, entry=None):
+        """Give ``slot`` to a swimmer; ``entry`` defaults to their best entry for it."""
+        event = self.event_list[slot]
+        event_key = (event[0], event[1], event[2])
+        self.open_slots[event_key].remove(slot)
+        event[-1] = swimmer_name
+        self.entries[slot] = entry if entry is not None else self.best_entries.get((swimmer_name, event_key))
+        self.event_count[swimmer_name] = self.count(swimmer_name) + 1
+        self.assignments += 1
+        log.debug("AUTO-ASSIGNED: {} to {} {} {}", swimmer_name, event[0], event[1], event[2])
+
+def allocate_individual_greedy(full_list, state, max_events):
+    """Original allocation: walk entries in index order and take the first free event."""
+    assignments_before = state.assignments
+    for time in full_list:
+        swimmer_name = time[-1]
+
+        # Check current allocation count including pre-assignments
+        if not state.has_capacity(swimmer_name, max_events):
+            continue
+
+        # Skip protected events - THIS IS CRITICAL
+        event_key = (time[0], time[1], time[2])
+        if event_key in state.protected_events:
+            for slot in state.slots.get(event_key, ()):
+                event = state.event_list[slot]
+                log.debug("PROTECTION: Skipping protected event {} {} {} (assigned to {})", event[0], event[1], event[2], event[-1])
+            continue
+
+        slot = state.open_slot(event_key)
+        if slot is not None:
+            state.assign(slot, swimmer_name, time)
+    return state.assignments - assignments_before
+
+def build_individual_slots(full_list, event_list, protected_events):
+    """Open individual event slots and the best cost of each swimmer for each.
+
+    Returns (slot_events, slots_by_key, best_cost) where ``slot_events`` holds
+    each slot's position in ``event_list`` and ``best_cost`` maps
+    (swimmer_name, event_key) to the integer cost of that swimmer's best entry
+    (a swimmer may have several rows for one event, e.g. SC and LC).
+    """
+    best_cost = {}
+    for entry in full_list:
+        event_key = (entry[0], entry[1], entry[2])
+        if event_key in protected_events:
+            continue
+        cost = index_to_cost(entry[-2])
+        pair = (entry[-1], event_key)
+        if pair not in best_cost or cost < best_cost[pair]:
+            best_cost[pair] = cost
+    entered_keys = {event_key for _, event_key in best_cost}
+
+    # One slot per open event row that has at least one entry (duplicate rows
+    # behave as separate slots); relay rows never have entries
+    slots_by_key = {}
+    slot_events = []
+    for position, event in enumerate(event_list):
+        event_key = (event[0], event[1], event[2])
+        if event_key not in entered_keys or event[-1] != 'Not allocated':
+            continue
+        slots_by_key.setdefault(event_key, []).append(len(slot_events))
+        slot_events.append(position)
+    best_cost = {pair: cost for pair, cost in best_cost.items() if pair[1] in slots_by_key}
+    return slot_events, slots_by_key, best_cost
+
+def default_unfilled_cost(edge_costs, slot_count):
+    """Price of an empty slot above any complete line-up of ``slot_count``
+    slots, so the flow fills the most events first, then minimises cost."""
+    shift = max([0] + [-cost for cost in edge_costs])
+    return max([0] + [cost + shift for cost in edge_costs]) * slot_count + 1 - shift
+
+def individual_network(slot_count, slots_by_key, best_cost, capacities, unfilled_cost=None, penalties=None):
+    """The network solve_individual_flow() augments, with no flow pushed yet.
+
+    Nodes are the slots (0 .. slot_count - 1), one per swimmer with room, the
+    unfilled node and the sink, in that order.  Returns (network,
+    assignment_edges, unfilled_cost) where ``assignment_edges`` lists
+    (edge_id, slot, swimmer_name, cost) and ``unfilled_cost`` is the price
+    actually used.
+    """
+    penalties = penalties or {}
+    edges = []
+    swimmer_nodes = {}
+    for (swimmer_name, event_key), cost in best_cost.items():
+        if capacities.get(swimmer_name, 0) <= 0:
+            continue
+        if swimmer_name not in swimmer_nodes:
+            swimmer_nodes[swimmer_name] = len(swimmer_nodes)
+        cost += penalties.get(swimmer_name, 0)
+        for slot in slots_by_key[event_key]:
+            edges.append((slot, swimmer_name, cost))
+
+    first_swimmer = slot_count
+    unfilled = first_swimmer + len(swimmer_nodes)
+    sink = unfilled + 1
+    network = MinCostFlow(sink + 1)
+
+    shift = max([0] + [-cost for _, _, cost in edges])
+    if unfilled_cost is None:
+        unfilled_cost = default_unfilled_cost([cost for _, _, cost in edges], slot_count)
+
+    assignment_edges = []
+    for slot, swimmer_name, cost in edges:
+        edge_id = network.add_edge(slot, first_swimmer + swimmer_nodes[swimmer_name], 1, cost + shift)
+        assignment_edges.append((edge_id, slot, swimmer_name, cost))
+
+    for swimmer_name, node in swimmer_nodes.items():
+        network.add_edge(first_swimmer + node, sink, capacities[swimmer_name], 0)
+    for slot in range(slot_count):
+        network.add_edge(slot, unfilled, 1, unfilled_cost + shift)
+    network.add_edge(unfilled, sink, slot_count, 0)
+    return network, assignment_edges, unfilled_cost
+
+def flow_assignment(network, assignment_edges):
+    """(slot -> swimmer_name, summed cost) of the assignment edges carrying flow."""
+    cap = network.cap
+    assignment = {}
+    total_cost = 0
+    for edge_id, slot, swimmer_name, cost in assignment_edges:
+        if cap[edge_id ^ 1]:
+            assignment[slot] = swimmer_name
+            total_cost += cost
+    return assignment, total_cost
+
+def augment_slots(network, slot_count, deadline=None):
+    """Augment slots 0 .. slot_count - 1 in turn, each from the slot to the
+    sink, until ``deadline`` (a perf_counter() value) passes.  Returns how
+    many were augmented; those slots are assigned optimally among themselves.
+    """
+    sink = network.node_count - 1
+    for slot in range(slot_count):
+        if deadline is not None and perf_counter() >= deadline:
+            return slot
+        network.augment(slot, sink)
+    return slot_count
+
+def slot_detours(network, slot_count):
+    """Per slot, the cheapest reduced cost of an edge it does not use.
+
+    Residual reduced costs are >= 0, so any other line-up that moves ``slot``
+    costs at least this much more (the shift cancels on cycles).  Slots with
+    no edge left to move to are missing.
+    """
+    to, cap, cost, potential = network.to, network.cap, network.cost, network.potential
+    detours = {}
+    for slot in range(slot_count):
+        reduced = [cost[e] + potential[slot] - potential[to[e]] for e in network.graph[slot] if cap[e] > 0]
+        if reduced:
+            detours[slot] = min(reduced)
+    return detours
+
+def solve_individual_flow(slot_count, slots_by_key, best_cost, capacities, unfilled_cost=None, penalties=None,
+                          deadline=None):
+    """Min-cost assignment of swimmers to individual slots.
+
+    Network: event slot -> swimmer (cost) -> sink, swimmer capacity from
+    ``capacities``.  Every slot also has an "unfilled" edge; by default it is
+    priced above any complete line-up, so the most events are filled first and
+    the summed cost is minimised among those line-ups.  ``penalties`` adds a
+    per-swimmer cost to each of their edges (used by the joint solver).
+    Slots are augmented one at a time from the slot itself (Hungarian style).
+
+    With a ``deadline`` (a perf_counter() value) the slots not yet augmented
+    when it passes are left out of the assignment and the cost is None.
+
+    Returns (assignment, cost) where ``assignment`` maps slot -> swimmer_name and
+    ``cost`` counts each unfilled slot at ``unfilled_cost``.
+    """
+    if not slot_count:
+        return {}, 0
+    network, assignment_edges, unfilled_cost = individual_network(slot_count, slots_by_key, best_cost, capacities,
+                                                                  unfilled_cost, penalties)
+    augmented = augment_slots(network, slot_count, deadline)
+    assignment, total_cost = flow_assignment(network, assignment_edges)
+    if augmented < slot_count:
+        return assignment, None
+    total_cost += (slot_count - len(assignment)) * unfilled_cost
+    return assignment, total_cost
+
+def allocate_individual_exact(full_list, state, max_events):
+    """Optimal allocation of swimmers to the open individual events.
+
+    Each swimmer may take ``max_events`` minus their pre-assigned events.
+    Pre-assigned (protected) events are fixed: they are left out of the network
+    and already count towards their swimmer's capacity.
+    """
+    slot_events, slots_by_key, best_cost = build_individual_slots(full_list, state.event_list, state.protected_events)
+    capacities = {swimmer_name: max_events - state.count(swimmer_name) for swimmer_name, _ in best_cost}
+    assignment, _ = solve_individual_flow(len(slot_events), slots_by_key, best_cost, capacities)
+
+    assignments_before = state.assignments
+    for slot, swimmer_name in sorted(assignment.items()):
+        state.assign(slot_events[slot], swimmer_name)
+    return state.assignments - assignments_before
+
+def extend_greedily(assignment, slots_by_key, best_cost, capacities):
+    """Fill the slots ``assignment`` leaves open: (swimmer, event) pairs in cost
+    order take the first open slot of their event while the swimmer has room."""
+    assignment = dict(assignment)
+    room = dict(capacities)
+    for swimmer_name in assignment.values():
+        room[swimmer_name] -= 1
+    for (swimmer_name, event_key), _ in sorted(best_cost.items(), key=lambda item: item[1]):
+        if room.get(swimmer_name, 0) <= 0:
+            continue
+        for slot in slots_by_key[event_key]:
+            if slot not in assignment:
+                assignment[slot] = swimmer_name
+                room[swimmer_name] -= 1
+                break
+    return assignment
+
+def improve_lineup(assignment, slots_by_key, best_cost, capacities, unfilled_cost, deadline):
+    """Local search on ``assignment`` (updated in place) until no move helps
+    or ``deadline`` passes; returns the number of moves made.
+
+    A slot moves to a cheaper swimmer with room, or to a full one whose other
+    slot can go to the slot's old swimmer or to someone else with room.  An
+    empty slot costs ``unfilled_cost``; no move empties a slot.
+    """
+    if perf_counter() >= deadline:
+        return 0
+    slot_keys = {slot: event_key for event_key, slots in slots_by_key.items() for slot in slots}
+    candidates = {}
+    for (swimmer_name, event_key), cost in best_cost.items():
+        if capacities.get(swimmer_name, 0) > 0:
+            candidates.setdefault(event_key, []).append((cost, swimmer_name))
+    for ranked in candidates.values():
+        ranked.sort()
+    room = dict(capacities)
+    held = {}
+    for slot, swimmer_name in assignment.items():
+        room[swimmer_name] -= 1
+        held.setdefault(swimmer_name, set()).add(slot)
+
+    def place(slot, swimmer_name):
+        before = assignment.get(slot)
+        if before is not None:
+            room[before] += 1
+            held[before].discard(slot)
+        assignment[slot] = swimmer_name
+        room[swimmer_name] -= 1
+        held.setdefault(swimmer_name, set()).add(slot)
+
+    def cost_of(slot, swimmer_name):
+        return unfilled_cost if swimmer_name is None else best_cost[(swimmer_name, slot_keys[slot])]
+
+    def cheapest_with_room(event_key, skip):
+        for cost, swimmer_name in candidates[event_key]:
+            if swimmer_name != skip and room[swimmer_name] > 0:
+                return cost, swimmer_name
+        return None
+
+    moves = 0
+    improved = True
+    while improved:
+        improved = False
+        for slot, event_key in slot_keys.items():
+            if perf_counter() >= deadline:
+                return moves
+            current = assignment.get(slot)
+            current_cost = cost_of(slot, current)
+            for cost, swimmer_name in candidates.get(event_key, ()):
+                if cost >= current_cost:
+                    break
+                if room[swimmer_name] > 0:
+                    place(slot, swimmer_name)
+                    moves += 1
+                    improved = True
+                    break
+                # Full: free one of their slots for the old swimmer or someone with room
+                best_move = None
+                for other in held[swimmer_name]:
+                    if slot_keys[other] == event_key:
+                        continue
+                    freed = cost_of(other, swimmer_name)
+                    takers = [cheapest_with_room(slot_keys[other], swimmer_name)]
+                    if (current, slot_keys[other]) in best_cost:
+                        takers.append((cost_of(other, current), current))
+                    for taker_cost, taker in filter(None, takers):
+                        gain = current_cost - cost + freed - taker_cost
+                        if gain > 0 and (best_move is None or gain > best_move[0]):
+                            best_move = (gain, other, taker)
+                if best_move is not None:
+                    _, other, taker = best_move
+                    if current is not None:
+                        room[current] += 1
+                        held[current].discard(slot)
+                        del assignment[slot]
+                    place(other, taker)
+                    place(slot, swimmer_name)
+                    moves += 1
+                    improved = True
+                    break
+    return moves
+
+def allocate_individual_anytime(full_list, state, max_events, deadline):
+    """allocate_individual_exact() that answers by ``deadline`` (``timeLimitMs``).
+
+    A greedy line-up is built first, so there is always a feasible answer,
+    and kept if it already gives every slot its cheapest swimmer.  Otherwise
+    the exact flow runs until ANYTIME_FLOW_SHARE of the time left; when it
+    finishes its line-up is optimal, and the same one the unbounded solver
+    returns.  If not, the slots it reached are kept and the rest are filled
+    greedily, and the better of that and the greedy line-up is polished by
+    improve_lineup() until the deadline.  Line-ups compare as the flow
+    prices them: most events filled first, then the lowest index sum.
+
+    The reported objective is the index sum plus UNFILLED_INDEX per empty
+    slot.  A flow cut short is still optimal for the slots it reached, under
+    the event caps, so its cost plus each remaining slot's cheapest swimmer
+    is a lower bound.  With no slot reached there is no bound that respects
+    the caps, and the lower bound and gap are None.  Returns (assignments
+    made, report) where the report holds the method used, the objective, the
+    lower bound, the gap between them and the number of local-search moves.
+    """
+    started = perf_counter()
+    slot_events, slots_by_key, best_cost = build_individual_slots(full_list, state.event_list, state.protected_events)
+    slot_count = len(slot_events)
+    capacities = {swimmer_name: max_events - state.count(swimmer_name) for swimmer_name, _ in best_cost}
+    slot_keys = {slot: event_key for event_key, slots in slots_by_key.items() for slot in slots}
+    unfilled_cost = default_unfilled_cost(
+        [cost for (swimmer_name, _), cost in best_cost.items() if capacities[swimmer_name] > 0], slot_count)
+
+    def index_cost(assignment):
+        return sum(best_cost[(swimmer_name, slot_keys[slot])] for slot, swimmer_name in assignment.items())
+
+    def flow_cost(assignment):
+        return index_cost(assignment) + (slot_count - len(assignment)) * unfilled_cost
+
+    def objective(cost, empty):
+        return cost / 1000 + empty * UNFILLED_INDEX
+
+    cheapest = {}
+    for (swimmer_name, event_key), cost in best_cost.items():
+        if capacities[swimmer_name] > 0 and cost < cheapest.get(event_key, float('inf')):
+            cheapest[event_key] = cost
+
+    def slot_bound(slots):
+        """Objective bound of ``slots`` each given its cheapest swimmer."""
+        return objective(sum(cheapest.get(slot_keys[slot], 0) for slot in slots),
+                         sum(slot_keys[slot] not in cheapest for slot in slots))
+
+    method = 'greedy'
+    timed_out = False
+    local_moves = 0
+    assignment = extend_greedily({}, slots_by_key, best_cost, capacities)
+    lower_bound = slot_bound(range(slot_count))
+    if objective(index_cost(assignment), slot_count - len(assignment)) - lower_bound > 1e-3:
+        lower_bound = None
+        timed_out = True
+        flow_deadline = started + max(0.0, deadline - started) * ANYTIME_FLOW_SHARE
+        # Building the network is only worth it with time left to augment
+        if perf_counter() < flow_deadline:
+            network, assignment_edges, _ = individual_network(slot_count, slots_by_key, best_cost, capacities,
+                                                              unfilled_cost)
+            augmented = augment_slots(network, slot_count, flow_deadline)
+            reached, reached_cost = flow_assignment(network, assignment_edges)
+            if augmented:
+                lower_bound = objective(reached_cost, augmented - len(reached)) + slot_bound(range(augmented, slot_count))
+            if augmented == slot_count:
+                method = 'exact'
+                timed_out = False
+                assignment = reached
+            elif reached:
+                partial = extend_greedily(reached, slots_by_key, best_cost, capacities)
+                if flow_cost(partial) < flow_cost(assignment):
+                    method = 'partial'
+                    assignment = partial
+        if method != 'exact':
+            local_moves = improve_lineup(assignment, slots_by_key, best_cost, capacities, unfilled_cost, deadline)
+
+    assignments_before = state.assignments
+    for slot, swimmer_name in sorted(assignment.items()):
+        state.assign(slot_events[slot], swimmer_name)
+    value = objective(index_cost(assignment), slot_count - len(assignment))
+    gap = None if lower_bound is None else max(0.0, value - lower_bound)
+    return state.assignments - assignments_before, {
+        'method': method,
+        'timedOut': timed_out,
+        'optimal': method == 'exact' or (gap is not None and gap <= 1e-3),
+        'objective': round(value, 3),
+        'lowerBound': None if lower_bound is None else round(lower_bound, 3),
+        'gap': None if gap is None else round(gap, 3),
+        'localMoves': local_moves
+    }
+
+def individual_alternatives(full_list, state, max_events, count, base=None, deadline=None):
+    """The ``count`` next-best individual line-ups after the optimal one.
+
+    Murty's k-best partitioning over the exact solver's network: each popped
+    line-up splits its subspace into one child per free slot (earlier slots
+    fixed, this slot's pick excluded).  Children are queued at their parent's
+    cost plus the slot's detour bound and only solved when they reach the
+    front, so most are never solved.  A child is solved from a copy of its
+    parent's residual network: the fixed slots lose their other edges, the
+    excluded pick is cancelled and that one unit is rerouted along a single
+    shortest path, so each costs one search rather than a full re-solve.
+    Its line-up and detours are only read once it is popped in turn.
+    Line-ups that differ only by swapping swimmers between duplicate event
+    rows count once.  Call before the allocation fills ``state``.
+
+    Rows compare against ``base`` ({event_list position: swimmer_name}, an
+    optimal line-up of the open slots) when given, e.g. a tied line-up the
+    caller returns instead of the flow's own; it is never listed itself.
+    Once ``deadline`` passes the rows found so far are returned.  Returns
+    rows ranked by the same objective as the exact solver, each with its
+    index and filled-event deltas and the slots that change.
+    """
+    slot_events, slots_by_key, best_cost = build_individual_slots(full_list, state.event_list, state.protected_events)
+    slot_count = len(slot_events)
+    if not slot_count or count <= 0:
+        return []
+    capacities = {swimmer_name: max_events - state.count(swimmer_name) for swimmer_name, _ in best_cost}
+    base_network, assignment_edges, unfilled_cost = individual_network(slot_count, slots_by_key, best_cost,
+                                                                       capacities)
+    augment_slots(base_network, slot_count)
+
+    def solve(parent, parent_cost, fixed_slots, slot):
+        """Re-solve ``parent`` with ``fixed_slots`` kept and ``slot``'s pick
+        excluded; returns (network, cost), or None when no line-up is left."""
+        network = parent.residual_copy()
+        graph, cap = network.graph, network.cap
+        for fixed_slot in fixed_slots:
+            for e in graph[fixed_slot]:
+                cap[e] = 0
+        # Slots only have forward edges, so the one with residual flow is the pick
+        picked = next(e for e in graph[slot] if cap[e ^ 1] > 0)
+        cap[picked ^ 1] = 0
+        pushed, path_cost = network.augment(slot, network.to[picked])
+        if not pushed:
+            return None
+        # Every slot carries one unit on a shifted edge, so the shift cancels
+        return network, parent_cost - network.cost[picked] + path_cost
+
+    def event_key(slot):
+        event = state.event_list[slot_events[slot]]
+        return (event[0], event[1], event[2])
+
+    def lineup_key(assignment):
+        return tuple(sorted((event_key(slot), swimmer_name) for slot, swimmer_name in assignment.items()))
+
+    def index_sum(assignment):
+        return sum(state.best_entries[(swimmer_name, event_key(slot))][-2] for slot, swimmer_name in assignment.items())
+
+    flow_lineup, base_cost = flow_assignment(base_network, assignment_edges)
+    base_cost += (slot_count - len(flow_lineup)) * unfilled_cost
+    if base is None:
+        base_assignment = flow_lineup
+    else:
+        base_assignment = {slot: base[position] for slot, position in enumerate(slot_events) if position in base}
+    queue = [(base_cost, 0, frozenset(), base_network, None)]
+    pushed = 1
+    lineups = []
+    seen = {lineup_key(base_assignment)}
+    while queue and len(lineups) < count:
+        if deadline is not None and perf_counter() >= deadline:
+            log.warning("WARNING: timeLimitMs reached after {} of {} alternatives", len(lineups), count)
+            break
+        cost, _, fixed, network, split = heapq.heappop(queue)
+        if split is not None:
+            solved = solve(network, cost - split[2], *split[:2])
+            if solved is not None:
+                heapq.heappush(queue, (solved[1], pushed, fixed, solved[0], None))
+                pushed += 1
+            continue
+        assignment, _ = flow_assignment(network, assignment_edges)
+        detours = slot_detours(network, slot_count)
+        key = lineup_key(assignment)
+        if key not in seen:
+            seen.add(key)
+            lineups.append(assignment)
+        newly_fixed = []
+        for slot in range(slot_count):
+            if slot in fixed:
+                continue
+            if slot in detours:
+                heapq.heappush(queue, (cost + detours[slot], pushed, fixed | set(newly_fixed), network,
+                                       (tuple(newly_fixed), slot, detours[slot])))
+                pushed += 1
+            newly_fixed.append(slot)
+
+    base_index = index_sum(base_assignment)
+    rows = []
+    for rank, assignment in enumerate(lineups, 1):
+        changes = []
+        for slot in range(slot_count):
+            before, after = base_assignment.get(slot), assignment.get(slot)
+            if before != after:
+                event = state.event_list[slot_events[slot]]
+                changes.append({'event': f'{event[1]}U {event[2]} {event[0]}', 'before': before, 'after': after})
+        rows.append({
+            'rank': rank,
+            'indexDelta': round(index_sum(assignment) - base_index, 3),
+            'individualEventsDelta': len(assignment) - len(base_assignment),
+            'changes': changes
+        })
+    return rows
+
+INDIVIDUAL_SOLVERS = {
+    'exact': allocate_individual_exact,
+    'greedy': allocate_individual_greedy,
+}
+
+NO_STANDARD_INDEX = 999999  # index given to entries with no county standard
+UNFILLED_INDEX = 10 * NO_STANDARD_INDEX  # joint-objective cost of an empty event or missing relay team
+
+GENDER_MAPPING = {
+    'M': 'Male',
+    'F': 'Female',
+    'Male': 'Male',
+    'Female': 'Female'
+}
+
+MEDLEY_STROKES = ('Backstroke', 'Breaststroke', 'Butterfly', 'Freestyle')
+
+# Squadrun positions: 1=11U Female, 2=11U Male, ... 7=Open Female, 8=Open Male
+SQUADRUN_POSITIONS = [
+    ('11U', 'Female'), ('11U', 'Male'),
+    ('13U', 'Female'), ('13U', 'Male'),
+    ('15U', 'Female'), ('15U', 'Male'),
+    ('Open', 'Female'), ('Open', 'Male')
+]
+
+def is_relay_event(event_name):
+    """Whether an event-list name is a relay (e.g. "4x50m Freestyle", "Squadrun")."""
+    name = event_name.lower()
+    return 'relay' in name or 'x' in name or 'squadrun' in name
+
+def relay_event_kind(event_name):
+    name = event_name.lower()
+    if 'squadrun' in name:
+        return 'squadrun'
+    if 'medley' in name:
+        return 'medley'
+    if 'freestyle' in name:
+        return 'freestyle'
+    return None
+
+def relay_legs(event_name, age, gender):
+    """Leg specs for a relay event, in swimming order.
+
+    Each leg is a dict with the stroke, the RelaySwimmer.times slot to use,
+    the required gender and the age limit (None for Open).
+    """
+    kind = relay_event_kind(event_name)
+    distance = extract_relay_distance(event_name)
+    if distance not in DISTANCE_CODES:
+        distance = 50  # Fallback to 50m if distance not recognized
+    max_age = None if age == 99 else age
+
+    if kind == 'freestyle':
+        match = re.search(r'(\d+)\s*x', event_name)
+        swimmers_needed = int(match.group(1)) if match else 4
+        # Mixed relays are half female, half male
+        leg_genders = [('Female', 'Male')[leg % 2] if gender == 'Mixed' else gender for leg in range(swimmers_needed)]
+        return [{'stroke': 'Freestyle', 'time_slot': relay_time_slot('Freestyle', distance), 'gender': leg_gender, 'max_age': max_age}
+                for leg_gender in leg_genders]
+    if kind == 'medley':
+        # Mixed medley legs are 'Mixed' here; mixed_leg_options() splits them
+        return [{'stroke': stroke, 'time_slot': relay_time_slot(stroke, distance), 'gender': gender, 'max_age': max_age}
+                for stroke in MEDLEY_STROKES]
+    if kind == 'squadrun':
+        return [{'stroke': 'Freestyle', 'time_slot': relay_time_slot('Freestyle', 50), 'gender': leg_gender,
+                 'max_age': None if age_group == 'Open' else int(age_group.replace('U', '')), 'age_group': age_group}
+                for age_group, leg_gender in SQUADRUN_POSITIONS]
+    return []
+
+def leg_candidates(leg, relay_swimmers):
+    """Times of every swimmer eligible for a relay leg, keyed by name."""
+    time_slot = leg['time_slot']
+    candidates = {}
+    for s in relay_swimmers.values():
+        if s.gender != leg['gender']:
+            continue
+        if leg['max_age'] is not None and s.age > leg['max_age']:
+            continue
+        swimmer_time = s.times[time_slot]
+        if swimmer_time is not None:
+            candidates[s.name] = swimmer_time
+    return candidates
+
+def solve_leg_assignment(leg_costs):
+    """Cheapest assignment of distinct swimmers to relay legs.
+
+    ``leg_costs`` holds one {swimmer_name: cost} dict per leg.  Returns
+    (total_cost, [swimmer_name per leg]) or (None, None) if no complete team
+    exists.  Only each leg's ``len(leg_costs)`` cheapest candidates can appear
+    in an optimal team (any other choice leaves one of them free to swap in),
+    so the rectangular Hungarian below runs on at most legs^2 columns.
+    """
+    leg_count = len(leg_costs)
+    if leg_count == 0:
+        return 0, []
+    columns = {}
+    for costs in leg_costs:
+        if not costs:
+            return None, None
+        for swimmer_name, _ in heapq.nsmallest(leg_count, costs.items(), key=lambda item: item[1]):
+            columns.setdefault(swimmer_name, len(columns) + 1)
+    column_count = len(columns)
+    if run_stats is not None:
+        # Candidates outside their leg's shortlist never reach the matrix
+        candidates = sum(len(costs) for costs in leg_costs)
+        run_stats.count('relayAssignments')
+        run_stats.count('relayCandidates', candidates)
+        run_stats.count('relayCandidatesPruned', candidates - sum(min(len(costs), leg_count) for costs in leg_costs))
+    if column_count < leg_count:
+        return None, None
+
+    inf = float('inf')
+    names = [None] * (column_count + 1)
+    for swimmer_name, j in columns.items():
+        names[j] = swimmer_name
+    matrix = [None] + [[inf] + [costs.get(names[j], inf) for j in range(1, column_count + 1)] for costs in leg_costs]
+
+    # Hungarian algorithm for an n x m matrix (n <= m), 1-indexed
+    u = [0.0] * (leg_count + 1)
+    v = [0.0] * (column_count + 1)
+    owner = [0] * (column_count + 1)
+    way = [0] * (column_count + 1)
+    for i in range(1, leg_count + 1):
+        owner[0] = i
+        j0 = 0
+        minv = [inf] * (column_count + 1)
+        used = [False] * (column_count + 1)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            row = matrix[i0]
+            ui0 = u[i0]
+            delta = inf
+            j1 = 0
+            for j in range(1, column_count + 1):
+                if used[j]:
+                    continue
+                cur = row[j] - ui0 - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            if delta == inf:
+                return None, None
+            for j in range(column_count + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    picks = [None] * leg_count
+    for j in range(1, column_count + 1):
+        if owner[j]:
+            picks[owner[j] - 1] = names[j]
+    total = sum(leg_costs[leg][swimmer_name] for leg, swimmer_name in enumerate(picks))
+    return total, picks
+
+def mixed_leg_options(legs):
+    """Leg lists to try for a relay: ``legs`` itself, or for legs open to
+    'Mixed' swimmers every way of giving half of them to each gender."""
+    mixed = [position for position, leg in enumerate(legs) if leg['gender'] == 'Mixed']
+    if not mixed:
+        return [legs]
+    options = []
+    for female in itertools.combinations(mixed, len(mixed) // 2):
+        options.append([dict(leg, gender='Female' if position in female else 'Male') if position in mixed else leg
+                        for position, leg in enumerate(legs)])
+    return options
+
+def plan_relay_legs(kind, legs, relay_swimmers, protected):
+    """(candidates, fixed, reference, ignored) for one leg list.
+
+    Pre-assigned positions become fixed legs (the swimmer is the only
+    candidate for that leg and is removed from the others); ``ignored`` lists
+    the (position, swimmer) pre-assignments that do not fit.  ``reference`` is
+    the best team's total time, or None when no team can be formed.
+    """
+    candidates = [leg_candidates(leg, relay_swimmers) for leg in legs]
+    fixed, ignored = {}, []
+    for pos, assignment in protected.items():
+        if kind == 'medley' and assignment.get('stroke') in MEDLEY_STROKES:
+            leg = MEDLEY_STROKES.index(assignment['stroke'])
+        else:
+            leg = pos - 1
+        swimmer_name = assignment['swimmer']
+        if not 0 <= leg < len(legs) or swimmer_name not in candidates[leg] or swimmer_name in fixed.values():
+            ignored.append((pos, swimmer_name))
+            continue
+        fixed[leg] = swimmer_name
+    for leg, swimmer_name in fixed.items():
+        candidates[leg] = {swimmer_name: candidates[leg][swimmer_name]}
+    for leg in range(len(legs)):
+        if leg not in fixed:
+            for swimmer_name in fixed.values():
+                candidates[leg].pop(swimmer_name, None)
+    reference, _ = solve_leg_assignment(candidates)
+    return candidates, fixed, reference, ignored
+
+def build_relay_plans(relay_events, relay_swimmers, relay_protected_assignments):
+    """Describe every relay event as legs with eligible candidates.
+
+    Pre-assigned positions become fixed legs (see plan_relay_legs()).  A
+    mixed medley relay takes two swimmers of each gender in whichever stroke
+    order gives the fastest team, keeping as many pre-assignments as fit.
+    Events for which no team can be formed are dropped with a log line.
+    """
+    plans = []
+    for event in relay_events:
+        event_name, age = event[0], event[1]
+        gender = GENDER_MAPPING.get(event[2], event[2])
+        kind = relay_event_kind(event_name)
+        legs = relay_legs(event_name, age, gender)
+        if not legs:
+            log.warning("RELAY: Skipping {} {} {}: not a freestyle, medley or Squadrun relay", event_name, age, gender)
+            continue
+        protected = relay_protected_assignments.get((event_name, age, gender), {})
+        best = None
+        for option in mixed_leg_options(legs):
+            candidates, fixed, reference, ignored = plan_relay_legs(kind, option, relay_swimmers, protected)
+            rank = (reference is None, len(ignored), reference)
+            if best is None or rank < best[0]:
+                best = (rank, option, candidates, fixed, reference, ignored)
+        _, legs, candidates, fixed, reference, ignored = best
+        for pos, swimmer_name in ignored:
+            log.warning("  WARNING: Ignoring pre-assignment of {} to {} {} {} position {}", swimmer_name, event_name, age, gender, pos)
+        if reference is None:
+            log.info("RELAY: No complete team possible for {} {} {}", event_name, age, gender)
+            continue
+        plans.append({
+            'event_name': event_name,
+            'age': age,
+            'gender': gender,
+            'kind': kind,
+            'legs': legs,
+            'fixed': fixed,
+            'candidates': candidates,
+            'reference': reference
+        })
+    return plans
+
+def format_total_time(total_time):
+    return f'{int(total_time // 60):02d}:{total_time % 60:05.2f}'
+
+def format_relay_team(plan, picks):
+    """Result entry for a relay team in the same shape as the per-group builders."""
+    legs, candidates = plan['legs'], plan['candidates']
+    picks = list(picks)
+    if plan['kind'] == 'freestyle' and plan['gender'] != 'Mixed':
+        # Free positions are swum fastest first; pre-assigned positions stay put
+        free_legs = [leg for leg in range(len(legs)) if leg not in plan['fixed']]
+        free_swimmers = sorted((picks[leg] for leg in free_legs), key=lambda name: candidates[free_legs[0]][name])
+        for leg, swimmer_name in zip(free_legs, free_swimmers):
+            picks[leg] = swimmer_name
+
+    total_time = round(sum(candidates[leg][swimmer_name] for leg, swimmer_name in enumerate(picks)), 2)
+    swimmers = []
+    for leg, swimmer_name in enumerate(picks):
+        swimmer_time = candidates[leg][swimmer_name]
+        if plan['kind'] == 'medley':
+            swimmers.append({'name': swimmer_name, 'stroke': legs[leg]['stroke'], 'time': f'{swimmer_time:.2f}s'})
+        elif plan['kind'] == 'squadrun':
+            swimmers.append({'name': swimmer_name, 'ageGroup': legs[leg]['age_group'], 'gender': legs[leg]['gender'], 'time': f'{swimmer_time:.2f}s'})
+        else:
+            swimmers.append({'name': swimmer_name, 'time': f'{swimmer_time:.2f}s'})
+
+    return {
+        'relay': relay_team_name(plan),
+        'totalTime': format_total_time(total_time),
+        'swimmers': swimmers
+    }
+
+def relay_team_name(plan):
+    if plan['kind'] == 'squadrun':
+        return 'Mixed Squadrun'
+    age_display = "Open" if plan['age'] == 99 else f"{plan['age']}U"
+    return f"{age_display} {plan['gender']} {plan['event_name']}"
+
+RELAY_TEAM_LABELS = 'ABCDEFGHIJ'
+
+def build_extra_relay_teams(plan, relay_swimmers, excluded, team_count):
+    """Up to ``team_count`` more swimmer-disjoint teams for a freestyle or medley event.
+
+    Swimmers in ``excluded`` (the first team, plus anyone with no relay legs
+    left) are not used.  Single-gender freestyle legs are interchangeable, so
+    the fastest k*n swimmers split in order give the fastest teams; other
+    teams come from repeated leg assignments with each team's swimmers removed.
+    Pre-assignments only bind the first team.  Returns a list of
+    (plan, picks) ready for format_relay_team().
+    """
+    legs = plan['legs']
+    pools = [{name: time for name, time in leg_candidates(leg, relay_swimmers).items() if name not in excluded}
+             for leg in legs]
+    open_plan = dict(plan, fixed={}, candidates=pools)
+    teams = []
+    if plan['kind'] == 'freestyle' and plan['gender'] != 'Mixed':
+        ranked = sorted(pools[0], key=pools[0].get)
+        swimmers_needed = len(legs)
+        for t in range(team_count):
+            picks = ranked[t * swimmers_needed:(t + 1) * swimmers_needed]
+            if len(picks) < swimmers_needed:
+                break
+            teams.append((open_plan, picks))
+    else:
+        remaining = [dict(pool) for pool in pools]
+        for _ in range(team_count):
+            _, picks = solve_leg_assignment(remaining)
+            if picks is None:
+                break
+            teams.append((open_plan, picks))
+            for pool in remaining:
+                for swimmer_name in picks:
+                    pool.pop(swimmer_name, None)
+    return teams
+
+def add_relay_squads(relay_teams, relay_plans, relay_swimmers, team_count, relay_capacity=None):
+    """Label each freestyle/medley team 'A' and add B, C, ... teams behind it.
+
+    ``relay_capacity`` optionally maps swimmer name to the relay legs they
+    may still swim (absent names are unlimited); extra teams only use
+    swimmers with capacity left and consume it.  Squadrun and events without a first team are passed through.
+    """
+    team_count = min(team_count, len(RELAY_TEAM_LABELS))
+    plans_by_name = {relay_team_name(plan): plan for plan in relay_plans if plan['kind'] in ('freestyle', 'medley')}
+    squads = []
+    for team in relay_teams:
+        plan = plans_by_name.get(team['relay'])
+        if plan is None or team_count <= 1:
+            squads.append(team)
+            continue
+        squads.append(dict(team, relay=f"{team['relay']} {RELAY_TEAM_LABELS[0]}"))
+        excluded = {swimmer['name'] for swimmer in team['swimmers']}
+        if relay_capacity is not None:
+            excluded.update(name for name, left in relay_capacity.items() if left <= 0)
+        extra_teams = build_extra_relay_teams(plan, relay_swimmers, excluded, team_count - 1)
+        for label, (team_plan, picks) in zip(RELAY_TEAM_LABELS[1:], extra_teams):
+            extra = format_relay_team(team_plan, picks)
+            extra['relay'] = f"{extra['relay']} {label}"
+            squads.append(extra)
+            if relay_capacity is not None:
+                for swimmer_name in picks:
+                    if swimmer_name in relay_capacity:
+                        relay_capacity[swimmer_name] -= 1
+        log.info("RELAY SQUADS: {} entered {} team(s)", team['relay'], 1 + len(extra_teams))
+    return squads
+
+def optimize_joint(full_list, event_list, protected_events, swimmer_event_count, relay_plans,
+                   optimization_config, max_iterations=40, deadline=None):
+    """Optimise individual events and all relays together under shared load caps.
+
+    Caps per swimmer: ``maxIndividualEvents``, ``maxRelayEvents`` and
+    ``maxTotalEvents`` (the last two are unlimited when absent).  Individual
+    events cost their index; a relay team costs ``relayWeight`` times its
+    fractional slowdown against the best team the event could field on its
+    own, so both are dimensionless.  Each empty event or missing team costs
+    UNFILLED_INDEX.
+
+    The shared relay and total caps are relaxed with per-swimmer Lagrange
+    multipliers, which splits the problem into an exact min-cost flow for the
+    individual events and an exact leg assignment per relay.  Subgradient steps
+    tighten the resulting lower bound while each iterate is repaired into a
+    feasible line-up (then polished by re-solving each block against the
+    others).  Stops when the gap closes or after ``max_iterations``, or once
+    ``deadline`` (a perf_counter() value) has passed.  With a deadline the
+    search starts from a greedy line-up (individual events by cost, then
+    each relay within the room left), so there is always one to return, and
+    the deadline is checked inside every iteration and polish round, with
+    the individual flow stopped part-way when it passes.
+
+    Returns (assignment, slot_events, relay_picks, summary) where ``assignment``
+    maps slot -> swimmer, ``slot_events`` maps slot -> ``event_list`` position,
+    ``relay_picks`` maps plan index -> picks and
+    ``summary`` holds the objective, lower bound (None before an iteration
+    completes), iteration count and whether the deadline stopped the search.
+    """
+    inf = float('inf')
+    max_individual = optimization_config.get("maxIndividualEvents", 2)
+    max_relay = optimization_config.get("maxRelayEvents")
+    max_relay = inf if max_relay is None else max_relay
+    max_total = optimization_config.get("maxTotalEvents")
+    max_total = inf if max_total is None else max_total
+    relay_weight = optimization_config.get("relayWeight", 1.0)
+
+    slot_events, slots_by_key, best_cost = build_individual_slots(full_list, event_list, protected_events)
+    slot_count = len(slot_events)
+    slot_keys = [tuple(event_list[position][:3]) for position in slot_events]
+
+    # Load already fixed by pre-assignments
+    fixed_relay = {}
+    for plan in relay_plans:
+        for swimmer_name in plan['fixed'].values():
+            fixed_relay[swimmer_name] = fixed_relay.get(swimmer_name, 0) + 1
+    swimmers = {swimmer_name for swimmer_name, _ in best_cost}
+    for plan in relay_plans:
+        for costs in plan['candidates']:
+            swimmers.update(costs)
+
+    # Remaining room for variable assignments under each cap
+    total_room = {s: max_total - swimmer_event_count.get(s, 0) for s in swimmers}
+    individual_capacity = {}
+    for s in swimmers:
+        room = min(max_individual - swimmer_event_count.get(s, 0), total_room[s] - fixed_relay.get(s, 0))
+        individual_capacity[s] = max(0, int(room))
+
+    # Relay leg costs before penalties, in index units, cheapest first
+    base_leg_costs = [
+        [sorted(((name, relay_weight * t / plan['reference']) for name, t in costs.items()), key=lambda item: item[1])
+         for costs in plan['candidates']]
+        for plan in relay_plans
+    ]
+
+    def solve_relay(p, penalties, blocked=None):
+        """Best team for relay ``p`` with per-swimmer penalties; ``blocked(name)``
+        marks swimmers that are out of room (fixed legs are never blocked)."""
+        plan = relay_plans[p]
+        size = len(plan['legs'])
+        leg_costs = []
+        for leg, costs in enumerate(base_leg_costs[p]):
+            # Penalties are non-negative, so scanning by base cost can stop once
+            # the base cost alone exceeds the worst of the `size` best so far
+            shortlist = []
+            for name, c in costs:
+                if len(shortlist) == size and c >= -shortlist[0][0]:
+                    break
+                if blocked is not None and leg not in plan['fixed'] and blocked(name):
+                    continue
+                c += penalties.get(name, 0)
+                if len(shortlist) < size:
+                    heapq.heappush(shortlist, (-c, name))
+                elif c < -shortlist[0][0]:
+                    heapq.heapreplace(shortlist, (-c, name))
+            leg_costs.append({name: -c for c, name in shortlist})
+        total, picks = solve_leg_assignment(leg_costs)
+        if picks is None:
+            return UNFILLED_INDEX, None
+        return total - relay_weight, picks
+
+    def individual_cost(assignment):
+        cost = (slot_count - len(assignment)) * UNFILLED_INDEX
+        for slot, s in assignment.items():
+            cost += best_cost[(s, slot_keys[slot])] / 1000
+        return cost
+
+    def relay_cost(p, picks):
+        if picks is None:
+            return UNFILLED_INDEX
+        return relay_weight * (sum(relay_plans[p]['candidates'][leg][s] for leg, s in enumerate(picks)) / relay_plans[p]['reference'] - 1)
+
+    def relay_loads(relay_picks):
+        loads = {}
+        for picks in relay_picks.values():
+            for s in picks or ():
+                loads[s] = loads.get(s, 0) + 1
+        return loads
+
+    def past_deadline():
+        return deadline is not None and perf_counter() >= deadline
+
+    def solve_individuals(relay_load, penalties=None):
+        """Exact individual line-up for the room the relays leave, or None
+        when the deadline stops the flow."""
+        capacities = {s: int(max(0, min(individual_capacity[s], total_room[s] - relay_load.get(s, 0)))) for s in swimmers}
+        assignment, cost = solve_individual_flow(slot_count, slots_by_key, best_cost, capacities,
+                                                 unfilled_cost=UNFILLED_INDEX * 1000, penalties=penalties,
+                                                 deadline=deadline)
+        return None if cost is None else assignment
+
+    def load_of(assignment):
+        individual_load = {}
+        for s in assignment.values():
+            individual_load[s] = individual_load.get(s, 0) + 1
+        return individual_load
+
+    def build_relays(individual_load, penalties, order):
+        relay_load = dict(fixed_relay)
+        relay_picks = {}
+        for p in order:
+            fixed_names = set(relay_plans[p]['fixed'].values())
+            _, picks = solve_relay(p, penalties, lambda s: (
+                relay_load.get(s, 0) >= max_relay or
+                individual_load.get(s, 0) + relay_load.get(s, 0) >= total_room[s]))
+            relay_picks[p] = picks
+            for s in picks or ():
+                if s not in fixed_names:
+                    relay_load[s] = relay_load.get(s, 0) + 1
+        return relay_picks
+
+    def polish(assignment, relay_picks):
+        """Block coordinate descent: re-solve each block against the rest.
+        Each step keeps the line-up feasible and no worse, so the deadline
+        may stop it anywhere."""
+        cost = best = individual_cost(assignment) + sum(relay_cost(p, picks) for p, picks in relay_picks.items())
+        for _ in range(3):
+            if past_deadline():
+                break
+            resolved = solve_individuals(relay_loads(relay_picks))
+            if resolved is None:
+                break
+            assignment = resolved
+            individual_load = load_of(assignment)
+            for p in range(len(relay_plans)):
+                if past_deadline():
+                    break
+                others = dict(relay_picks)
+                others.pop(p)
+                relay_load = relay_loads(others)
+                _, picks = solve_relay(p, {}, lambda s: (
+                    relay_load.get(s, 0) >= max_relay or
+                    individual_load.get(s, 0) + relay_load.get(s, 0) >= total_room[s]))
+                if relay_cost(p, picks) <= relay_cost(p, relay_picks[p]):
+                    relay_picks[p] = picks
+            cost = individual_cost(assignment) + sum(relay_cost(p, picks) for p, picks in relay_picks.items())
+            if cost >= best - 1e-9:
+                break
+            best = cost
+        return assignment, relay_picks, cost
+
+    individual_cache = {}
+    relay_order = sorted(range(len(relay_plans)), key=lambda p: len(relay_plans[p]['legs']), reverse=True)
+    total_multiplier = {}
+    relay_multiplier = {}
+    best_solution = None
+    upper_bound = inf
+    lower_bound = -inf
+    step_scale = 2.0
+    stalled = 0
+    iteration = 0
+    timed_out = False
+    completed = 0
+
+    if deadline is not None:
+        assignment = extend_greedily({}, slots_by_key, best_cost, individual_capacity)
+        relay_picks = build_relays(load_of(assignment), {}, relay_order)
+        best_solution = (assignment, relay_picks)
+        upper_bound = individual_cost(assignment) + sum(relay_cost(p, picks) for p, picks in relay_picks.items())
+
+    for iteration in range(1, max_iterations + 1):
+        if past_deadline():
+            timed_out = True
+            break
+        penalties = {s: total_multiplier.get(s, 0) + relay_multiplier.get(s, 0) for s in swimmers}
+
+        # Lagrangian subproblems: individual flow and one leg assignment per relay
+        individual_penalties = {s: index_to_cost(m) for s, m in total_multiplier.items() if index_to_cost(m)}
+        penalty_key = frozenset(individual_penalties.items())
+        if penalty_key not in individual_cache:
+            assignment = solve_individuals({}, individual_penalties)
+            if assignment is None:
+                timed_out = True
+                break
+            individual_cache.clear()
+            individual_cache[penalty_key] = assignment
+        assignment = individual_cache[penalty_key]
+        relay_picks = {}
+        lagrangian = individual_cost(assignment) + sum(total_multiplier.get(s, 0) for s in assignment.values())
+        for p in range(len(relay_plans)):
+            if past_deadline():
+                break
+            cost, picks = solve_relay(p, penalties)
+            relay_picks[p] = picks
+            lagrangian += cost
+        if len(relay_picks) < len(relay_plans):
+            timed_out = True
+            break
+        completed = iteration
+        lagrangian -= sum(m * total_room[s] for s, m in total_multiplier.items())
+        lagrangian -= sum(m * max_relay for m in relay_multiplier.values())
+        if lagrangian > lower_bound + 1e-9:
+            lower_bound = lagrangian
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled >= 5:
+                step_scale /= 2
+                stalled = 0
+                if step_scale < MIN_STEP_SCALE:
+                    break  # the bound has stopped moving
+
+        individual_load = load_of(assignment)
+        relay_load = relay_loads(relay_picks)
+        total_gradient = {}
+        relay_gradient = {}
+        for s in swimmers:
+            if total_room[s] < inf:
+                total_gradient[s] = individual_load.get(s, 0) + relay_load.get(s, 0) - total_room[s]
+            if max_relay < inf:
+                relay_gradient[s] = relay_load.get(s, 0) - max_relay
+
+        # Upper bound: the relaxed solution itself when it respects every cap,
+        # otherwise a repaired copy of it
+        if all(g <= 0 for g in total_gradient.values()) and all(g <= 0 for g in relay_gradient.values()):
+            candidates = [(assignment, relay_picks)]
+        else:
+            candidates = [(assignment, build_relays(individual_load, penalties, relay_order))]
+        for candidate_assignment, candidate_relays in candidates:
+            cost = individual_cost(candidate_assignment) + sum(relay_cost(p, picks) for p, picks in candidate_relays.items())
+            if cost < upper_bound - 1e-9:
+                candidate_assignment, candidate_relays, cost = polish(candidate_assignment, dict(candidate_relays))
+                upper_bound = cost
+                best_solution = (candidate_assignment, candidate_relays)
+
+        if upper_bound - lower_bound <= 1e-3:
+            break
+        if deadline is not None and perf_counter() >= deadline:
+            timed_out = True
+            break
+
+        # Projected subgradient step on the relaxed caps
+        total_gradient = {s: g for s, g in total_gradient.items() if g > 0 or total_multiplier.get(s, 0) > 0}
+        relay_gradient = {s: g for s, g in relay_gradient.items() if g > 0 or relay_multiplier.get(s, 0) > 0}
+        norm = sum(g * g for g in total_gradient.values()) + sum(g * g for g in relay_gradient.values())
+        if norm == 0:
+            break
+        step = step_scale * (upper_bound - lower_bound) / norm
+        for s, g in total_gradient.items():
+            total_multiplier[s] = max(0.0, total_multiplier.get(s, 0) + step * g)
+        for s, g in relay_gradient.items():
+            relay_multiplier[s] = max(0.0, relay_multiplier.get(s, 0) + step * g)
+
+    assignment, relay_picks = best_solution
+    summary = {
+        'objective': upper_bound,
+        'lowerBound': min(lower_bound, upper_bound) if completed else None,
+        'iterations': completed,
+        'timedOut': timed_out
+    }
+    return assignment, slot_events, relay_picks, summary
+
+def allocate_relays_global(relay_plans, max_relay=None):
+    """Choose every relay team at once with at most ``max_relay`` legs per swimmer.
+
+    One min-cost flow over all events and age groups: relay leg -> (swimmer,
+    event) -> swimmer -> sink.  The middle node keeps a swimmer to one leg per
+    team and the swimmer -> sink capacity is the relay cap (raised to cover
+    any pre-assigned legs).  A leg costs its time over the event's best
+    stand-alone team, so every event weighs the same whatever its distance.
+    Legs may go unfilled at a price above any complete line-up; an event left
+    partly filled is dropped and the flow re-solved, so only whole teams are
+    entered.  The result is exact whenever the cap leaves every event a team;
+    otherwise which events to drop is decided greedily.
+
+    Returns relay_picks mapping plan index -> picks (None when no team).
+    """
+    fixed_relay = {}
+    for plan in relay_plans:
+        for swimmer_name in plan['fixed'].values():
+            fixed_relay[swimmer_name] = fixed_relay.get(swimmer_name, 0) + 1
+
+    active = list(range(len(relay_plans)))
+    while True:
+        legs = [(p, leg) for p in active for leg in range(len(relay_plans[p]['legs']))]
+        leg_count = len(legs)
+        pair_nodes = {}
+        swimmer_nodes = {}
+        edges = []
+        for leg_node, (p, leg) in enumerate(legs):
+            plan = relay_plans[p]
+            for swimmer_name, swimmer_time in plan['candidates'][leg].items():
+                if (swimmer_name, p) not in pair_nodes:
+                    pair_nodes[(swimmer_name, p)] = len(pair_nodes)
+                swimmer_nodes.setdefault(swimmer_name, len(swimmer_nodes))
+                edges.append((leg_node, (swimmer_name, p), int(round(swimmer_time / plan['reference'] * 1000000))))
+
+        first_pair = leg_count
+        first_swimmer = first_pair + len(pair_nodes)
+        unfilled = first_swimmer + len(swimmer_nodes)
+        sink = unfilled + 1
+        network = MinCostFlow(sink + 1)
+        unfilled_cost = max([0] + [cost for _, _, cost in edges]) * leg_count + 1
+
+        assignment_edges = []
+        for leg_node, pair, cost in edges:
+            edge_id = network.add_edge(leg_node, first_pair + pair_nodes[pair], 1, cost)
+            assignment_edges.append((edge_id, leg_node, pair[0]))
+        for (swimmer_name, _), node in pair_nodes.items():
+            network.add_edge(first_pair + node, first_swimmer + swimmer_nodes[swimmer_name], 1, 0)
+        for swimmer_name, node in swimmer_nodes.items():
+            capacity = leg_count if max_relay is None else max(max_relay, fixed_relay.get(swimmer_name, 0))
+            network.add_edge(first_swimmer + node, sink, capacity, 0)
+        for leg_node in range(leg_count):
+            network.add_edge(leg_node, unfilled, 1, unfilled_cost)
+        network.add_edge(unfilled, sink, leg_count, 0)
+
+        for leg_node in range(leg_count):
+            network.augment(leg_node, sink)
+
+        picks = {p: [None] * len(relay_plans[p]['legs']) for p in active}
+        for edge_id, leg_node, swimmer_name in assignment_edges:
+            if network.flow_on(edge_id):
+                p, leg = legs[leg_node]
+                picks[p][leg] = swimmer_name
+
+        # Drop the least complete partial team and try again without it
+        partial = [p for p in active if None in picks[p]]
+        if not partial:
+            break
+        dropped = max(partial, key=lambda p: picks[p].count(None))
+        plan = relay_plans[dropped]
+        log.info("RELAY: No complete team within the relay cap for {} {} {}", plan['event_name'], plan['age'], plan['gender'])
+        active.remove(dropped)
+
+    relay_picks = {p: None for p in range(len(relay_plans))}
+    relay_picks.update(picks)
+    return relay_picks
+
+def format_relay_picks(relay_plans, relay_picks):
+    """Result entries for chosen relay teams, split into (freestyle, medley, squadrun)."""
+    freestyle_relay_teams, medley_relay_teams, squadrun_relay_teams = [], [], []
+    for p, picks in relay_picks.items():
+        if picks is None:
+            continue
+        team = format_relay_team(relay_plans[p], picks)
+        if relay_plans[p]['kind'] == 'medley':
+            medley_relay_teams.append(team)
+        elif relay_plans[p]['kind'] == 'squadrun':
+            squadrun_relay_teams.append(team)
+        else:
+            freestyle_relay_teams.append(team)
+    return freestyle_relay_teams, medley_relay_teams, squadrun_relay_teams
+
+RELAY_SOLVERS = ('per_event', 'global')
+
+SOLVER_MODES = ('sequential', 'joint')
+
+# With timeLimitMs the joint search runs until the deadline, up to this many
+# iterations or until stalls have shrunk the subgradient step below MIN_STEP_SCALE
+JOINT_ANYTIME_ITERATIONS = 1000
+MIN_STEP_SCALE = 2.0 ** -10
+# Share of timeLimitMs the search may use; the rest is kept for the relays
+# and the results built after it
+SEARCH_TIME_SHARE = 0.8
+# Share of the search time the anytime flow may use before local search
+# polishes the best line-up found
+ANYTIME_FLOW_SHARE = 0.9
+
+def build_relay_teams(relay_events_dict, relay_swimmers, relay_protected_assignments):
+    """Build one team per freestyle/medley relay event, one (age, gender) group at a time.
+
+    Each event is solved on its own through build_relay_plans() and
+    solve_leg_assignment(); pre-assigned legs stay fixed.  Mixed-gender relays
+    are left to build_squadrun_relay().
+    """
+    relay_events = [[event_name, age, gender] for (age, gender), event_names in relay_events_dict.items()
+                    for event_name in event_names
+                    if GENDER_MAPPING.get(gender, gender) != 'Mixed' and relay_event_kind(event_name) in ('freestyle', 'medley')]
+    relay_plans = build_relay_plans(relay_events, relay_swimmers, relay_protected_assignments)
+    relay_picks = {p: solve_leg_assignment(plan['candidates'])[1] for p, plan in enumerate(relay_plans)}
+    freestyle_relay_teams, medley_relay_teams, _ = format_relay_picks(relay_plans, relay_picks)
+    return freestyle_relay_teams, medley_relay_teams
+
+def build_squadrun_relay(relay_events, relay_swimmers, relay_protected_assignments):
+    """Build the Squadrun (8x50m mixed age/gender freestyle) team if the event is listed.
+
+    The legs (position_mapping order: 11U Female, 11U Male, ... Open Male) are
+    matched to distinct swimmers in one assignment, so nobody swims twice and
+    pre-assigned positions stay fixed.  Other mixed-gender relays (e.g.
+    "Mixed 4x50m Freestyle") are solved the same way.
+    """
+    squadrun_relay_teams = []
+    
+    # Squadrun plus any relay listed with gender 'Mixed'
+    mixed_events = [event for event in relay_events
+                    if relay_event_kind(event[0]) == 'squadrun' or GENDER_MAPPING.get(event[2], event[2]) == 'Mixed']
+    
+    for plan in build_relay_plans(mixed_events, relay_swimmers, relay_protected_assignments):
+        log.info("PYTHON: Processing {} relay event", plan['event_name'])
+        leg_labels = [' '.join(filter(None, (leg.get('age_group'), leg['gender']))) for leg in plan['legs']]
+        for leg, swimmer_name in sorted(plan['fixed'].items()):
+            log.debug("  Pre-assigned position {} ({}): {}", leg + 1, leg_labels[leg], swimmer_name)
+        
+        # One assignment over all legs keeps the swimmers distinct
+        total_time, picks = solve_leg_assignment(plan['candidates'])
+        for leg, swimmer_name in enumerate(picks):
+            log.debug("SQUADRUN: Using {} ({}) - {:.2f}s", swimmer_name, leg_labels[leg], plan['candidates'][leg][swimmer_name])
+        log.info("SQUADRUN: SUCCESS - Created {}-person mixed relay team with total time {:.2f}s", len(picks), total_time)
+        squadrun_relay_teams.append(format_relay_team(plan, picks))
+
+    return squadrun_relay_teams
+
+DEFAULT_OPTIMIZATION_CONFIG = {"maxIndividualEvents": 2, "competitionType": "arena_league"}
+
+# Type and minimum of each solver option; checked_config() drops values that do
+# not fit so the defaults apply.  Mirrors OPTIMIZER_OPTIONS in routes.ts.
+CONFIG_OPTION_TYPES = {
+    'maxIndividualEvents': (int, 0),
+    'maxRelayEvents': (int, 0),
+    'maxTotalEvents': (int, 0),
+    'relayWeight': (float, 0),
+    'relayTeamsPerEvent': (int, 1),
+    'alternatives': (int, 0),
+    'timeLimitMs': (float, 0),
+    'collectStats': (bool, None),
+    'solverMode': (str, None),
+    'individualSolver': (str, None),
+    'relaySolver': (str, None),
+    'indexBackend': (str, None),
+}
+NULLABLE_CONFIG_OPTIONS = ('maxRelayEvents', 'maxTotalEvents')  # None: unlimited
+
+def checked_config(config):
+    """Copy of ``config`` without the options whose value has the wrong type or
+    is below its minimum (see CONFIG_OPTION_TYPES); each one is logged."""
+    checked = dict(config)
+    for key, (kind, minimum) in CONFIG_OPTION_TYPES.items():
+        if key not in checked or (checked[key] is None and key in NULLABLE_CONFIG_OPTIONS):
+            continue
+        value = checked[key]
+        if kind is float:
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+        elif kind is int:
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        else:
+            valid = isinstance(value, kind)
+        if valid and minimum is not None:
+            valid = value >= minimum
+        if not valid:
+            log.error("ERROR: Invalid {} {!r}, using the default", key, value)
+            del checked[key]
+    return checked
+
+# Keys an input document (--stdin or a worker optimize call) must carry
+INPUT_DOCUMENT_REQUIRED = ('memberPbs', 'countyTimes', 'events')
+
+def read_member_pbs(lines):
+    """Available swimmers' PB rows from member_pbs.csv lines (header first).
+
+    Returns (swimmers, total_rows_processed); rows marked unavailable in the
+    isAvailable column are left out, as are rows whose AgeTime or
+    time_in_seconds is not a number.  Ages and times are converted to int
+    and float.
+    """
+    swimmers = []
+    total_rows_processed = 0
+    reader = csv.reader(lines)
+    header = next(reader, [])  # Skip header
+    log.debug("PYTHON DEBUG: CSV Header has {} columns: {}", len(header), header)
+    
+    for row in reader:
+        total_rows_processed += 1
+        log.sampled("PYTHON DEBUG: Row {}: Length={}, Course={}", total_rows_processed, len(row), row[8] if len(row) > 8 else 'N/A')
+        
+        if len(row) >= 14:  # Include all courses - SC and LC times
+            # CSV: First_Name,Last_Name,ASA_No,Date_of_Birth,Meet,Date,Event,SC_Time,Course,Gender,AgeTime,County_QT,Count_CT,County_Qualify,time_in_seconds,isAvailable
+            #      0         1          2      3             4     5    6      7        8       9       10      11        12       13             14             15
+            
+            # Check what's actually in the last column - if it's a time value, there's a backend issue
+            last_column = row[-1] if len(row) > 0 else "EMPTY"
+            second_last = row[-2] if len(row) > 1 else "EMPTY"
+            
+            log.sampled("PYTHON DEBUG: Swimmer {} {} - Row length: {}", row[0], row[1], len(row))
+            log.sampled("  Last column (index {}): '{}'", len(row) - 1, last_column)
+            log.sampled("  Second last (index {}): '{}'", len(row) - 2, second_last)
+            
+            # Robust availability detection
+            if len(row) >= 16:  # Has explicit availability column
+                availability_value = row[15]
+                log.sampled("PYTHON DEBUG: Using explicit availability column (index 15): '{}'", availability_value)
+            elif len(row) == 15:  # Old format without availability column
+                # If no availability column, assume all swimmers are available by default
+                availability_value = "true"
+                log.sampled("PYTHON DEBUG: No availability column found, defaulting to available")
+            else:
+                availability_value = "true"  # Default fallback
+                log.sampled("PYTHON DEBUG: Unexpected row length {}, defaulting to available", len(row))
+            
+            # Parse availability value
+            if availability_value and availability_value.strip():
+                is_available = availability_value.strip().lower() == 'true'
+            else:
+                is_available = True  # Default to available if missing or empty
+            
+            log.sampled("PYTHON DEBUG: Final availability decision: '{}' -> is_available: {}", availability_value, is_available)
+            if is_available:
+                # CSV structure: First_Name,Last_Name,ASA_No,Date_of_Birth,Meet,Date,Event,SC_Time,Course,Gender,AgeTime,County_QT,Count_CT,County_Qualify,time_in_seconds,isAvailable
+                #                0           1          2       3             4     5    6      7        8       9       10      11        12       13             14             15
+                # time_in_seconds is at index 14, availability is at index 15
+                try:
+                    age = int(row[10])
+                    time_seconds = float(row[14])  # time_in_seconds column
+                except ValueError:
+                    log.warning("WARNING: Skipping {} {} {}: unreadable AgeTime '{}' or time_in_seconds '{}'",
+                                row[0], row[1], row[6], row[10], row[14])
+                    continue
+                swimmers.append(SwimmerPB(row[0], row[1], row[6], row[9], age, time_seconds, row[2]))
+                log.sampled("PYTHON: ✓ Including available swimmer {} {} (time: {})", row[0], row[1], time_seconds)
+            else:
+                log.sampled("PYTHON: ✗ EXCLUDING unavailable swimmer {} {}", row[0], row[1])
+        else:
+            log.sampled("PYTHON DEBUG: Skipping row - Length: {}, Course: {}", len(row), row[8] if len(row) > 8 else 'N/A')
+
+    return swimmers, total_rows_processed
 
-@dataclass
-class RelaySwimmer:
-    name: str
-    age: int
-    gender: str
-    # Store times for different distances
-    freestyle_50: float = None
-    freestyle_100: float = None
-    freestyle_200: float = None
-    backstroke_50: float = None
-    backstroke_100: float = None
-    backstroke_200: float = None
-    breaststroke_50: float = None
-    breaststroke_100: float = None
-    breaststroke_200: float = None
-    butterfly_50: float = None
-    butterfly_100: float = None
-    butterfly_200: float = None
-
-    def __hash__(self):
-        return hash(self.name)
+def main():
+    configure_logging(sys.argv[1:], os.environ)
+    configure_result_cache(sys.argv[1:], os.environ)
+    configure_profiling(sys.argv[1:], os.environ)
 
-def extract_relay_distance(event_name):
-    """Extract the distance per leg from relay event name"""
-    import re
-    # Look for patterns like "4 x 100m" or "4x100m"
-    match = re.search(r'(\d+)\s*x\s*(\d+)m', event_name)
-    if match:
-        return int(match.group(2))  # Return the distance (100, 200, etc.)
-    return 50  # Default to 50m if no distance found
+    if '--worker' in sys.argv[1:]:
+        OptimizerWorker().serve(sys.stdin, sys.stdout)
+        return 0
+
+    if '--stdin' in sys.argv[1:]:
+        # One input document on stdin instead of the files below
+        document, error = read_input_document(sys.stdin)
+        if error:
+            log.error("ERROR: {}", error)
+            result = OptimizationResult(error=error)
+        else:
+            result = run_profiled(document, lambda: optimize_document(document))
+        print(json.dumps(result.to_dict()))
+        return 1 if result.error else 0
 
-def main():
     # Use fixed file names like the original script
     member_pbs_file = 'member_pbs.csv'
     county_times_file = 'county_times_cleaned.csv'
@@ -74,25 +2049,26 @@ def main():
     config_file = 'optimization_config.json'
 
     # Load optimization configuration
-    optimization_config = {"maxIndividualEvents": 2, "competitionType": "arena_league"}
+    optimization_config = dict(DEFAULT_OPTIMIZATION_CONFIG)
     try:
         with open(config_file, 'r') as f:
             optimization_config = json.load(f)
-        print(f"LOADED OPTIMIZATION CONFIG: {optimization_config}", file=sys.stderr)
+        log.info("LOADED OPTIMIZATION CONFIG: {}", optimization_config)
     except Exception as e:
-        print(f"ERROR LOADING CONFIG: {e}", file=sys.stderr)
+        log.error("ERROR LOADING CONFIG: {}", e)
         pass  # Use defaults
+    load_stats = RunStats() if optimization_config.get('collectStats') else None
     
     # Load dynamic event list
     event_list = []
     try:
         with open(event_list_file, 'r') as f:
             event_list = json.load(f)
-        print(f"LOADED EVENT LIST: {len(event_list)} events", file=sys.stderr)
+        log.info("LOADED EVENT LIST: {} events", len(event_list))
         if event_list:
-            print(f"FIRST FEW EVENTS: {event_list[:3]}", file=sys.stderr)
+            log.debug("FIRST FEW EVENTS: {}", event_list[:3])
     except Exception as e:
-        print(f"ERROR LOADING EVENT LIST: {e}", file=sys.stderr)
+        log.error("ERROR LOADING EVENT LIST: {}", e)
         # Fallback to default Arena League events
         event_list = [
             ['50m Freestyle', 11, 'Male'],
@@ -130,184 +2106,158 @@ def main():
             ['100m Butterfly', 16, 'Female'],
             ['200m Individual Medley', 16, 'Female']
         ]
-        print(f"USING FALLBACK EVENT LIST: {len(event_list)} events", file=sys.stderr)
+        log.info("USING FALLBACK EVENT LIST: {} events", len(event_list))
 
     # Load pre-assignments
     pre_assignments = {"individual": [], "relay": []}
     try:
         with open(pre_assignments_file, 'r') as f:
             pre_assignments = json.load(f)
-        print(f"LOADED PRE-ASSIGNMENTS: {pre_assignments}", file=sys.stderr)
+        log.debug("LOADED PRE-ASSIGNMENTS: {}", pre_assignments)
     except Exception as e:
-        print(f"ERROR LOADING PRE-ASSIGNMENTS: {e}", file=sys.stderr)
+        log.error("ERROR LOADING PRE-ASSIGNMENTS: {}", e)
         pass  # No pre-assignments file or empty
 
     # Load swimmer data - ONLY AVAILABLE SWIMMERS
-    swimmer_list = []
-    total_rows_processed = 0
     with open(member_pbs_file, newline='') as f:
-        reader = csv.reader(f)
-        header = next(reader)  # Skip header
-        print(f"PYTHON DEBUG: CSV Header has {len(header)} columns: {header}", file=sys.stderr)
-        
-        for row in reader:
-            total_rows_processed += 1
-            print(f"PYTHON DEBUG: Row {total_rows_processed}: Length={len(row)}, Course={row[8] if len(row) > 8 else 'N/A'}", file=sys.stderr)
-            
-            if len(row) >= 14:  # Include all courses - SC and LC times
-                # CSV: First_Name,Last_Name,ASA_No,Date_of_Birth,Meet,Date,Event,SC_Time,Course,Gender,AgeTime,County_QT,Count_CT,County_Qualify,time_in_seconds,isAvailable
-                #      0         1          2      3             4     5    6      7        8       9       10      11        12       13             14             15
-                
-                # Check what's actually in the last column - if it's a time value, there's a backend issue
-                last_column = row[-1] if len(row) > 0 else "EMPTY"
-                second_last = row[-2] if len(row) > 1 else "EMPTY"
-                
-                print(f"PYTHON DEBUG: Swimmer {row[0]} {row[1]} - Row length: {len(row)}", file=sys.stderr)
-                print(f"  Last column (index {len(row)-1}): '{last_column}'", file=sys.stderr)
-                print(f"  Second last (index {len(row)-2}): '{second_last}'", file=sys.stderr)
-                
-                # Robust availability detection
-                if len(row) >= 16:  # Has explicit availability column
-                    availability_value = row[15]
-                    print(f"PYTHON DEBUG: Using explicit availability column (index 15): '{availability_value}'", file=sys.stderr)
-                elif len(row) == 15:  # Old format without availability column
-                    # If no availability column, assume all swimmers are available by default
-                    availability_value = "true"
-                    print(f"PYTHON DEBUG: No availability column found, defaulting to available", file=sys.stderr)
-                else:
-                    availability_value = "true"  # Default fallback
-                    print(f"PYTHON DEBUG: Unexpected row length {len(row)}, defaulting to available", file=sys.stderr)
-                
-                # Parse availability value
-                if availability_value and availability_value.strip():
-                    is_available = availability_value.strip().lower() == 'true'
-                else:
-                    is_available = True  # Default to available if missing or empty
-                
-                print(f"PYTHON DEBUG: Final availability decision: '{availability_value}' -> is_available: {is_available}", file=sys.stderr)
-                if is_available:
-                    # CSV structure: First_Name,Last_Name,ASA_No,Date_of_Birth,Meet,Date,Event,SC_Time,Course,Gender,AgeTime,County_QT,Count_CT,County_Qualify,time_in_seconds,isAvailable
-                    #                0           1          2       3             4     5    6      7        8       9       10      11        12       13             14             15
-                    # time_in_seconds is at index 14, availability is at index 15
-                    time_seconds = row[14]  # time_in_seconds column
-                    swimmer_list.append([row[0], row[1], row[6], row[9], row[10], time_seconds, row[2]])  # Added ASA number at end
-                    print(f"PYTHON: ✓ Including available swimmer {row[0]} {row[1]} (time: {time_seconds})", file=sys.stderr)
-                else:
-                    print(f"PYTHON: ✗ EXCLUDING unavailable swimmer {row[0]} {row[1]}", file=sys.stderr)
-            else:
-                print(f"PYTHON DEBUG: Skipping row - Length: {len(row)}, Course: {row[8] if len(row) > 8 else 'N/A'}", file=sys.stderr)
+        swimmers, total_rows_processed = read_member_pbs(f)
     
-    print(f"PYTHON: Processed {total_rows_processed} total rows from CSV", file=sys.stderr)
+    log.info("PYTHON: Processed {} total rows from CSV", total_rows_processed)
     
-    print(f"PYTHON: Final swimmer count after availability filtering: {len(swimmer_list)} swimmers", file=sys.stderr)
-    
-    # Early exit if no swimmers are available
-    if len(swimmer_list) == 0:
-        print("ERROR: No available swimmers found after filtering", file=sys.stderr)
-        error_result = {
-            "individual": [],
-            "relay": [],
-            "stats": {
-                "qualifyingTimes": 0,
-                "averageIndex": 0,
-                "relayTeams": 0,
-                "totalEvents": 0
-            },
-            "error": "No available swimmers found for optimization"
-        }
-        print(json.dumps(error_result))
-        sys.exit(1)
+    log.info("PYTHON: Final swimmer count after availability filtering: {} swimmers", len(swimmers))
     
-    # Write detailed debug output to file
-    try:
-        with open('debug_output.txt', 'w') as debug_file:
-            debug_file.write("=== SWIMMER AVAILABILITY DEBUG OUTPUT ===\n\n")
-            debug_file.write(f"Total swimmers processed from CSV: {total_rows_processed}\n")
-            debug_file.write(f"Swimmers included in optimization: {len(swimmer_list)}\n\n")
+    # Write detailed debug output to file (debug level only)
+    if log.enabled('debug'):
+        try:
+            with open('debug_output.txt', 'w') as debug_file:
+                debug_file.write("=== SWIMMER AVAILABILITY DEBUG OUTPUT ===\n\n")
+                debug_file.write(f"Total swimmers processed from CSV: {total_rows_processed}\n")
+                debug_file.write(f"Swimmers included in optimization: {len(swimmers)}\n\n")
             
-            debug_file.write("SWIMMERS INCLUDED IN OPTIMIZATION:\n")
-            for i, swimmer in enumerate(swimmer_list):
-                debug_file.write(f"  {i+1}. {swimmer[0]} {swimmer[1]} (ASA: {swimmer[6]})\n")
+                debug_file.write("SWIMMERS INCLUDED IN OPTIMIZATION:\n")
+                for i, swimmer in enumerate(swimmers):
+                    debug_file.write(f"  {i+1}. {swimmer.first_name} {swimmer.last_name} (ASA: {swimmer.asa_number})\n")
             
-            if len(swimmer_list) == 0:
-                debug_file.write("  >>> NO SWIMMERS INCLUDED - FILTERING BUG DETECTED! <<<\n")
+                if len(swimmers) == 0:
+                    debug_file.write("  >>> NO SWIMMERS INCLUDED - FILTERING BUG DETECTED! <<<\n")
             
-            debug_file.write(f"\nProceeding to optimization with {len(swimmer_list)} swimmers...\n\n")
-    except Exception as e:
-        print(f"DEBUG FILE ERROR: {e}", file=sys.stderr)
+                debug_file.write(f"\nProceeding to optimization with {len(swimmers)} swimmers...\n\n")
+        except Exception as e:
+            log.warning("DEBUG FILE ERROR: {}", e)
 
     # Load county times
-    county_times = []
     with open(county_times_file, newline='') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header
-        for row in reader:
-            if len(row) >= 6 and row[4] == 'QT':
-                county_times.append([row[0], convert_to_seconds_with_milliseconds(row[1]), row[2], row[5]])
+        standards = build_county_standards(f)
+    if load_stats is not None:
+        load_stats.count('rowsRead', total_rows_processed)
+        load_stats.lap('load')
+
+    if profile_every_run:
+        # Record the inputs as a document, so the run replays with --stdin
+        with open(member_pbs_file, newline='') as f:
+            member_pbs_csv = f.read()
+        with open(county_times_file, newline='') as f:
+            county_times_csv = f.read()
+        document = {'memberPbs': member_pbs_csv, 'countyTimes': county_times_csv, 'events': event_list,
+                    'preAssignments': pre_assignments, 'config': optimization_config}
+    else:
+        document = {}
+    with collecting_stats(optimization_config, load_stats):
+        result = run_profiled(document, lambda: optimize(swimmers, event_list, standards, pre_assignments, optimization_config))
+
+    # Output results as JSON
+    print(json.dumps(result.to_dict()))
+    return 1 if result.error else 0
+
+def optimize(swimmers, events, standards, pre_assignments=None, config=None, relays=True):
+    """Allocate swimmers to individual events and build relay teams, in memory.
+
+    ``swimmers`` is a list of SwimmerPB (available swimmers only, see
+    read_member_pbs), ``events`` a list of [event_name, age, gender] (relays
+    included), ``standards`` the index from build_county_standards,
+    ``pre_assignments`` the {"individual": [...], "relay": [...]} document
+    and ``config`` the optimization config.  Inputs are not modified.
+    With ``relays=False`` no relay teams are built, not even the default
+    4x50m relays used when ``events`` lists none.  Returns an
+    OptimizationResult.
+
+    When a result cache is configured (configure_result_cache) identical
+    inputs are answered from it, with ``cache_hit`` set.  With
+    ``collectStats`` in the config the result carries phase timings and work
+    counters (see RunStats).
+    """
+    with collecting_stats(config) as stats:
+        result = solve_cached(swimmers, events, standards, pre_assignments, config, relays)
+        if stats is not None:
+            result.stats = stats.to_dict()
+    return result
 
-    # Event list is now loaded dynamically from event_list.json file above
+def solve_cached(swimmers, events, standards, pre_assignments, config, relays=True):
+    """solve_lineup() behind the result cache, if one is configured."""
+    if result_cache is None:
+        return solve_lineup(swimmers, events, standards, pre_assignments, config, relays)
+    started = perf_counter()
+    key = input_fingerprint(swimmers, events, standards, pre_assignments, config, relays)
+    cached = result_cache.get(key)
+    stats_lap('cacheLookup')
+    if cached is not None:
+        log.info("RESULT CACHE: hit {}", key[:12])
+        search = cached.get('search')
+        if search is not None:
+            # Timings describe this call, not the run that filled the cache
+            search = dict(search, elapsedMs=round((perf_counter() - started) * 1000, 3))
+        return OptimizationResult(individual=cached['individual'], relay=cached['relay'],
+                                  alternatives=cached.get('alternatives'), search=search, cache_hit=True)
+    result = solve_lineup(swimmers, events, standards, pre_assignments, config, relays)
+    # A line-up cut short by timeLimitMs depends on machine load; a later run may do better
+    if result.error is None and not (result.search is not None and result.search['timedOut']):
+        entry = {'individual': result.individual, 'relay': result.relay}
+        if result.alternatives is not None:
+            entry['alternatives'] = result.alternatives
+        if result.search is not None:
+            entry['search'] = {name: value for name, value in result.search.items() if name != 'elapsedMs'}
+        result_cache.put(key, entry)
+    result.cache_hit = False
+    return result
+
+def solve_lineup(swimmers, events, standards, pre_assignments=None, config=None, relays=True):
+    """optimize() without the result cache."""
+    # Early exit if no swimmers are available
+    if len(swimmers) == 0:
+        log.error("ERROR: No available swimmers found after filtering")
+        return OptimizationResult(error="No available swimmers found for optimization")
+
+    swimmer_list = [swimmer.as_row() for swimmer in swimmers]
+    event_list = [list(event[:3]) for event in events]
+    pre_assignments = pre_assignments or {"individual": [], "relay": []}
+    optimization_config = checked_config(config) if config is not None else dict(DEFAULT_OPTIMIZATION_CONFIG)
+
+    # The time limit counts from here, so it covers eligibility and standards too
+    started = perf_counter()
+    time_limit = optimization_config.get("timeLimitMs")
+    deadline = None if time_limit is None else started + time_limit * SEARCH_TIME_SHARE / 1000
+    search = None
 
     # Build full list with qualifying times
+    swimmer_index = build_swimmer_index(swimmer_list)
     full_list = []
     for event in event_list:
-        for swimmer in swimmer_list:
-            if swimmer[3] != event[2]:
-                continue
-            if swimmer[2] != event[0]:
-                continue
-            if int(swimmer[4]) > event[1]:
-                continue
-            else:
-                full_list.append([event[0], event[1], event[2], swimmer[0], swimmer[1], float(swimmer[5]), swimmer[6]])  # swimmer[6] is now ASA number
-
-    # Append qualifying time to each entry
-    for i in range(len(full_list)):
-        for time in county_times:
-            if (
-                time[0] == full_list[i][0] and
-                int(time[2]) == full_list[i][1] and
-                time[3] == full_list[i][2]
-            ):
-                full_list[i].append(time[1])
-                break
-        else:
-            # For Open category (age 99), use age 17 county times as baseline
-            if full_list[i][1] == 99:  # Open category
-                for time in county_times:
-                    if (
-                        time[0] == full_list[i][0] and
-                        int(time[2]) == 17 and  # Use age 17 baseline for Open
-                        time[3] == full_list[i][2]
-                    ):
-                        full_list[i].append(time[1])
-                        break
-            # For age 10 and under, use age 11 county times as minimum
-            elif full_list[i][1] <= 10:
-                for time in county_times:
-                    if (
-                        time[0] == full_list[i][0] and
-                        int(time[2]) == 11 and  # Use age 11 as minimum baseline
-                        time[3] == full_list[i][2]
-                    ):
-                        full_list[i].append(time[1])
-                        break
-
-    # Calculate differences and indices
-    for row in full_list:
-        if len(row) > 7:  # Now we have 8 elements: event, age, gender, first_name, last_name, time, asa_no, qualifying_time
-            swimmer_time = float(row[5])  # swimmer time
-            qualifying_time = row[7]      # qualifying time (appended in previous loop)
-            diff = round(swimmer_time - qualifying_time, 2)
-            index = round(diff / qualifying_time, 3)
-            row.append(diff)
-            row.append(index)
-        else:
-            # This should rarely happen now since Open category uses age 17 baseline
-            row.append(None)  # diff
-            row.append(999999)  # High index for entries without qualifying time
+        for swimmer in eligible_rows(swimmer_index, event[0], event[1], event[2]):
+            full_list.append([event[0], event[1], event[2], swimmer[0], swimmer[1], float(swimmer[5]), swimmer[6]])  # swimmer[6] is now ASA number
+    stats_count('swimmerRows', len(swimmer_list))
+    stats_count('eligibleEntries', len(full_list))
+    stats_lap('eligibility')
 
-    # Sort by index
-    full_list.sort(key=lambda x: (x[-1] is None, x[-1]))
+    # Qualifying times, differences and indices, then sort by index
+    backend = optimization_config.get("indexBackend", "python")
+    if backend not in INDEX_BACKENDS:
+        log.error("ERROR: Unknown indexBackend '{}', using python", backend)
+        backend = 'python'
+    if backend == 'numpy' and np is None:
+        log.warning("WARNING: indexBackend 'numpy' needs NumPy, which is not installed; using python")
+        backend = 'python'
+    INDEX_BACKENDS[backend](full_list, standards)
+    stats_lap('standards')
 
     # Initialize event assignments
     for event in event_list:
@@ -321,27 +2271,28 @@ def main():
     # Handle pre-assigned individual events BEFORE optimization
     swimmer_event_count = {}
     protected_events = set()  # Tracks pre-assigned events to prevent overwrites
-    print(f"PYTHON: Processing {len(pre_assignments.get('individual', []))} pre-assignments", file=sys.stderr)
+    log.info("PYTHON: Processing {} pre-assignments", len(pre_assignments.get('individual', [])))
     
     if len(pre_assignments.get('individual', [])) > 0:
         first_assignment = pre_assignments['individual'][0]
-        print(f"PYTHON: First assignment is {first_assignment}", file=sys.stderr)
+        log.debug("PYTHON: First assignment is {}", first_assignment)
     
-    print(f"Processing {len(pre_assignments.get('individual', []))} pre-assignments", file=sys.stderr)
+    log.info("Processing {} pre-assignments", len(pre_assignments.get('individual', [])))
     
     for assignment in pre_assignments.get("individual", []):
-        print(f"Processing assignment: {assignment}", file=sys.stderr)
+        log.debug("Processing assignment: {}", assignment)
         # Find swimmer by ASA number (index 6 in full_list)
         swimmer_name = None
         
         # Enhanced debugging for ASA number matching
         target_asa = str(assignment['swimmerId']).strip()
-        print(f"DEBUG: Looking for ASA '{target_asa}' (type: {type(assignment['swimmerId'])}) in {len(full_list)} swimmers", file=sys.stderr)
+        log.debug("DEBUG: Looking for ASA '{}' (type: {}) in {} swimmers", target_asa, type(assignment['swimmerId']), len(full_list))
         
         # Show sample of available ASA numbers for debugging
-        for i, time_row in enumerate(full_list[:10]):  # Show first 10 for debugging
-            row_asa = str(time_row[6]).strip()
-            print(f"  Row {i}: ASA='{row_asa}' (type: {type(time_row[6])}), Name={time_row[3]} {time_row[4]}", file=sys.stderr)
+        if log.enabled('debug'):
+            for i, time_row in enumerate(full_list[:10]):  # Show first 10 for debugging
+                row_asa = str(time_row[6]).strip()
+                log.debug("  Row {}: ASA='{}' (type: {}), Name={} {}", i, row_asa, type(time_row[6]), time_row[3], time_row[4])
         
         # Fixed ASA matching - ASA number is now correctly at index 6
         for time_row in full_list:
@@ -351,12 +2302,12 @@ def main():
                 
                 if target_asa == swimmer_asa:
                     swimmer_name = f"{time_row[3]} {time_row[4]}"
-                    print(f"SUCCESS: Found swimmer '{swimmer_name}' for ASA '{target_asa}'", file=sys.stderr)
+                    log.info("SUCCESS: Found swimmer '{}' for ASA '{}'", swimmer_name, target_asa)
                     break
         
         # Fallback: try name-based matching if ASA fails
         if not swimmer_name:
-            print(f"WARNING: ASA match failed for '{target_asa}', attempting name-based fallback...", file=sys.stderr)
+            log.warning("WARNING: ASA match failed for '{}', attempting name-based fallback...", target_asa)
             # This would require swimmer name in assignment data - skip for now
         
         if swimmer_name:
@@ -373,14 +2324,14 @@ def main():
             }
             gender_match = gender_mapping.get(original_gender)
             if not gender_match:
-                print(f"ERROR: Unknown gender format '{original_gender}' in assignment", file=sys.stderr)
+                log.error("ERROR: Unknown gender format '{}' in assignment", original_gender)
                 continue
             
-            print(f"DEBUG: Gender conversion '{original_gender}' -> '{gender_match}'", file=sys.stderr)
-            print(f"Looking for event: {event_match}, {age_match}, {gender_match}", file=sys.stderr)
-            print(f"Available events: {len(event_list)}", file=sys.stderr)
+            log.debug("DEBUG: Gender conversion '{}' -> '{}'", original_gender, gender_match)
+            log.debug("Looking for event: {}, {}, {}", event_match, age_match, gender_match)
+            log.debug("Available events: {}", len(event_list))
             for i, event in enumerate(event_list[:5]):  # Show first 5 events
-                print(f"  Event {i}: {event[0]}, {event[1]}, {event[2]}, Status: {event[-1]}", file=sys.stderr)
+                log.debug("  Event {}: {}, {}, {}, Status: {}", i, event[0], event[1], event[2], event[-1])
             
             event_found = False
             event_already_assigned = False
@@ -395,66 +2346,36 @@ def main():
                         # Event is available - assign it
                         event[-1] = swimmer_name
                         protected_events.add((event[0], event[1], event[2]))  # Protect this event
-                        print(f"SUCCESS: Pre-assigned {swimmer_name} to {event_match} {age_match} {gender_match}", file=sys.stderr)
+                        log.info("SUCCESS: Pre-assigned {} to {} {} {}", swimmer_name, event_match, age_match, gender_match)
                         swimmer_event_count[swimmer_name] = swimmer_event_count.get(swimmer_name, 0) + 1
                         event_found = True
                     else:
                         # Event already has someone assigned
-                        print(f"WARNING: Event {event_match} {age_match} {gender_match} already assigned to {event[-1]}", file=sys.stderr)
+                        log.warning("WARNING: Event {} {} {} already assigned to {}", event_match, age_match, gender_match, event[-1])
                         event_already_assigned = True
                     break
             
             if not event_found and not event_already_assigned:
-                print(f"ERROR: Event not found in event list: {event_match} {age_match} {gender_match}", file=sys.stderr)
-                print(f"Available events matching gender {gender_match}:", file=sys.stderr)
+                log.error("ERROR: Event not found in event list: {} {} {}", event_match, age_match, gender_match)
+                log.debug("Available events matching gender {}:", gender_match)
                 for event in event_list[:10]:
                     if event[2] == gender_match:
-                        print(f"  - {event[0]} {event[1]} {event[2]}", file=sys.stderr)
+                        log.debug("  - {} {} {}", event[0], event[1], event[2])
         else:
-            print(f"ERROR: Could not find swimmer with ASA: {assignment['swimmerId']}", file=sys.stderr)
-            print("Available ASA numbers:", [row[6] for row in full_list[:5]], file=sys.stderr)
+            log.error("ERROR: Could not find swimmer with ASA: {}", assignment['swimmerId'])
+            log.debug("Available ASA numbers:")
 
     # Show summary of pre-assignments before optimization
-    print(f"SUMMARY: {len(protected_events)} events are protected from optimization:", file=sys.stderr)
+    log.info("SUMMARY: {} events are protected from optimization:", len(protected_events))
     for protected in protected_events:
-        print(f"  - {protected[0]} {protected[1]} {protected[2]}", file=sys.stderr)
-
-    # Allocate swimmers to events (max 2 per swimmer)
-    optimization_assignments = 0
-    for time in full_list:
-        swimmer_name = time[-1]
-        
-        # Check current allocation count including pre-assignments
-        current_count = swimmer_event_count.get(swimmer_name, 0)
-        allocated_count = sum(1 for event in event_list if event[-1] == swimmer_name)
-        total_count = max(current_count, allocated_count)
+        log.debug("  - {} {} {}", protected[0], protected[1], protected[2])
 
-        if total_count >= optimization_config.get("maxIndividualEvents", 2):
-            continue
-
-        for event in event_list:
-            if event[0] == time[0] and event[1] == time[1] and event[2] == time[2]:
-                # Skip protected events - THIS IS CRITICAL
-                event_key = (event[0], event[1], event[2])
-                if event_key in protected_events:
-                    print(f"PROTECTION: Skipping protected event {event[0]} {event[1]} {event[2]} (assigned to {event[-1]})", file=sys.stderr)
-                    continue
-                    
-                if event[-1] == 'Not allocated':
-                    event[-1] = swimmer_name
-                    swimmer_event_count[swimmer_name] = swimmer_event_count.get(swimmer_name, 0) + 1
-                    optimization_assignments += 1
-                    print(f"AUTO-ASSIGNED: {swimmer_name} to {event[0]} {event[1]} {event[2]}", file=sys.stderr)
-                    break
-    
-    print(f"OPTIMIZATION COMPLETE: {optimization_assignments} events auto-assigned, {len(protected_events)} pre-assigned", file=sys.stderr)
-    
     # Process relay pre-assignments BEFORE relay optimization
     relay_protected_assignments = {}  # Track pre-assigned positions per relay
-    print(f"PYTHON: Processing {len(pre_assignments.get('relay', []))} relay pre-assignments", file=sys.stderr)
+    log.info("PYTHON: Processing {} relay pre-assignments", len(pre_assignments.get('relay', [])))
     
     for relay_assignment in pre_assignments.get("relay", []):
-        print(f"Processing relay assignment: {relay_assignment}", file=sys.stderr)
+        log.debug("Processing relay assignment: {}", relay_assignment)
         
         # Extract relay assignment details
         relay_name = relay_assignment['relayName']
@@ -467,7 +2388,7 @@ def main():
         # Find swimmer by ASA number in the original swimmer_list (used for relay building)
         swimmer_name = None
         target_asa = str(swimmer_id).strip()
-        print(f"DEBUG: Looking for relay swimmer ASA '{target_asa}' in swimmer_list", file=sys.stderr)
+        log.debug("DEBUG: Looking for relay swimmer ASA '{}' in swimmer_list", target_asa)
         
         for swimmer_row in swimmer_list:
             # swimmer_list structure: [firstName, lastName, event, gender, ageTime, timeSeconds, asaNo]
@@ -475,19 +2396,19 @@ def main():
                 swimmer_asa = str(swimmer_row[6]).strip() if swimmer_row[6] else None  # ASA number at index 6
                 if target_asa == swimmer_asa:
                     swimmer_name = f"{swimmer_row[0]} {swimmer_row[1]}"  # First_Name is index 0, Last_Name is index 1
-                    print(f"SUCCESS: Found relay swimmer '{swimmer_name}' for ASA '{target_asa}'", file=sys.stderr)
+                    log.info("SUCCESS: Found relay swimmer '{}' for ASA '{}'", swimmer_name, target_asa)
                     break
         
-        if not swimmer_name:
+        if not swimmer_name and log.enabled('debug'):
             # Debug: Show a sample of swimmers in swimmer_list for troubleshooting
-            print(f"RELAY DEBUG: swimmer_list contains {len(swimmer_list)} entries. Sample of swimmers:", file=sys.stderr)
+            log.debug("RELAY DEBUG: swimmer_list contains {} entries. Sample of swimmers:", len(swimmer_list))
             unique_swimmers = set()
             for row in swimmer_list:
                 if len(row) >= 7:
                     swimmer_info = f"{row[0]} {row[1]} (ASA: {row[6]})"
                     unique_swimmers.add(swimmer_info)
                     if len(unique_swimmers) <= 5:  # Show first 5 unique swimmers
-                        print(f"  - {swimmer_info}", file=sys.stderr)
+                        log.debug("  - {}", swimmer_info)
         
         if swimmer_name:
             # Normalize gender format for consistent key matching
@@ -507,93 +2428,27 @@ def main():
                 'swimmer': swimmer_name,
                 'stroke': stroke
             }
-            print(f"SUCCESS: Pre-assigned {swimmer_name} to {relay_name} {age_category} {normalized_gender} position {position} ({stroke or 'freestyle'})", file=sys.stderr)
+            log.info("SUCCESS: Pre-assigned {} to {} {} {} position {} ({})", swimmer_name, relay_name, age_category, normalized_gender, position, stroke or 'freestyle')
         else:
-            print(f"ERROR: Could not find relay swimmer with ASA: {swimmer_id}", file=sys.stderr)
+            log.error("ERROR: Could not find relay swimmer with ASA: {}", swimmer_id)
     
     # Show summary of relay pre-assignments
-    print(f"RELAY SUMMARY: {len(relay_protected_assignments)} relays have pre-assignments:", file=sys.stderr)
+    log.info("RELAY SUMMARY: {} relays have pre-assignments:", len(relay_protected_assignments))
     for relay_key, positions in relay_protected_assignments.items():
         relay_name, age_cat, gender = relay_key
-        print(f"  - {relay_name} {age_cat} {gender}: {len(positions)} pre-assigned positions", file=sys.stderr)
+        log.debug("  - {} {} {}: {} pre-assigned positions", relay_name, age_cat, gender, len(positions))
         for pos, assignment in positions.items():
-            print(f"    Position {pos}: {assignment['swimmer']} ({assignment['stroke'] or 'freestyle'})", file=sys.stderr)
+            log.debug("    Position {}: {} ({})", pos, assignment['swimmer'], assignment['stroke'] or 'freestyle')
+    stats_lap('preAssignments')
     
-    # Add optimization results to debug file
-    with open('debug_output.txt', 'a') as debug_file:
-        debug_file.write("=== OPTIMIZATION RESULTS ===\n")
-        debug_file.write(f"Events auto-assigned: {optimization_assignments}\n")
-        debug_file.write(f"Events pre-assigned: {len(protected_events)}\n\n")
-        
-        debug_file.write("FINAL EVENT ASSIGNMENTS:\n")
-        assigned_events = [event for event in event_list if event[-1] != 'Not allocated']
-        unassigned_events = [event for event in event_list if event[-1] == 'Not allocated']
-        
-        for i, event in enumerate(assigned_events):
-            debug_file.write(f"  {i+1}. {event[1]}U {event[2]} {event[0]} -> {event[-1]}\n")
-        
-        debug_file.write(f"\nUnassigned events: {len(unassigned_events)}\n")
-        for event in unassigned_events[:5]:  # Show first 5 unassigned
-            debug_file.write(f"  - {event[1]}U {event[2]} {event[0]}\n")
-        
-        if len(assigned_events) == 0:
-            debug_file.write("  >>> NO EVENTS ASSIGNED - OPTIMIZATION FAILED! <<<\n")
-
-    # Build relay swimmers
-    relay_swimmers = {}
-    for row in swimmer_list:
-        name = f"{row[0]} {row[1]}"
-        stroke = row[2]
-        try:
-            time = float(row[5])
-        except (TypeError, ValueError):
-            continue
-
-        age = int(row[4])
-        gender = row[3]
+    # Build relay swimmers from the same PB index
+    relay_swimmers = build_relay_swimmers(swimmer_index) if relays else {}
 
-        if name not in relay_swimmers:
-            relay_swimmers[name] = RelaySwimmer(name=name, age=age, gender=gender)
-
-        # Store times for all distances
-        if "Freestyle" in stroke:
-            if stroke == "50m Freestyle":
-                relay_swimmers[name].freestyle_50 = time
-            elif stroke == "100m Freestyle":
-                relay_swimmers[name].freestyle_100 = time
-            elif stroke == "200m Freestyle":
-                relay_swimmers[name].freestyle_200 = time
-        elif "Backstroke" in stroke:
-            if stroke == "50m Backstroke":
-                relay_swimmers[name].backstroke_50 = time
-            elif stroke == "100m Backstroke":
-                relay_swimmers[name].backstroke_100 = time
-            elif stroke == "200m Backstroke":
-                relay_swimmers[name].backstroke_200 = time
-        elif "Breaststroke" in stroke:
-            if stroke == "50m Breaststroke":
-                relay_swimmers[name].breaststroke_50 = time
-            elif stroke == "100m Breaststroke":
-                relay_swimmers[name].breaststroke_100 = time
-            elif stroke == "200m Breaststroke":
-                relay_swimmers[name].breaststroke_200 = time
-        elif "Butterfly" in stroke:
-            if stroke == "50m Butterfly":
-                relay_swimmers[name].butterfly_50 = time
-            elif stroke == "100m Butterfly":
-                relay_swimmers[name].butterfly_100 = time
-            elif stroke == "200m Butterfly":
-                relay_swimmers[name].butterfly_200 = time
-
-    # Generate relay teams from dynamic event list
-    freestyle_relay_teams = []
-    medley_relay_teams = []
-    
     # Extract relay events from the loaded event list
-    relay_events = [event for event in event_list if len(event) >= 3 and ('relay' in event[0].lower() or 'x' in event[0].lower() or 'squadrun' in event[0].lower())]
+    relay_events = [event for event in event_list if len(event) >= 3 and is_relay_event(event[0])] if relays else []
     
     # If no relay events in the dynamic list, fall back to age group iteration for all relays
-    if not relay_events:
+    if not relay_events and relays:
         # Fallback to hardcoded age groups only if no relay events are defined
         relay_age_groups = [11, 13, 15, 16]
         relay_genders = ['Male', 'Female']
@@ -613,588 +2468,168 @@ def main():
                 relay_events_dict[key] = []
             relay_events_dict[key].append(event[0])  # event name
     
-    print(f"PYTHON: Processing {len(relay_events)} relay events from dynamic list", file=sys.stderr)
+    log.info("PYTHON: Processing {} relay events from dynamic list", len(relay_events))
     for event in relay_events[:5]:  # Show first 5
-        print(f"PYTHON: Relay event: {event}", file=sys.stderr)
+        log.debug("PYTHON: Relay event: {}", event)
+    stats_count('relaySwimmers', len(relay_swimmers))
+    stats_lap('relaySwimmers')
     
-    # Process each age/gender combination
-    for (age, gender) in relay_events_dict:
-        event_names = relay_events_dict[(age, gender)]
-        
-        # Use appropriate age filter based on Open events (age 99 means Open, so no age limit)
-        if age == 99:
-            group = [s for s in relay_swimmers.values() if s.gender == gender]
+    solver_mode = optimization_config.get("solverMode", "sequential")
+    if solver_mode not in SOLVER_MODES:
+        log.error("ERROR: Unknown solverMode '{}', using sequential", solver_mode)
+        solver_mode = "sequential"
+    relay_solver = optimization_config.get("relaySolver", "per_event")
+    if relay_solver not in RELAY_SOLVERS:
+        log.error("ERROR: Unknown relaySolver '{}', using per_event", relay_solver)
+        relay_solver = "per_event"
+
+    allocation = AllocationState(event_list, protected_events, swimmer_event_count, full_list)
+    alternatives = None
+    alternative_count = optimization_config.get("alternatives", 0)
+    if solver_mode == "joint":
+        # Individual events and relays share the per-swimmer load caps
+        relay_plans = build_relay_plans(relay_events, relay_swimmers, relay_protected_assignments)
+        if deadline is None:
+            joint_limits = {}
         else:
-            group = [s for s in relay_swimmers.values() if s.age <= age and s.gender == gender]
-
-        # Process each relay event for this age/gender combination
-        for event_name in event_names:
-            if 'freestyle' in event_name.lower() and 'medley' not in event_name.lower():
-                # Freestyle relay - determine number of swimmers needed
-                import re
-                match = re.search(r'(\d+)\s*x', event_name)
-                swimmers_needed = int(match.group(1)) if match else 4
-                
-                # Detect relay distance and use appropriate times
-                distance = extract_relay_distance(event_name)
-                
-                # Normalize gender format to match what we use for relay key matching
-                gender_mapping = {
-                    'M': 'Male',
-                    'F': 'Female', 
-                    'Male': 'Male',
-                    'Female': 'Female'
-                }
-                normalized_gender = gender_mapping.get(gender, gender)
-                
-                # Check if this relay has pre-assignments (use normalized gender for key matching)
-                relay_key = (event_name, age, normalized_gender)
-                has_pre_assignments = relay_key in relay_protected_assignments
-                
-                if has_pre_assignments:
-                    print(f"FREESTYLE RELAY: Processing pre-assignments for {event_name} {age} {normalized_gender}", file=sys.stderr)
-                    
-                    # Build team with pre-assigned swimmers in correct positions
-                    team_slots = [None] * swimmers_needed
-                    pre_assigned_swimmers_set = set()
-                    
-                    # Fill pre-assigned positions
-                    for pos, assignment in relay_protected_assignments[relay_key].items():
-                        if 1 <= pos <= swimmers_needed:
-                            team_slots[pos - 1] = assignment['swimmer']  # Convert to 0-based index
-                            pre_assigned_swimmers_set.add(assignment['swimmer'])
-                            print(f"  Pre-assigned position {pos}: {assignment['swimmer']}", file=sys.stderr)
-                    
-                    # Get all available swimmers for this distance
-                    if distance == 50:
-                        all_swimmers = sorted([s for s in group if s.freestyle_50 is not None], key=lambda x: x.freestyle_50)
-                        time_attr = 'freestyle_50'
-                    elif distance == 100:
-                        all_swimmers = sorted([s for s in group if s.freestyle_100 is not None], key=lambda x: x.freestyle_100)
-                        time_attr = 'freestyle_100'
-                    elif distance == 200:
-                        all_swimmers = sorted([s for s in group if s.freestyle_200 is not None], key=lambda x: x.freestyle_200)
-                        time_attr = 'freestyle_200'
-                    else:
-                        # Fallback to 50m
-                        all_swimmers = sorted([s for s in group if s.freestyle_50 is not None], key=lambda x: x.freestyle_50)
-                        time_attr = 'freestyle_50'
-                    
-                    # Validate pre-assigned swimmers have required times
-                    valid_team = True
-                    for pos, assignment in relay_protected_assignments[relay_key].items():
-                        if 1 <= pos <= swimmers_needed:
-                            swimmer_name = assignment['swimmer']
-                            # Find swimmer object
-                            swimmer_obj = None
-                            for s in all_swimmers:
-                                if s.name == swimmer_name:
-                                    swimmer_obj = s
-                                    break
-                            
-                            if swimmer_obj is None or getattr(swimmer_obj, time_attr) is None:
-                                print(f"  WARNING: Pre-assigned swimmer {swimmer_name} has no {distance}m freestyle time - skipping pre-assignment", file=sys.stderr)
-                                valid_team = False
-                                break
-                    
-                    if valid_team:
-                        # Get available swimmers (excluding pre-assigned ones)
-                        available_swimmers = [s for s in all_swimmers if s.name not in pre_assigned_swimmers_set]
-                        
-                        # Fill remaining positions with fastest available swimmers
-                        available_index = 0
-                        for i in range(swimmers_needed):
-                            if team_slots[i] is None and available_index < len(available_swimmers):
-                                team_slots[i] = available_swimmers[available_index].name
-                                available_index += 1
-                        
-                        # Build final team if all positions filled
-                        if all(slot is not None for slot in team_slots):
-                            # Calculate total time and create swimmer_times array
-                            total_time = 0
-                            swimmer_times = []
-                            
-                            for swimmer_name in team_slots:
-                                # Find swimmer object
-                                swimmer_obj = None
-                                for s in all_swimmers:
-                                    if s.name == swimmer_name:
-                                        swimmer_obj = s
-                                        break
-                                
-                                if swimmer_obj:
-                                    swimmer_time = getattr(swimmer_obj, time_attr)
-                                    total_time += swimmer_time
-                                    swimmer_times.append({'name': swimmer_name, 'time': f'{swimmer_time:.2f}s'})
-                            
-                            total_time = round(total_time, 2)
-                            
-                            # Format age display: 99 -> Open, others -> XU
-                            age_display = "Open" if age == 99 else f"{age}U"
-                            
-                            freestyle_relay_teams.append({
-                                'relay': f'{age_display} {normalized_gender} {event_name}',
-                                'totalTime': f'{int(total_time // 60):02d}:{total_time % 60:05.2f}',
-                                'swimmers': swimmer_times
-                            })
-                            print(f"  SUCCESS: Built pre-assigned freestyle relay with time {total_time:.2f}s", file=sys.stderr)
-                        else:
-                            print(f"  WARNING: Could not fill all positions for pre-assigned freestyle relay", file=sys.stderr)
-                    else:
-                        # Fall back to optimal selection if pre-assignments are invalid
-                        print(f"  Falling back to optimal selection for {event_name}", file=sys.stderr)
-                        has_pre_assignments = False
-                
-                # Original optimal logic (used when no pre-assignments or fallback)
-                if not has_pre_assignments:
-                    if distance == 50:
-                        freestyle_swimmers = sorted([s for s in group if s.freestyle_50 is not None], key=lambda x: x.freestyle_50)[:swimmers_needed]
-                        if len(freestyle_swimmers) == swimmers_needed:
-                            total_time = round(sum(s.freestyle_50 for s in freestyle_swimmers), 2)
-                            swimmer_times = [{'name': s.name, 'time': f'{s.freestyle_50:.2f}s'} for s in freestyle_swimmers]
-                    elif distance == 100:
-                        freestyle_swimmers = sorted([s for s in group if s.freestyle_100 is not None], key=lambda x: x.freestyle_100)[:swimmers_needed]
-                        if len(freestyle_swimmers) == swimmers_needed:
-                            total_time = round(sum(s.freestyle_100 for s in freestyle_swimmers), 2)
-                            swimmer_times = [{'name': s.name, 'time': f'{s.freestyle_100:.2f}s'} for s in freestyle_swimmers]
-                    elif distance == 200:
-                        freestyle_swimmers = sorted([s for s in group if s.freestyle_200 is not None], key=lambda x: x.freestyle_200)[:swimmers_needed]
-                        if len(freestyle_swimmers) == swimmers_needed:
-                            total_time = round(sum(s.freestyle_200 for s in freestyle_swimmers), 2)
-                            swimmer_times = [{'name': s.name, 'time': f'{s.freestyle_200:.2f}s'} for s in freestyle_swimmers]
-                    else:
-                        # Fallback to 50m if distance not recognized
-                        freestyle_swimmers = sorted([s for s in group if s.freestyle_50 is not None], key=lambda x: x.freestyle_50)[:swimmers_needed]
-                        if len(freestyle_swimmers) == swimmers_needed:
-                            total_time = round(sum(s.freestyle_50 for s in freestyle_swimmers), 2)
-                            swimmer_times = [{'name': s.name, 'time': f'{s.freestyle_50:.2f}s'} for s in freestyle_swimmers]
-                    
-                    if len(freestyle_swimmers) == swimmers_needed:
-                        # Format age display: 99 -> Open, others -> XU
-                        age_display = "Open" if age == 99 else f"{age}U"
-                        
-                        freestyle_relay_teams.append({
-                            'relay': f'{age_display} {normalized_gender} {event_name}',
-                            'totalTime': f'{int(total_time // 60):02d}:{total_time % 60:05.2f}',
-                            'swimmers': swimmer_times
-                        })
-
-            elif 'medley' in event_name.lower():
-                # Medley relay - detect distance and use appropriate times
-                distance = extract_relay_distance(event_name)
-                
-                # Normalize gender format to match what we use for relay key matching
-                gender_mapping = {
-                    'M': 'Male',
-                    'F': 'Female', 
-                    'Male': 'Male',
-                    'Female': 'Female'
-                }
-                normalized_gender = gender_mapping.get(gender, gender)
-                
-                # Check if this relay has pre-assignments (use normalized gender for key matching)
-                relay_key = (event_name, age, normalized_gender)
-                has_pre_assignments = relay_key in relay_protected_assignments
-                
-                if has_pre_assignments:
-                    print(f"MEDLEY RELAY: Processing pre-assignments for {event_name} {age} {normalized_gender}", file=sys.stderr)
-                    
-                    # Build stroke pools considering pre-assignments
-                    stroke_assignments = {}
-                    pre_assigned_swimmers_set = set()
-                    
-                    # Track pre-assigned strokes and swimmers
-                    for pos, assignment in relay_protected_assignments[relay_key].items():
-                        stroke = assignment['stroke']
-                        swimmer_name = assignment['swimmer']
-                        stroke_assignments[stroke] = swimmer_name
-                        pre_assigned_swimmers_set.add(swimmer_name)
-                        print(f"  Pre-assigned {stroke}: {swimmer_name}", file=sys.stderr)
-                    
-                    # Build stroke pools with pre-assignment validation
-                    def get_stroke_pool(stroke_name, time_attr, all_group_swimmers):
-                        if stroke_name in stroke_assignments:
-                            # Find pre-assigned swimmer
-                            pre_assigned_swimmer = stroke_assignments[stroke_name]
-                            swimmer_obj = None
-                            for s in all_group_swimmers:
-                                if s.name == pre_assigned_swimmer:
-                                    swimmer_obj = s
-                                    break
-                            
-                            if swimmer_obj and getattr(swimmer_obj, time_attr) is not None:
-                                return [swimmer_obj]  # Return only pre-assigned swimmer
-                            else:
-                                print(f"  WARNING: Pre-assigned swimmer {pre_assigned_swimmer} has no {distance}m {stroke_name.lower()} time - falling back to optimal", file=sys.stderr)
-                                return []  # Invalid pre-assignment
-                        else:
-                            # Return top 10 swimmers excluding pre-assigned ones
-                            eligible = [s for s in all_group_swimmers if s.name not in pre_assigned_swimmers_set and getattr(s, time_attr) is not None]
-                            return sorted(eligible, key=lambda x: getattr(x, time_attr))[:10]
-                    
-                    # Build stroke pools based on distance
-                    if distance == 50:
-                        backstrokers = get_stroke_pool('Backstroke', 'backstroke_50', group)
-                        breaststrokers = get_stroke_pool('Breaststroke', 'breaststroke_50', group)
-                        butterflies = get_stroke_pool('Butterfly', 'butterfly_50', group)
-                        freestylers = get_stroke_pool('Freestyle', 'freestyle_50', group)
-                        time_attrs = ('backstroke_50', 'breaststroke_50', 'butterfly_50', 'freestyle_50')
-                    elif distance == 100:
-                        backstrokers = get_stroke_pool('Backstroke', 'backstroke_100', group)
-                        breaststrokers = get_stroke_pool('Breaststroke', 'breaststroke_100', group)
-                        butterflies = get_stroke_pool('Butterfly', 'butterfly_100', group)
-                        freestylers = get_stroke_pool('Freestyle', 'freestyle_100', group)
-                        time_attrs = ('backstroke_100', 'breaststroke_100', 'butterfly_100', 'freestyle_100')
-                    elif distance == 200:
-                        backstrokers = get_stroke_pool('Backstroke', 'backstroke_200', group)
-                        breaststrokers = get_stroke_pool('Breaststroke', 'breaststroke_200', group)
-                        butterflies = get_stroke_pool('Butterfly', 'butterfly_200', group)
-                        freestylers = get_stroke_pool('Freestyle', 'freestyle_200', group)
-                        time_attrs = ('backstroke_200', 'breaststroke_200', 'butterfly_200', 'freestyle_200')
-                    else:
-                        # Fallback to 50m
-                        backstrokers = get_stroke_pool('Backstroke', 'backstroke_50', group)
-                        breaststrokers = get_stroke_pool('Breaststroke', 'breaststroke_50', group)
-                        butterflies = get_stroke_pool('Butterfly', 'butterfly_50', group)
-                        freestylers = get_stroke_pool('Freestyle', 'freestyle_50', group)
-                        time_attrs = ('backstroke_50', 'breaststroke_50', 'butterfly_50', 'freestyle_50')
-                    
-                    # Check if all stroke pools have at least one swimmer
-                    if all(len(pool) > 0 for pool in [backstrokers, breaststrokers, butterflies, freestylers]):
-                        possible_teams = []
-                        max_combinations = 1000
-                        combination_count = 0
-                        
-                        for b in backstrokers:
-                            for br in breaststrokers:
-                                if br.name == b.name:
-                                    continue
-                                for fly in butterflies:
-                                    if fly.name in {b.name, br.name}:
-                                        continue
-                                    for free in freestylers:
-                                        if free.name in {b.name, br.name, fly.name}:
-                                            continue
-                                        
-                                        combination_count += 1
-                                        if combination_count > max_combinations:
-                                            break
-                                        
-                                        # Calculate total time and build team data
-                                        total = (getattr(b, time_attrs[0]) + getattr(br, time_attrs[1]) + 
-                                                getattr(fly, time_attrs[2]) + getattr(free, time_attrs[3]))
-                                        
-                                        team_data = [
-                                            {'name': b.name, 'stroke': 'Backstroke', 'time': f'{getattr(b, time_attrs[0]):.2f}s'},
-                                            {'name': br.name, 'stroke': 'Breaststroke', 'time': f'{getattr(br, time_attrs[1]):.2f}s'},
-                                            {'name': fly.name, 'stroke': 'Butterfly', 'time': f'{getattr(fly, time_attrs[2]):.2f}s'},
-                                            {'name': free.name, 'stroke': 'Freestyle', 'time': f'{getattr(free, time_attrs[3]):.2f}s'}
-                                        ]
-                                        
-                                        possible_teams.append({
-                                            'time': round(total, 2),
-                                            'team': team_data
-                                        })
-                                    if combination_count > max_combinations:
-                                        break
-                                if combination_count > max_combinations:
-                                    break
-                            if combination_count > max_combinations:
-                                break
-                        
-                        if possible_teams:
-                            best_team = min(possible_teams, key=lambda x: x['time'])
-                            total_time = best_team['time']
-                            
-                            # Format age display: 99 -> Open, others -> XU
-                            age_display = "Open" if age == 99 else f"{age}U"
-                            
-                            medley_relay_teams.append({
-                                'relay': f'{age_display} {normalized_gender} {event_name}',
-                                'totalTime': f'{int(total_time // 60):02d}:{total_time % 60:05.2f}',
-                                'swimmers': best_team['team']
-                            })
-                            print(f"  SUCCESS: Built pre-assigned medley relay with time {total_time:.2f}s", file=sys.stderr)
-                        else:
-                            print(f"  WARNING: No valid combinations found for pre-assigned medley relay", file=sys.stderr)
-                    else:
-                        print(f"  WARNING: Missing swimmers for pre-assigned strokes - falling back to optimal", file=sys.stderr)
-                        has_pre_assignments = False
-                
-                # Original optimal logic (used when no pre-assignments or fallback)
-                if not has_pre_assignments:
-                    possible_teams = []
-                    
-                    # Select swimmers based on distance and sort by time (fastest first)
-                    if distance == 50:
-                        backstrokers = sorted([s for s in group if s.backstroke_50 is not None], key=lambda x: x.backstroke_50)
-                        breaststrokers = sorted([s for s in group if s.breaststroke_50 is not None], key=lambda x: x.breaststroke_50)
-                        butterflies = sorted([s for s in group if s.butterfly_50 is not None], key=lambda x: x.butterfly_50)
-                        freestylers = sorted([s for s in group if s.freestyle_50 is not None], key=lambda x: x.freestyle_50)
-                    elif distance == 100:
-                        backstrokers = sorted([s for s in group if s.backstroke_100 is not None], key=lambda x: x.backstroke_100)
-                        breaststrokers = sorted([s for s in group if s.breaststroke_100 is not None], key=lambda x: x.breaststroke_100)
-                        butterflies = sorted([s for s in group if s.butterfly_100 is not None], key=lambda x: x.butterfly_100)
-                        freestylers = sorted([s for s in group if s.freestyle_100 is not None], key=lambda x: x.freestyle_100)
-                    elif distance == 200:
-                        backstrokers = sorted([s for s in group if s.backstroke_200 is not None], key=lambda x: x.backstroke_200)
-                        breaststrokers = sorted([s for s in group if s.breaststroke_200 is not None], key=lambda x: x.breaststroke_200)
-                        butterflies = sorted([s for s in group if s.butterfly_200 is not None], key=lambda x: x.butterfly_200)
-                        freestylers = sorted([s for s in group if s.freestyle_200 is not None], key=lambda x: x.freestyle_200)
-                    else:
-                        # Fallback to 50m
-                        backstrokers = sorted([s for s in group if s.backstroke_50 is not None], key=lambda x: x.backstroke_50)
-                        breaststrokers = sorted([s for s in group if s.breaststroke_50 is not None], key=lambda x: x.breaststroke_50)
-                        butterflies = sorted([s for s in group if s.butterfly_50 is not None], key=lambda x: x.butterfly_50)
-                        freestylers = sorted([s for s in group if s.freestyle_50 is not None], key=lambda x: x.freestyle_50)
-    
-                    # Limit combinations to prevent performance issues
-                    max_combinations = 1000
-                    combination_count = 0
-                    
-                    for b in backstrokers[:10]:  # Limit to top 10 swimmers per stroke
-                        for br in breaststrokers[:10]:
-                            if br.name == b.name:
-                                continue
-                            for fly in butterflies[:10]:
-                                if fly.name in {b.name, br.name}:
-                                    continue
-                                for free in freestylers[:10]:
-                                    if free.name in {b.name, br.name, fly.name}:
-                                        continue
-                                    
-                                    combination_count += 1
-                                    if combination_count > max_combinations:
-                                        break
-                                    
-                                    # Get times based on distance
-                                    if distance == 50:
-                                        total = b.backstroke_50 + br.breaststroke_50 + fly.butterfly_50 + free.freestyle_50
-                                        team_data = [
-                                            {'name': b.name, 'stroke': 'Backstroke', 'time': f'{b.backstroke_50:.2f}s'},
-                                            {'name': br.name, 'stroke': 'Breaststroke', 'time': f'{br.breaststroke_50:.2f}s'},
-                                            {'name': fly.name, 'stroke': 'Butterfly', 'time': f'{fly.butterfly_50:.2f}s'},
-                                            {'name': free.name, 'stroke': 'Freestyle', 'time': f'{free.freestyle_50:.2f}s'}
-                                        ]
-                                    elif distance == 100:
-                                        total = b.backstroke_100 + br.breaststroke_100 + fly.butterfly_100 + free.freestyle_100
-                                        team_data = [
-                                            {'name': b.name, 'stroke': 'Backstroke', 'time': f'{b.backstroke_100:.2f}s'},
-                                            {'name': br.name, 'stroke': 'Breaststroke', 'time': f'{br.breaststroke_100:.2f}s'},
-                                            {'name': fly.name, 'stroke': 'Butterfly', 'time': f'{fly.butterfly_100:.2f}s'},
-                                            {'name': free.name, 'stroke': 'Freestyle', 'time': f'{free.freestyle_100:.2f}s'}
-                                        ]
-                                    elif distance == 200:
-                                        total = b.backstroke_200 + br.breaststroke_200 + fly.butterfly_200 + free.freestyle_200
-                                        team_data = [
-                                            {'name': b.name, 'stroke': 'Backstroke', 'time': f'{b.backstroke_200:.2f}s'},
-                                            {'name': br.name, 'stroke': 'Breaststroke', 'time': f'{br.breaststroke_200:.2f}s'},
-                                            {'name': fly.name, 'stroke': 'Butterfly', 'time': f'{fly.butterfly_200:.2f}s'},
-                                            {'name': free.name, 'stroke': 'Freestyle', 'time': f'{free.freestyle_200:.2f}s'}
-                                        ]
-                                    else:
-                                        # Fallback to 50m
-                                        total = b.backstroke_50 + br.breaststroke_50 + fly.butterfly_50 + free.freestyle_50
-                                        team_data = [
-                                            {'name': b.name, 'stroke': 'Backstroke', 'time': f'{b.backstroke_50:.2f}s'},
-                                            {'name': br.name, 'stroke': 'Breaststroke', 'time': f'{br.breaststroke_50:.2f}s'},
-                                            {'name': fly.name, 'stroke': 'Butterfly', 'time': f'{fly.butterfly_50:.2f}s'},
-                                            {'name': free.name, 'stroke': 'Freestyle', 'time': f'{free.freestyle_50:.2f}s'}
-                                        ]
-                                        
-                                    possible_teams.append({
-                                        'time': round(total, 2),
-                                        'team': team_data
-                                    })
-                                if combination_count > max_combinations:
-                                    break
-                            if combination_count > max_combinations:
-                                break
-                        if combination_count > max_combinations:
-                            break
-    
-                    if possible_teams:
-                        best_team = min(possible_teams, key=lambda x: x['time'])
-                        total_time = best_team['time']
-                        
-                        # Format age display: 99 -> Open, others -> XU
-                        age_display = "Open" if age == 99 else f"{age}U"
-                        
-                        medley_relay_teams.append({
-                            'relay': f'{age_display} {normalized_gender} {event_name}',
-                            'totalTime': f'{int(total_time // 60):02d}:{total_time % 60:05.2f}',
-                            'swimmers': best_team['team']
-                        })
-
-    # SPECIAL HANDLING FOR SQUADRUN RELAY (8x50m Mixed Age/Gender Freestyle)
-    squadrun_relay_teams = []
-    
-    # Check if Squadrun event exists in the relay events list
-    squadrun_events = [event for event in relay_events if 'squadrun' in event[0].lower()]
+            joint_limits = {'max_iterations': JOINT_ANYTIME_ITERATIONS, 'deadline': deadline}
+        assignment, slot_events, relay_picks, summary = optimize_joint(
+            full_list, event_list, protected_events, swimmer_event_count, relay_plans, optimization_config,
+            **joint_limits
+        )
+        if deadline is not None:
+            lower_bound = summary['lowerBound']
+            gap = None if lower_bound is None else max(0.0, summary['objective'] - lower_bound)
+            search = {
+                'method': 'joint',
+                'timedOut': summary['timedOut'],
+                'optimal': gap is not None and gap <= 1e-3,
+                'objective': round(summary['objective'], 3),
+                'lowerBound': None if lower_bound is None else round(lower_bound, 3),
+                'gap': None if gap is None else round(gap, 3)
+            }
+        if alternative_count:
+            log.warning("WARNING: alternatives are not available in joint mode; skipping")
+        log.info("JOINT: objective {:.3f}, lower bound {} after {} iterations", summary['objective'], summary['lowerBound'], summary['iterations'])
+        for slot, swimmer_name in sorted(assignment.items()):
+            allocation.assign(slot_events[slot], swimmer_name)
+        optimization_assignments = allocation.assignments
+        freestyle_relay_teams, medley_relay_teams, squadrun_relay_teams = format_relay_picks(relay_plans, relay_picks)
+        stats_count('jointIterations', summary['iterations'])
+        stats_lap('joint')
+    else:
+        # Allocate swimmers to events (max 2 per swimmer)
+        solver_name = optimization_config.get("individualSolver", "exact")
+        allocate_individual = INDIVIDUAL_SOLVERS.get(solver_name)
+        if allocate_individual is None:
+            log.error("ERROR: Unknown individualSolver '{}', using exact", solver_name)
+            allocate_individual = allocate_individual_exact
+        if alternative_count and allocate_individual is not allocate_individual_exact:
+            log.warning("WARNING: alternatives need the exact individual solver; skipping")
+            alternative_count = 0
+        elif alternative_count and deadline is None:
+            # Before the allocation fills the open slots
+            alternatives = individual_alternatives(
+                full_list, allocation, optimization_config.get("maxIndividualEvents", 2), alternative_count
+            )
+            stats_lap('alternatives')
+        if deadline is not None and allocate_individual is allocate_individual_exact:
+            open_events = [list(event) for event in event_list]
+            open_counts = dict(swimmer_event_count)
+            optimization_assignments, search = allocate_individual_anytime(
+                full_list, allocation, optimization_config.get("maxIndividualEvents", 2), deadline
+            )
+            # Alternatives rank against the returned line-up, so it must be optimal
+            if alternative_count and not search['optimal']:
+                log.warning("WARNING: timeLimitMs left the line-up unproven; skipping alternatives")
+            elif alternative_count and perf_counter() >= deadline:
+                log.warning("WARNING: timeLimitMs reached before alternatives; skipping")
+            elif alternative_count:
+                chosen = {position: event[-1] for position, event in enumerate(event_list)
+                          if open_events[position][-1] == 'Not allocated' and event[-1] != 'Not allocated'}
+                alternatives = individual_alternatives(
+                    full_list, AllocationState(open_events, protected_events, open_counts, full_list),
+                    optimization_config.get("maxIndividualEvents", 2), alternative_count,
+                    base=chosen, deadline=deadline
+                )
+                stats_lap('alternatives')
+        else:
+            if deadline is not None:
+                log.warning("WARNING: timeLimitMs needs the exact individual solver; ignoring")
+            optimization_assignments = allocate_individual(
+                full_list, allocation, optimization_config.get("maxIndividualEvents", 2)
+            )
+        stats_lap('individual')
+        if relay_solver == "global":
+            # All relays across age groups in one assignment under maxRelayEvents
+            relay_plans = build_relay_plans(relay_events, relay_swimmers, relay_protected_assignments)
+            relay_picks = allocate_relays_global(relay_plans, optimization_config.get("maxRelayEvents"))
+            freestyle_relay_teams, medley_relay_teams, squadrun_relay_teams = format_relay_picks(relay_plans, relay_picks)
+        else:
+            freestyle_relay_teams, medley_relay_teams = build_relay_teams(relay_events_dict, relay_swimmers, relay_protected_assignments)
+            squadrun_relay_teams = build_squadrun_relay(relay_events, relay_swimmers, relay_protected_assignments)
+        stats_lap('relays')
+
+    # Optional B/C teams behind each freestyle and medley relay team
+    relay_team_count = optimization_config.get("relayTeamsPerEvent", 1)
+    if relay_team_count > 1:
+        relay_capacity = None
+        if solver_mode == "joint" or relay_solver == "global":
+            # Extra teams must stay within the relay caps
+            max_relay = optimization_config.get("maxRelayEvents")
+            max_total = optimization_config.get("maxTotalEvents")
+            relay_load = {}
+            for p, picks in relay_picks.items():
+                for swimmer_name in picks or ():
+                    relay_load[swimmer_name] = relay_load.get(swimmer_name, 0) + 1
+            relay_capacity = {}
+            for swimmer_name in relay_swimmers:
+                limits = []
+                if max_relay is not None:
+                    limits.append(max_relay - relay_load.get(swimmer_name, 0))
+                if max_total is not None and solver_mode == "joint":
+                    limits.append(max_total - relay_load.get(swimmer_name, 0) - swimmer_event_count.get(swimmer_name, 0))
+                if limits:
+                    relay_capacity[swimmer_name] = min(limits)
+        if solver_mode != "joint" and relay_solver != "global":
+            relay_plans = build_relay_plans(relay_events, relay_swimmers, relay_protected_assignments)
+        freestyle_relay_teams = add_relay_squads(freestyle_relay_teams, relay_plans, relay_swimmers, relay_team_count, relay_capacity)
+        medley_relay_teams = add_relay_squads(medley_relay_teams, relay_plans, relay_swimmers, relay_team_count, relay_capacity)
+        stats_lap('extraRelays')
+
+    log.info("OPTIMIZATION COMPLETE: {} events auto-assigned, {} pre-assigned", optimization_assignments, len(protected_events))
     
-    if squadrun_events:
-        print(f"PYTHON: Processing Squadrun relay event", file=sys.stderr)
+    # Add optimization results to debug file (debug level only)
+    if log.enabled('debug'):
+        with open('debug_output.txt', 'a') as debug_file:
+            debug_file.write("=== OPTIMIZATION RESULTS ===\n")
+            debug_file.write(f"Events auto-assigned: {optimization_assignments}\n")
+            debug_file.write(f"Events pre-assigned: {len(protected_events)}\n\n")
         
-        # Check for Squadrun pre-assignments
-        squadrun_relay_key = ('Squadrun', 998, 'Mixed')
-        has_pre_assignments = squadrun_relay_key in relay_protected_assignments and relay_protected_assignments[squadrun_relay_key]
+            debug_file.write("FINAL EVENT ASSIGNMENTS:\n")
+            assigned_events = [event for event in event_list if event[-1] != 'Not allocated']
+            unassigned_events = [event for event in event_list if event[-1] == 'Not allocated']
         
-        squadrun_team = []
-        total_squadrun_time = 0
-        
-        if has_pre_assignments:
-            print(f"SQUADRUN: Processing pre-assignments for {squadrun_relay_key}", file=sys.stderr)
-            
-            # Position mapping: 1=11U Female, 2=11U Male, 3=13U Female, 4=13U Male, 5=15U Female, 6=15U Male, 7=Open Female, 8=Open Male
-            position_mapping = [
-                ('11U', 'Female'), ('11U', 'Male'),    # positions 1, 2
-                ('13U', 'Female'), ('13U', 'Male'),    # positions 3, 4  
-                ('15U', 'Female'), ('15U', 'Male'),    # positions 5, 6
-                ('Open', 'Female'), ('Open', 'Male')   # positions 7, 8
-            ]
-            
-            # Initialize team slots (8 positions)
-            team_slots = [None] * 8
-            pre_assigned_swimmers_set = set()
-            
-            # Fill pre-assigned positions
-            for pos, assignment in relay_protected_assignments[squadrun_relay_key].items():
-                if 1 <= pos <= 8:
-                    team_slots[pos - 1] = assignment['swimmer']  # Convert to 0-based index
-                    pre_assigned_swimmers_set.add(assignment['swimmer'])
-                    age_group, gender = position_mapping[pos - 1]
-                    print(f"  Pre-assigned position {pos} ({age_group} {gender}): {assignment['swimmer']}", file=sys.stderr)
-            
-            # Fill remaining positions with fastest available swimmers
-            for i, (age_group, gender) in enumerate(position_mapping):
-                if team_slots[i] is None:  # Position not pre-assigned
-                    # Determine age limit
-                    if age_group == 'Open':
-                        eligible_swimmers = list(relay_swimmers.values())
-                    else:
-                        age_limit = int(age_group.replace('U', ''))
-                        eligible_swimmers = [s for s in relay_swimmers.values() if s.age <= age_limit]
-                    
-                    # Filter by gender, 50m freestyle time, and not already assigned
-                    available_swimmers = [
-                        s for s in eligible_swimmers 
-                        if (s.gender == gender and 
-                            s.freestyle_50 is not None and 
-                            s.name not in pre_assigned_swimmers_set)
-                    ]
-                    
-                    # Sort by 50m freestyle time and select fastest
-                    if available_swimmers:
-                        fastest = sorted(available_swimmers, key=lambda x: x.freestyle_50)[0]
-                        team_slots[i] = fastest.name
-                        pre_assigned_swimmers_set.add(fastest.name)
-                        print(f"  Auto-selected position {i+1} ({age_group} {gender}): {fastest.name}", file=sys.stderr)
-                    else:
-                        print(f"  WARNING: No available swimmers for position {i+1} ({age_group} {gender})", file=sys.stderr)
-            
-            # Build final team if all positions filled
-            if all(slot is not None for slot in team_slots):
-                for i, swimmer_name in enumerate(team_slots):
-                    # Find swimmer object to get time
-                    swimmer_obj = relay_swimmers.get(swimmer_name)
-                    if swimmer_obj and swimmer_obj.freestyle_50 is not None:
-                        age_group, gender = position_mapping[i]
-                        squadrun_team.append({
-                            'name': swimmer_name,
-                            'ageGroup': age_group,
-                            'gender': gender,
-                            'time': f'{swimmer_obj.freestyle_50:.2f}s'
-                        })
-                        total_squadrun_time += swimmer_obj.freestyle_50
-                        print(f"SQUADRUN: Using {swimmer_name} ({age_group} {gender}) - {swimmer_obj.freestyle_50:.2f}s", file=sys.stderr)
-                    else:
-                        print(f"SQUADRUN: ERROR - Could not find time for {swimmer_name}", file=sys.stderr)
-                        has_pre_assignments = False  # Fall back to automatic selection
-                        break
-                
-                if has_pre_assignments:
-                    print(f"SQUADRUN: SUCCESS - Built pre-assigned relay with time {total_squadrun_time:.2f}s", file=sys.stderr)
-            else:
-                print(f"SQUADRUN: WARNING - Could not fill all pre-assigned positions, falling back to automatic selection", file=sys.stderr)
-                has_pre_assignments = False
+            for i, event in enumerate(assigned_events):
+                debug_file.write(f"  {i+1}. {event[1]}U {event[2]} {event[0]} -> {event[-1]}\n")
         
-        # Original automatic selection logic (used when no pre-assignments or fallback)
-        if not has_pre_assignments:
-            # Define age groups for Squadrun (11U, 13U, 15U, Open)
-            squadrun_age_groups = [11, 13, 15, 99]  # 99 = Open
-            squadrun_team = []
-            total_squadrun_time = 0
-            
-            # For each age group, find fastest male and female 50m Freestyle swimmers
-            for age_group in squadrun_age_groups:
-                age_display = "Open" if age_group == 99 else f"{age_group}U"
-                
-                # Filter swimmers by age group
-                if age_group == 99:
-                    # Open category - no age limit
-                    eligible_swimmers = list(relay_swimmers.values())
-                else:
-                    # Age-limited category
-                    eligible_swimmers = [s for s in relay_swimmers.values() if s.age <= age_group]
-                
-                # Find fastest male and female with 50m Freestyle times
-                males_with_times = [s for s in eligible_swimmers if s.gender == 'Male' and s.freestyle_50 is not None]
-                females_with_times = [s for s in eligible_swimmers if s.gender == 'Female' and s.freestyle_50 is not None]
-                
-                # Sort by 50m Freestyle time (fastest first)
-                males_with_times.sort(key=lambda x: x.freestyle_50)
-                females_with_times.sort(key=lambda x: x.freestyle_50)
-                
-                # Select fastest male and female for this age group
-                if males_with_times:
-                    fastest_male = males_with_times[0]
-                    squadrun_team.append({
-                        'name': fastest_male.name,
-                        'ageGroup': age_display,
-                        'gender': 'Male',
-                        'time': f'{fastest_male.freestyle_50:.2f}s'
-                    })
-                    total_squadrun_time += fastest_male.freestyle_50
-                    print(f"SQUADRUN: Selected {fastest_male.name} ({age_display} Male) - {fastest_male.freestyle_50:.2f}s", file=sys.stderr)
-                else:
-                    print(f"SQUADRUN: WARNING - No male swimmers with 50m Freestyle time for {age_display}", file=sys.stderr)
-                
-                if females_with_times:
-                    fastest_female = females_with_times[0]
-                    squadrun_team.append({
-                        'name': fastest_female.name,
-                        'ageGroup': age_display,
-                        'gender': 'Female',
-                        'time': f'{fastest_female.freestyle_50:.2f}s'
-                    })
-                    total_squadrun_time += fastest_female.freestyle_50
-                    print(f"SQUADRUN: Selected {fastest_female.name} ({age_display} Female) - {fastest_female.freestyle_50:.2f}s", file=sys.stderr)
-                else:
-                    print(f"SQUADRUN: WARNING - No female swimmers with 50m Freestyle time for {age_display}", file=sys.stderr)
+            debug_file.write(f"\nUnassigned events: {len(unassigned_events)}\n")
+            for event in unassigned_events[:5]:  # Show first 5 unassigned
+                debug_file.write(f"  - {event[1]}U {event[2]} {event[0]}\n")
         
-        # If we have all 8 swimmers (2 per age group), create the Squadrun relay team
-        if len(squadrun_team) == 8:
-            squadrun_relay_teams.append({
-                'relay': 'Mixed Squadrun',
-                'totalTime': f'{int(total_squadrun_time // 60):02d}:{total_squadrun_time % 60:05.2f}',
-                'swimmers': squadrun_team
-            })
-            print(f"SQUADRUN: SUCCESS - Created 8-person mixed relay team with total time {total_squadrun_time:.2f}s", file=sys.stderr)
-        else:
-            print(f"SQUADRUN: ERROR - Only found {len(squadrun_team)} swimmers, need 8 for complete team", file=sys.stderr)
+            if len(assigned_events) == 0:
+                debug_file.write("  >>> NO EVENTS ASSIGNED - OPTIMIZATION FAILED! <<<\n")
 
     # Prepare results
     individual_results = []
-    for event in event_list:
+    for slot, event in enumerate(event_list):
         if event[-1] != 'Not allocated':
-            # Find the time for this swimmer in this event
+            # The entry that won this slot, recorded by the allocator
             swimmer_time = None
-            for entry in full_list:
-                if (entry[0] == event[0] and entry[1] == event[1] and 
-                    entry[2] == event[2] and entry[-1] == event[-1]):
-                    swimmer_time = entry[5]
-                    index = entry[-2] if len(entry) > 7 else None
-                    break
+            entry = allocation.entries.get(slot)
+            if entry is not None:
+                swimmer_time = entry[5]
+                index = entry[-2] if len(entry) > 7 else None
             
             if swimmer_time:
                 individual_results.append({
@@ -1202,16 +2637,658 @@ def main():
                     'swimmer': event[-1],
                     'time': f'{swimmer_time:.2f}s',
                     'index': index,
-                    'status': 'QT' if index and index < 0 else 'CT'
+                    'status': qualifying_status(
+                        swimmer_time,
+                        county_standard(standards, event[0], event[1], event[2], 'QT'),
+                        county_standard(standards, event[0], event[1], event[2], 'CT')
+                    )
                 })
 
-    # Output results as JSON
-    results = {
-        'individual': individual_results,
-        'relay': freestyle_relay_teams + medley_relay_teams + squadrun_relay_teams
+    if search is not None:
+        search['timeLimitMs'] = time_limit
+        search['elapsedMs'] = round((perf_counter() - started) * 1000, 3)
+        log.info("SEARCH: {} line-up, objective {:.3f}, gap {}{}", search['method'], search['objective'],
+                 search['gap'], " (time limit reached)" if search['timedOut'] else "")
+
+    stats_lap('results')
+    return OptimizationResult(
+        individual=individual_results,
+        relay=freestyle_relay_teams + medley_relay_teams + squadrun_relay_teams,
+        alternatives=alternatives,
+        search=search
+    )
+
+RESULT_CACHE_VERSION = 1
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class ResultCache:
+    """On-disk LRU cache of optimize() results, one ``<key>.json`` file per
+    input fingerprint.  A hit refreshes the file's mtime; after each store the
+    least recently used files are removed until the directory fits in
+    ``max_bytes``.  Entries are written atomically, so several processes can
+    share a directory.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as f:
+                entry = json.load(f)
+            os.utime(self.path(key))
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        temp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, self.path(key))
+            self.evict()
+        except OSError as e:
+            log.warning("RESULT CACHE: could not store {}: {}", key[:12], e)
+
+    def evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+result_cache = None
+
+def configure_result_cache(argv, environ):
+    """Set up ``result_cache`` from --cache-dir/--cache-max-mb, falling back to
+    OPTIMIZER_CACHE_DIR and OPTIMIZER_CACHE_MAX_MB; no directory, no cache."""
+    global result_cache
+    directory = environ.get('OPTIMIZER_CACHE_DIR')
+    max_mb = environ.get('OPTIMIZER_CACHE_MAX_MB')
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == '--cache-dir' and args:
+            directory = args.pop(0)
+        elif arg == '--cache-max-mb' and args:
+            max_mb = args.pop(0)
+    try:
+        max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_CACHE_MAX_BYTES
+    except ValueError:
+        max_bytes = DEFAULT_CACHE_MAX_BYTES
+    try:
+        result_cache = ResultCache(directory, max_bytes) if directory else None
+    except OSError as e:
+        log.warning("RESULT CACHE: disabled, cannot use {}: {}", directory, e)
+        result_cache = None
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.optimizer_profiles')
+PROFILE_TOP_ALLOCATIONS = 25
+DEFAULT_PROFILE_KEEP = 20  # captures kept in profile_dir; older ones are deleted
+
+profile_dir = DEFAULT_PROFILE_DIR
+profile_every_run = False
+profile_requests = False  # honour "profile": true in input documents
+profile_keep = DEFAULT_PROFILE_KEEP
+
+def configure_profiling(argv, environ):
+    """Set up capture mode from --profile/--profile-requests/--profile-dir,
+    falling back to OPTIMIZER_PROFILE (``1`` for every run, ``requests`` for
+    documents with "profile": true), OPTIMIZER_PROFILE_DIR and
+    OPTIMIZER_PROFILE_KEEP.  Captures hold member names and PBs, so nothing
+    is captured unless one of these is set."""
+    global profile_dir, profile_every_run, profile_requests, profile_keep
+    profile_dir = environ.get('OPTIMIZER_PROFILE_DIR') or DEFAULT_PROFILE_DIR
+    mode = environ.get('OPTIMIZER_PROFILE')
+    profile_every_run = mode == '1'
+    profile_requests = mode == 'requests'
+    try:
+        profile_keep = max(1, int(environ.get('OPTIMIZER_PROFILE_KEEP') or DEFAULT_PROFILE_KEEP))
+    except ValueError:
+        profile_keep = DEFAULT_PROFILE_KEEP
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == '--profile':
+            profile_every_run = True
+        elif arg == '--profile-requests':
+            profile_requests = True
+        elif arg == '--profile-dir' and args:
+            profile_dir = args.pop(0)
+
+def prune_profiles():
+    """Delete all but the newest ``profile_keep`` captures in ``profile_dir``."""
+    try:
+        stems = [name[:-len('.input.json')] for name in os.listdir(profile_dir) if name.endswith('.input.json')]
+        stems.sort(key=lambda stem: os.path.getmtime(os.path.join(profile_dir, stem + '.input.json')), reverse=True)
+        for stem in stems[profile_keep:]:
+            for suffix in ('.input.json', '.pstats', '.alloc.txt'):
+                path = os.path.join(profile_dir, stem + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+    except OSError as e:
+        log.warning("PROFILE: cannot prune {}: {}", profile_dir, e)
+
+def profile_name(document):
+    """File name stem for a capture: team, session and a UTC timestamp."""
+    parts = [str(document.get('team') or 'team'), str(document.get('session') or 'session'),
+             datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')]
+    return '_'.join(re.sub(r'[^A-Za-z0-9.-]+', '-', part) for part in parts)
+
+def run_profiled(document, run):
+    """``run()`` captured when profiling is on for ``document``.
+
+    Writes to ``profile_dir``: <name>.input.json (the document, replayable
+    with ``optimizer.py --stdin < <name>.input.json``), <name>.pstats (cProfile)
+    and <name>.alloc.txt (tracemalloc's top allocation sites and peak).  The
+    input is written first so a crashing run still leaves it.  Captured runs
+    skip the result cache, so the solve itself is measured.  Only the newest
+    ``profile_keep`` captures are kept.
+    """
+    global result_cache
+    if not (profile_every_run or (profile_requests and document.get('profile') is True)):
+        if document.get('profile'):
+            log.warning("PROFILE: capture requested but OPTIMIZER_PROFILE is not 'requests'; running unprofiled")
+        return run()
+    stem = os.path.join(profile_dir, profile_name(document))
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        with open(stem + '.input.json', 'w') as f:
+            json.dump({key: value for key, value in document.items() if key != 'profile'}, f)
+    except OSError as e:
+        log.warning("PROFILE: cannot write to {}: {}; running unprofiled", profile_dir, e)
+        return run()
+
+    cache, result_cache = result_cache, None
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()  # one frame: allocations are grouped by line
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(run)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        result_cache = cache
+        profiler.dump_stats(stem + '.pstats')
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                           tracemalloc.Filter(False, cProfile.__file__)])
+        with open(stem + '.alloc.txt', 'w') as f:
+            f.write(f"# traced memory: {current / 1024:.1f} KiB at exit, {peak / 1024:.1f} KiB peak\n")
+            for stat in snapshot.statistics('lineno')[:PROFILE_TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+        log.info("PROFILE: wrote {}.input.json, .pstats and .alloc.txt", stem)
+        prune_profiles()
+
+_source_digest = None
+
+def optimizer_source_digest():
+    """Hash of this file, so cached results never outlive a solver change."""
+    global _source_digest
+    if _source_digest is None:
+        with open(__file__, 'rb') as f:
+            _source_digest = hashlib.sha256(f.read()).hexdigest()
+    return _source_digest
+
+def input_fingerprint(swimmers, events, standards, pre_assignments, config, relays=True):
+    """SHA-256 of the canonical JSON form of optimize()'s inputs.
+
+    Swimmer and event order is kept, since it breaks ties between equal
+    indices; standards keep their file order and config keys are sorted.
+    """
+    canonical = json.dumps({
+        'version': RESULT_CACHE_VERSION,
+        'source': optimizer_source_digest(),
+        'swimmers': [swimmer.as_row() for swimmer in swimmers],
+        'events': [list(event[:3]) for event in events],
+        'standards': [[*key, seconds] for key, seconds in standards.items()],
+        'preAssignments': pre_assignments or {"individual": [], "relay": []},
+        'config': config if config is not None else DEFAULT_OPTIMIZATION_CONFIG,
+        'relays': relays,
+    }, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def optimize_document(document, standards_for=None):
+    """Run optimize() on one input document, the in-memory form of the files
+    main() reads: ``memberPbs`` and ``countyTimes`` as CSV text, ``events``,
+    ``preAssignments`` and ``config``.  ``standards_for`` maps the countyTimes
+    text to a standards index (the worker passes its cache).
+    """
+    with collecting_stats(document.get('config')):
+        return optimize(*parse_document(document, standards_for))
+
+def parse_document(document, standards_for=None):
+    """optimize()'s arguments from an input document."""
+    standards_for = standards_for or (lambda text: build_county_standards(text.splitlines()))
+    swimmers, total_rows_processed = read_member_pbs(document['memberPbs'].splitlines())
+    log.info("PYTHON: Processed {} total rows from CSV", total_rows_processed)
+    standards = standards_for(document['countyTimes'])
+    stats_count('rowsRead', total_rows_processed)
+    stats_lap('parse')
+    return (
+        swimmers,
+        document.get('events', []),
+        standards,
+        document.get('preAssignments'),
+        document.get('config'),
+    )
+
+class DeltaError(ValueError):
+    """A change in a LineupSession delta that cannot be applied."""
+
+class LineupSession:
+    """The parsed inputs and latest result of one team's optimization, kept so
+    later changes can be applied without re-exporting and re-parsing the squad.
+
+    ``apply(delta)`` takes a list of changes:
+
+    - {"op": "removeSwimmer", "swimmerId": asa} - e.g. marked unavailable
+    - {"op": "addSwimmer", "memberPbs": csv_rows} - member_pbs.csv rows, no header
+    - {"op": "setTime", "swimmerId": asa, "event": "50m Freestyle", "time": seconds}
+    - {"op": "addPreAssignment", "individual": {...}} or {"relay": {...}}
+
+    and re-solves only when a change can reach the line-up: a swimmer with no
+    PB in any listed individual event or relay stroke is skipped, as are no-op
+    changes.  Any other delta is a full re-solve from the updated inputs (no
+    state from the previous solve is reused), so the result always matches a
+    fresh ``optimize`` call.
+    """
+
+    def __init__(self, swimmers, events, standards, pre_assignments=None, config=None):
+        self.swimmers = list(swimmers)
+        self.events = [list(event[:3]) for event in events]
+        self.standards = standards
+        self.pre_assignments = copy.deepcopy(pre_assignments) if pre_assignments else {"individual": [], "relay": []}
+        self.config = config
+        self.individual_keys = {}  # (event, gender) -> oldest age group entered
+        for event_name, age, gender in self.events:
+            if not is_relay_event(event_name):
+                key = (event_name, gender)
+                self.individual_keys[key] = max(age, self.individual_keys.get(key, age))
+        self.result = optimize(self.swimmers, self.events, self.standards, self.pre_assignments, self.config)
+
+    def reaches_lineup(self, swimmer):
+        """Whether a PB row can change the line-up."""
+        # Relays are always built (solve_lineup falls back to 4x50m relays
+        # when the list has none), so every relay-stroke PB can reach them
+        if swimmer.event in RELAY_TIME_SLOTS:
+            return True
+        oldest = self.individual_keys.get((swimmer.event, swimmer.gender))
+        return oldest is not None and swimmer.age <= oldest
+
+    def apply(self, delta):
+        """Apply a list of changes and return the (possibly unchanged) result."""
+        # apply_delta works on copies, so a delta that fails part-way leaves the session as it was
+        self.swimmers, self.pre_assignments, changed = apply_delta(
+            self.swimmers, self.pre_assignments, delta, self.reaches_lineup
+        )
+        if changed:
+            self.result = optimize(self.swimmers, self.events, self.standards, self.pre_assignments, self.config)
+        else:
+            log.info("INCREMENTAL: delta does not reach the line-up, keeping the previous result")
+        return self.result
+
+MEMBER_PBS_HEADER = 'First_Name,Last_Name,ASA_No,Date_of_Birth,Meet,Date,Event,SC_Time,Course,Gender,AgeTime,County_QT,Count_CT,County_Qualify,time_in_seconds,isAvailable'
+
+def apply_delta(swimmers, pre_assignments, delta, reaches_lineup=None):
+    """Apply LineupSession delta changes.
+
+    Returns (swimmers, pre_assignments, changed): new swimmer and
+    pre-assignment copies and whether any change can reach the line-up
+    according to ``reaches_lineup(swimmer)`` (default: any change counts).
+    The inputs are not modified, so a delta that raises part-way has no effect.
+    """
+    reaches_lineup = reaches_lineup or (lambda swimmer: True)
+    swimmers = list(swimmers)
+    pre_assignments = copy.deepcopy(pre_assignments)
+    changed = False
+    for change in delta:
+        op = change.get('op') if isinstance(change, dict) else None
+        if op == 'removeSwimmer':
+            asa = str(change['swimmerId']).strip()
+            removed = [swimmer for swimmer in swimmers if str(swimmer.asa_number).strip() == asa]
+            swimmers = [swimmer for swimmer in swimmers if str(swimmer.asa_number).strip() != asa]
+            changed |= any(reaches_lineup(swimmer) for swimmer in removed)
+        elif op == 'addSwimmer':
+            added, _ = read_member_pbs([MEMBER_PBS_HEADER] + change['memberPbs'].splitlines())
+            swimmers.extend(added)
+            changed |= any(reaches_lineup(swimmer) for swimmer in added)
+        elif op == 'setTime':
+            asa = str(change['swimmerId']).strip()
+            for position, swimmer in enumerate(swimmers):
+                if str(swimmer.asa_number).strip() == asa and swimmer.event == change['event']:
+                    if swimmer.time != float(change['time']):
+                        swimmers[position] = dataclasses.replace(swimmer, time=float(change['time']))
+                        changed |= reaches_lineup(swimmer)
+        elif op == 'addPreAssignment':
+            for kind in ('individual', 'relay'):
+                if kind in change:
+                    pre_assignments.setdefault(kind, []).append(change[kind])
+                    changed = True
+        else:
+            raise DeltaError(f"Unknown delta op: {op!r}")
+    return swimmers, pre_assignments, changed
+
+def lineup_summary(result):
+    """Objective values of a result: filled individual events, their summed
+    index (lower is better), relay teams and their summed time in seconds."""
+    indices = [entry['index'] for entry in result.individual if entry.get('index') is not None]
+    relay_seconds = [convert_to_seconds_with_milliseconds(team['totalTime']) for team in result.relay]
+    return {
+        'individualEvents': len(result.individual),
+        'indexSum': round(sum(indices), 3),
+        'relayTeams': len(result.relay),
+        'relayTime': round(sum(relay_seconds), 2),
     }
 
-    print(json.dumps(results))
+def lineup_changes(base, scenario):
+    """Events whose swimmer(s) differ between two results, as
+    {"event", "before", "after"} (None where the event has no entry)."""
+    def picks(result):
+        chosen = {entry['event']: entry['swimmer'] for entry in result.individual}
+        for team in result.relay:
+            chosen[team['relay']] = [swimmer['name'] for swimmer in team['swimmers']]
+        return chosen
+    before, after = picks(base), picks(scenario)
+    return [
+        {'event': event, 'before': before.get(event), 'after': after.get(event)}
+        for event in list(before) + [event for event in after if event not in before]
+        if before.get(event) != after.get(event)
+    ]
+
+# Base inputs of the scenario batch running in this process (set per pool worker)
+scenario_base = None
+
+def init_scenario_worker(base):
+    global scenario_base
+    scenario_base = base
+
+def solve_scenario(task):
+    """Solve one (delta, part) task against ``scenario_base``.  ``part`` is
+    'all', or 'individual'/'relay' to solve and return only those events
+    (with only their pre-assignments).  Each task is a full solve."""
+    delta, part = task
+    swimmers, events, standards, pre_assignments, config = scenario_base
+    pre_assignments = pre_assignments or {"individual": [], "relay": []}
+    if part != 'all':
+        wants_relays = part == 'relay'
+        events = [event for event in events if is_relay_event(event[0]) == wants_relays]
+        pre_assignments = {kind: (pre_assignments.get(kind, []) if (kind == 'relay') == wants_relays else [])
+                           for kind in ('individual', 'relay')}
+    swimmers, pre_assignments, _ = apply_delta(swimmers, pre_assignments, delta)
+    # An event list without relays would otherwise fall back to default relays
+    return optimize(swimmers, events, standards, pre_assignments, config, relays=part != 'individual')
+
+def run_scenarios(base, tasks, max_workers=None):
+    """solve_scenario() for each task, on a ProcessPoolExecutor when there is
+    more than one task and CPU; each pool process receives ``base`` once."""
+    workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_scenario_worker, initargs=(base,)) as executor:
+            return list(executor.map(solve_scenario, tasks))
+    init_scenario_worker(base)
+    return [solve_scenario(task) for task in tasks]
+
+def evaluate_scenarios(swimmers, events, standards, pre_assignments, config, scenarios, max_workers=None):
+    """Solve the base line-up plus one what-if per scenario and compare them.
+
+    ``scenarios`` is a list of {"name", "delta"} with LineupSession delta
+    changes.  The parsed base inputs are sent once to each process of a
+    ProcessPoolExecutor (``max_workers``, default one per CPU), not per scenario.
+    Returns (base_result, rows): one row per scenario with its lineup_summary()
+    values, their differences from the base and the changed assignments.
+    """
+    base = (swimmers, events, standards, pre_assignments, config)
+    base_result = optimize(*base)
+    results = run_scenarios(base, [(scenario.get('delta', []), 'all') for scenario in scenarios], max_workers)
+
+    base_summary = lineup_summary(base_result)
+    rows = []
+    for position, (scenario, result) in enumerate(zip(scenarios, results)):
+        summary = lineup_summary(result)
+        rows.append({
+            'scenario': scenario.get('name') or f"Scenario {position + 1}",
+            **summary,
+            'indexDelta': round(summary['indexSum'] - base_summary['indexSum'], 3),
+            'relayTimeDelta': round(summary['relayTime'] - base_summary['relayTime'], 2),
+            'individualEventsDelta': summary['individualEvents'] - base_summary['individualEvents'],
+            'changes': lineup_changes(base_result, result),
+            'error': result.error,
+        })
+    return base_result, rows
+
+def shared_losses(base, result):
+    """(index loss, relay seconds lost) from ``base`` to ``result``, summed over
+    the individual events and relay teams both fill, so an event that is no
+    longer filled does not make the rest look better."""
+    base_index = {entry['event']: entry['index'] for entry in base.individual if entry.get('index') is not None}
+    index_loss = sum(entry['index'] - base_index[entry['event']] for entry in result.individual
+                     if entry.get('index') is not None and entry['event'] in base_index)
+    base_time = {team['relay']: convert_to_seconds_with_milliseconds(team['totalTime']) for team in base.relay}
+    time_loss = sum(convert_to_seconds_with_milliseconds(team['totalTime']) - base_time[team['relay']]
+                    for team in result.relay if team['relay'] in base_time)
+    return round(index_loss, 3), round(time_loss, 2)
+
+def sensitivity_report(swimmers, events, standards, pre_assignments, config, max_workers=None):
+    """Leave-one-out cost of every swimmer in the line-up, most critical first.
+
+    Swimmers with no individual event or relay leg carry no load and are not
+    re-solved.  Each re-solve starts from scratch; nothing from the base
+    solve is reused.  Outside joint mode individual events and relays are
+    solved independently, so a swimmer is re-solved only for the part(s) they
+    swim in, with the other part's events left out (and, for the individual
+    part, no relays built); joint mode needs full solves.  Re-solves run
+    through run_scenarios().  Returns (base_result, rows), each
+    row holding the swimmer's events, the losses (index sum and relay seconds
+    over the events both line-ups fill, see shared_losses(), and individual
+    events and relay teams no longer filled) and, per event, the swimmer(s)
+    who take over.  Rows are ranked by events lost, then index loss, then
+    relay time loss.
+    """
+    base = (swimmers, events, standards, pre_assignments, config)
+    base_result = optimize(*base)
+    joint = (config or {}).get('solverMode') == 'joint'
+
+    individual_load, relay_load = {}, {}
+    for entry in base_result.individual:
+        individual_load.setdefault(entry['swimmer'], []).append(entry['event'])
+    for team in base_result.relay:
+        for swimmer in team['swimmers']:
+            relay_load.setdefault(swimmer['name'], []).append(team['relay'])
+    loaded = list(dict.fromkeys(list(individual_load) + list(relay_load)))
+    asa_by_name = {}
+    for swimmer in swimmers:
+        asa_by_name.setdefault(f"{swimmer.first_name} {swimmer.last_name}", swimmer.asa_number)
+
+    tasks, owners = [], []
+    for name in loaded:
+        if name not in asa_by_name:
+            continue
+        delta = [{'op': 'removeSwimmer', 'swimmerId': asa_by_name[name]}]
+        parts = ['all'] if joint else [part for part, load in (('individual', individual_load), ('relay', relay_load)) if name in load]
+        for part in parts:
+            tasks.append((delta, part))
+            owners.append(name)
+    results = run_scenarios(base, tasks, max_workers)
+
+    base_summary = lineup_summary(base_result)
+    rows = {}
+    for name, (_, part), result in zip(owners, tasks, results):
+        row = rows.setdefault(name, {
+            'swimmer': name,
+            'events': individual_load.get(name, []) + relay_load.get(name, []),
+            'indexLoss': 0, 'relayTimeLoss': 0, 'individualEventsLost': 0, 'relayTeamsLost': 0,
+            'replacements': [],
+        })
+        summary = lineup_summary(result)
+        index_loss, relay_time_loss = shared_losses(base_result, result)
+        if part in ('all', 'individual'):
+            row['indexLoss'] = index_loss
+            row['individualEventsLost'] = base_summary['individualEvents'] - summary['individualEvents']
+        if part in ('all', 'relay'):
+            row['relayTimeLoss'] = relay_time_loss
+            row['relayTeamsLost'] = base_summary['relayTeams'] - summary['relayTeams']
+        part_events = {'all': row['events'], 'individual': individual_load.get(name, []),
+                       'relay': relay_load.get(name, [])}[part]
+        for change in lineup_changes(base_result, result):
+            if change['event'] not in part_events:
+                continue
+            if isinstance(change['before'], list):
+                replacement = [swimmer for swimmer in (change['after'] or []) if swimmer not in change['before']] or None
+            else:
+                replacement = change['after']
+            row['replacements'].append({'event': change['event'], 'replacement': replacement})
+
+    ranked = sorted(rows.values(), key=lambda row: (
+        -(row['individualEventsLost'] + row['relayTeamsLost']), -row['indexLoss'], -row['relayTimeLoss']))
+    return base_result, ranked
+
+def read_input_document(stream):
+    """Parse the single JSON input document sent on stdin with --stdin."""
+    try:
+        document = json.load(stream)
+    except ValueError as e:
+        return None, f"Invalid input document: {e}"
+    missing = [key for key in INPUT_DOCUMENT_REQUIRED if not isinstance(document, dict) or key not in document]
+    if missing:
+        return None, f"Invalid input document: missing {', '.join(missing)}"
+    return document, None
+
+# JSON-RPC error codes used by the worker
+RPC_PARSE_ERROR = -32700
+RPC_INVALID_REQUEST = -32600
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+RPC_INTERNAL_ERROR = -32603
+RPC_UNKNOWN_SESSION = -32001  # reoptimize for a session this worker does not hold
+
+STANDARDS_CACHE_SIZE = 8
+SESSION_CACHE_SIZE = 16
+
+class SessionNotFound(Exception):
+    pass
+
+class OptimizerWorker:
+    """Long-running optimizer speaking newline-delimited JSON-RPC 2.0.
+
+    Each request line is {"jsonrpc": "2.0", "id": ..., "method": ..., "params": {...}}
+    and gets exactly one response line.  ``optimize`` params are an input
+    document (see optimize_document).  Parsed county
+    standards are kept per distinct countyTimes text, so repeat requests skip
+    the parse; relay plans depend on the swimmer pool and are built per request.
+    An ``optimize`` call with a ``session`` name also keeps a LineupSession,
+    which ``reoptimize`` ({"session", "delta"}) updates in place.  ``scenarios``
+    takes an input document plus "scenarios" (see evaluate_scenarios), and
+    ``sensitivity`` an input document (see sensitivity_report).
+    """
+
+    def __init__(self):
+        self.standards_cache = {}
+        self.sessions = {}
+        self.methods = {
+            'optimize': self.optimize,
+            'reoptimize': self.reoptimize,
+            'scenarios': self.scenarios,
+            'sensitivity': self.sensitivity,
+            'ping': self.ping,
+        }
+
+    def standards(self, county_times_csv):
+        standards = self.standards_cache.pop(county_times_csv, None)
+        if standards is None:
+            standards = build_county_standards(county_times_csv.splitlines())
+            if len(self.standards_cache) >= STANDARDS_CACHE_SIZE:
+                del self.standards_cache[next(iter(self.standards_cache))]
+        self.standards_cache[county_times_csv] = standards  # most recently used last
+        return standards
+
+    def optimize(self, params):
+        if not params.get('session'):
+            return run_profiled(params, lambda: optimize_document(params, self.standards)).to_dict()
+        with collecting_stats(params.get('config')):
+            session = run_profiled(params, lambda: LineupSession(*parse_document(params, self.standards)))
+        self.sessions.pop(params['session'], None)
+        if len(self.sessions) >= SESSION_CACHE_SIZE:
+            del self.sessions[next(iter(self.sessions))]
+        self.sessions[params['session']] = session
+        return session.result.to_dict()
+
+    def reoptimize(self, params):
+        session = self.sessions.pop(params['session'], None)
+        if session is None:
+            raise SessionNotFound(f"Unknown session: {params['session']}")
+        self.sessions[params['session']] = session  # most recently used last
+        return session.apply(params['delta']).to_dict()
+
+    def scenarios(self, params):
+        base_result, rows = evaluate_scenarios(*parse_document(params, self.standards), params['scenarios'],
+                                               params.get('maxWorkers'))
+        return {'base': {**base_result.to_dict(), 'summary': lineup_summary(base_result)}, 'scenarios': rows}
+
+    def sensitivity(self, params):
+        base_result, rows = sensitivity_report(*parse_document(params, self.standards), params.get('maxWorkers'))
+        return {'base': {**base_result.to_dict(), 'summary': lineup_summary(base_result)}, 'swimmers': rows}
+
+    def ping(self, params):
+        return {'standardsCached': len(self.standards_cache), 'sessions': len(self.sessions)}
+
+    def handle(self, line):
+        """Response object for one request line."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return rpc_error(None, RPC_PARSE_ERROR, f"Parse error: {e}")
+        if not isinstance(request, dict):
+            return rpc_error(None, RPC_INVALID_REQUEST, "Request must be an object")
+        request_id = request.get('id')
+        method = self.methods.get(request.get('method'))
+        if method is None:
+            return rpc_error(request_id, RPC_METHOD_NOT_FOUND, f"Method not found: {request.get('method')}")
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            return rpc_error(request_id, RPC_INVALID_PARAMS, "params must be an object")
+        try:
+            return {'jsonrpc': '2.0', 'id': request_id, 'result': method(params)}
+        except SessionNotFound as e:
+            return rpc_error(request_id, RPC_UNKNOWN_SESSION, str(e))
+        except (KeyError, TypeError, AttributeError, DeltaError) as e:
+            log.error("WORKER: invalid params for {}: {!r}", request.get('method'), e)
+            return rpc_error(request_id, RPC_INVALID_PARAMS, f"Invalid params: {e!r}")
+        except Exception as e:
+            log.error("WORKER: {} failed: {!r}", request.get('method'), e)
+            return rpc_error(request_id, RPC_INTERNAL_ERROR, str(e))
+
+    def serve(self, stdin, stdout):
+        """Answer requests from ``stdin`` until it is closed."""
+        for line in stdin:
+            if not line.strip():
+                continue
+            stdout.write(json.dumps(self.handle(line)) + '\n')
+            stdout.flush()
+
+def rpc_error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import path from "path";
+import readline from "readline";
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process";
+
+// Optimizer input document: a worker "optimize" call's params, or `--stdin` input
+export interface OptimizeParams {
+  memberPbs: string;
+  countyTimes: string;
+  events: (string | number)[][];
+  preAssignments: { individual: unknown[]; relay: unknown[] };
+  config: Record<string, unknown>;
+  team?: string; // names profile captures
+  session?: string; // names profile captures; on a worker, also keeps a LineupSession
+  profile?: boolean; // capture cProfile/tracemalloc output and the inputs for this run
+}
+
+// Result cache shared by every optimizer process (see ResultCache in optimizer.py)
+function optimizerEnv(scriptDir: string): NodeJS.ProcessEnv {
+  return {
+    ...process.env,
+    OPTIMIZER_CACHE_DIR: process.env.OPTIMIZER_CACHE_DIR || path.join(scriptDir, '.optimizer_cache')
+  };
+}
+
+// Change applied to a kept optimization session (see LineupSession in optimizer.py)
+export type OptimizeDelta =
+  | { op: 'removeSwimmer'; swimmerId: string }
+  | { op: 'addSwimmer'; memberPbs: string }
+  | { op: 'setTime'; swimmerId: string; event: string; time: number }
+  | { op: 'addPreAssignment'; individual?: unknown; relay?: unknown };
+
+// JSON-RPC error code for a reoptimize call whose session no worker holds
+export const UNKNOWN_SESSION = -32001;
+
+export class OptimizerError extends Error {
+  constructor(message: string, public code?: number) {
+    super(message);
+  }
+}
+
+interface PendingCall {
+  method: string;
+  params: any;
+  session?: string;
+  resolve: (result: any) => void;
+  reject: (error: Error) => void;
+}
+
+// One `python3 optimizer.py --worker` process answering newline-delimited JSON-RPC
+class OptimizerWorker {
+  private process: ChildProcessWithoutNullStreams;
+  private nextId = 1;
+  private current: (PendingCall & { id: number }) | null = null;
+  exited = false;
+
+  constructor(scriptDir: string, private onIdle: (worker: OptimizerWorker) => void) {
+    this.process = spawn('python3', [path.join(scriptDir, 'optimizer.py'), '--worker'], {
+      cwd: scriptDir,
+      env: optimizerEnv(scriptDir)
+    });
+
+    readline.createInterface({ input: this.process.stdout }).on('line', (line) => {
+      const call = this.current;
+      let response: any;
+      try {
+        response = JSON.parse(line);
+      } catch (e) {
+        console.error('OPTIMIZER WORKER: Non-JSON output:', line);
+        return;
+      }
+      if (!call || response.id !== call.id) {
+        console.error('OPTIMIZER WORKER: Unexpected response id', response.id);
+        return;
+      }
+      this.current = null;
+      if (response.error) {
+        call.reject(new OptimizerError(response.error.message, response.error.code));
+      } else {
+        call.resolve(response.result);
+      }
+      this.onIdle(this);
+    });
+
+    this.process.stderr.on('data', (data) => {
+      console.log('PYTHON STDERR:', data.toString());
+    });
+
+    this.process.stdin.on('error', (error) => this.fail(error));
+    this.process.on('error', (error) => this.fail(error));
+    this.process.on('exit', (code) => this.fail(new Error(`Optimizer worker exited with code ${code}`)));
+  }
+
+  get busy(): boolean {
+    return this.current !== null;
+  }
+
+  send(call: PendingCall) {
+    const id = this.nextId++;
+    this.current = { ...call, id };
+    this.process.stdin.write(JSON.stringify({ jsonrpc: '2.0', id, method: call.method, params: call.params }) + '\n');
+  }
+
+  stop() {
+    this.process.stdin.end();
+  }
+
+  private fail(error: Error) {
+    if (this.exited) return;
+    this.exited = true;
+    const call = this.current;
+    this.current = null;
+    call?.reject(error);
+    this.onIdle(this);
+  }
+}
+
+// Small pool of warm optimizer workers; calls queue while every worker is busy.
+// Workers start on first use and are replaced if they exit.  An "optimize" call
+// with a session name leaves that session on the worker that ran it, and
+// "reoptimize" calls for the session are sent to the same worker.
+export class OptimizerPool {
+  private workers: OptimizerWorker[] = [];
+  private queue: PendingCall[] = [];
+  private sessions = new Map<string, OptimizerWorker>();
+
+  constructor(private scriptDir: string, private size: number) {}
+
+  call(method: string, params: any): Promise<any> {
+    return new Promise((resolve, reject) => {
+      this.queue.push({ method, params, session: params?.session, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  optimize(params: OptimizeParams, session?: string): Promise<any> {
+    return this.call('optimize', session ? { ...params, session } : params);
+  }
+
+  reoptimize(session: string, delta: OptimizeDelta[]): Promise<any> {
+    return this.call('reoptimize', { session, delta });
+  }
+
+  // Base line-up plus one what-if per scenario, with a comparison row for each
+  scenarios(params: OptimizeParams, scenarios: { name?: string; delta: OptimizeDelta[] }[]): Promise<any> {
+    return this.call('scenarios', { ...params, scenarios });
+  }
+
+  // Leave-one-out report: each loaded swimmer ranked by what losing them costs
+  sensitivity(params: OptimizeParams): Promise<any> {
+    return this.call('sensitivity', params);
+  }
+
+  close() {
+    this.workers.forEach(worker => worker.stop());
+    this.workers = [];
+    this.sessions.clear();
+  }
+
+  private dispatch() {
+    for (let i = 0; i < this.queue.length;) {
+      const call = this.queue[i];
+      const worker = this.workerFor(call);
+      if (worker === undefined) {
+        i++; // Its worker is busy - leave it queued
+        continue;
+      }
+      this.queue.splice(i, 1);
+      if (worker === null) {
+        call.reject(new OptimizerError(`Unknown session: ${call.session}`, UNKNOWN_SESSION));
+        continue;
+      }
+      if (call.session) {
+        this.sessions.set(call.session, worker);
+      }
+      worker.send(call);
+    }
+  }
+
+  // Worker to run a call on: undefined to wait, null if its session is gone
+  private workerFor(call: PendingCall): OptimizerWorker | null | undefined {
+    if (call.method === 'reoptimize') {
+      const worker = call.session ? this.sessions.get(call.session) : undefined;
+      if (!worker || worker.exited) return null;
+      return worker.busy ? undefined : worker;
+    }
+    let worker = this.workers.find(w => !w.busy && !w.exited);
+    if (!worker && this.workers.length < this.size) {
+      worker = new OptimizerWorker(this.scriptDir, (w) => this.release(w));
+      this.workers.push(worker);
+    }
+    return worker;
+  }
+
+  private release(worker: OptimizerWorker) {
+    if (worker.exited) {
+      this.workers = this.workers.filter(w => w !== worker);
+      this.sessions.forEach((owner, session) => {
+        if (owner === worker) this.sessions.delete(session);
+      });
+    }
+    this.dispatch();
+  }
+}
+
+// One-shot run: `optimizer.py --stdin` reads the input document from stdin, so
+// concurrent runs never share files
+export function runOptimizerOnce(scriptDir: string, params: OptimizeParams): Promise<any> {
+  return new Promise((resolve, reject) => {
+    const python = spawn('python3', [path.join(scriptDir, 'optimizer.py'), '--stdin'], {
+      cwd: scriptDir,
+      env: optimizerEnv(scriptDir)
+    });
+
+    let output = '';
+    let errorOutput = '';
+    python.stdout.on('data', (data) => { output += data.toString(); });
+    python.stderr.on('data', (data) => { errorOutput += data.toString(); });
+    python.on('error', reject);
+    python.on('close', (code) => {
+      if (errorOutput) {
+        console.log('PYTHON STDERR:', errorOutput);
+      }
+      try {
+        // Exit code 1 still prints a structured { error } document
+        resolve(JSON.parse(output));
+      } catch (e) {
+        reject(new Error(`Optimizer exited with code ${code}: ${errorOutput}`));
+      }
+    });
+
+    python.stdin.on('error', reject);
+    python.stdin.end(JSON.stringify(params));
+  });
+}
+
+const scriptDir = path.join(process.cwd(), 'server');
+const workerSetting = parseInt(process.env.OPTIMIZER_WORKERS || '2');
+const poolSize = Number.isNaN(workerSetting) ? 2 : workerSetting;
+
+export const optimizerPool = poolSize > 0 ? new OptimizerPool(scriptDir, poolSize) : null;
+
+// Run through the warm pool, or a one-shot process when OPTIMIZER_WORKERS=0.
+// With the pool, ``session`` keeps the parsed inputs for reoptimizeSession();
+// either way it names the run's profile captures.
+export function runOptimizer(params: OptimizeParams, session?: string): Promise<any> {
+  if (optimizerPool) {
+    return optimizerPool.optimize(params, session);
+  }
+  return runOptimizerOnce(scriptDir, session ? { ...params, session } : params);
+}
+
+// Apply changes to a session kept by runOptimizer(); rejects with code
+// UNKNOWN_SESSION when there is none (one-shot mode, or its worker exited)
+export function reoptimizeSession(session: string, delta: OptimizeDelta[]): Promise<any> {
+  if (!optimizerPool) {
+    return Promise.reject(new OptimizerError(`Unknown session: ${session}`, UNKNOWN_SESSION));
+  }
+  return optimizerPool.reoptimize(session, delta);
+}
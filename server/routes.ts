@@ -11,12 +11,49 @@ import {
   insertSwimmersRegistrySchema,
   type InsertSwimmer,
   type InsertSwimmerTime,
+  type Swimmer,
+  type SwimmerTime,
 } from "../shared/schema";
 import path from "path";
 import fs from "fs";
 import { spawn } from "child_process";
+import { runOptimizer, reoptimizeSession, OptimizerError, UNKNOWN_SESSION, type OptimizeDelta } from "./optimizerPool";
 import { COMPETITION_TYPES, CUSTOM_COMPETITION_CONFIG, type CompetitionType } from "@shared/constants";
 
+// Optional solver settings a client may send in the body of POST /api/optimize/:teamId,
+// each with the check its value must pass (mirrors CONFIG_OPTION_TYPES in optimizer.py)
+const isCount = (min: number) => (value: unknown) => Number.isInteger(value) && (value as number) >= min;
+const isOneOf = (...options: string[]) => (value: unknown) => typeof value === 'string' && options.includes(value);
+const isNonNegative = (value: unknown) => typeof value === 'number' && Number.isFinite(value) && value >= 0;
+
+const OPTIMIZER_OPTIONS: Record<string, { check: (value: unknown) => boolean; expected: string }> = {
+  solverMode: { check: isOneOf('sequential', 'joint'), expected: '"sequential" or "joint"' },
+  individualSolver: { check: isOneOf('exact', 'greedy'), expected: '"exact" or "greedy"' },
+  maxRelayEvents: { check: value => value === null || isCount(0)(value), expected: 'an integer >= 0 or null' },
+  maxTotalEvents: { check: value => value === null || isCount(0)(value), expected: 'an integer >= 0 or null' },
+  relayWeight: { check: isNonNegative, expected: 'a number >= 0' },
+  relayTeamsPerEvent: { check: isCount(1), expected: 'an integer >= 1' },
+  relaySolver: { check: isOneOf('per_event', 'global'), expected: '"per_event" or "global"' },
+  indexBackend: { check: isOneOf('python', 'numpy'), expected: '"python" or "numpy"' },
+  alternatives: { check: isCount(0), expected: 'an integer >= 0' },
+  collectStats: { check: value => typeof value === 'boolean', expected: 'true or false' },
+  timeLimitMs: { check: isNonNegative, expected: 'a number >= 0' },
+};
+
+// The optimizer options present in a request body, or an error naming the first bad one
+function parseOptimizerOptions(body: any): { options: Record<string, unknown> } | { error: string } {
+  const options: Record<string, unknown> = {};
+  for (const [key, { check, expected }] of Object.entries(OPTIMIZER_OPTIONS)) {
+    const value = body?.[key];
+    if (value === undefined) continue;
+    if (!check(value)) {
+      return { error: `${key} must be ${expected}` };
+    }
+    options[key] = value;
+  }
+  return { options };
+}
+
 function parseCSVLine(line: string): string[] {
   const result: string[] = [];
   let current = '';
@@ -39,6 +76,84 @@ function parseCSVLine(line: string): string[] {
   return result;
 }
 
+// Name of a team's kept optimizer session (see /api/optimize/:teamId/delta)
+function optimizerSession(teamId: number): string {
+  return `team_${teamId}`;
+}
+
+// One member_pbs.csv row for the optimizer, with explicit column mapping - ensuring no undefined values
+function memberPbCsvRow(swimmer: Swimmer, time: SwimmerTime, competitionType?: string): (string | number)[] {
+  return [
+    swimmer.firstName || '',
+    swimmer.lastName || '',
+    swimmer.asaNo || '',
+    swimmer.dateOfBirth || '',
+    time.meet || '',
+    time.date || '',
+    time.event || '',
+    time.time || '',
+    time.course || '',
+    swimmer.gender || '',
+    calculateAgeFromDateOfBirth(swimmer.dateOfBirth, competitionType) || '',
+    '', // County_QT (empty)
+    '', // Count_CT (empty)
+    time.countyQualify || 'No',
+    time.timeInSeconds || '',
+    swimmer.isAvailable ? 'true' : 'false'
+  ];
+}
+
+// Replace a team's stored optimization results and mark its selection done
+async function saveOptimizationResults(teamId: number, results: any) {
+  // Clear previous optimization results for this team
+  await storage.clearOptimizationResults(teamId);
+  
+  // Generate a session ID for this optimization run
+  const sessionId = `team_${teamId}_${Date.now()}`;
+  
+  // Save individual event results to database
+  for (const individualResult of results.individual) {
+    await storage.createOptimizationResult({
+      teamId,
+      sessionId,
+      resultType: 'individual',
+      event: individualResult.event,
+      swimmers: JSON.stringify({
+        swimmer: individualResult.swimmer,
+        time: individualResult.time,
+        index: individualResult.index,
+        status: individualResult.status
+      }),
+      totalTime: individualResult.time,
+      createdAt: new Date().toISOString()
+    });
+  }
+  
+  // Save relay event results to database
+  for (const relayResult of results.relay) {
+    await storage.createOptimizationResult({
+      teamId,
+      sessionId,
+      resultType: 'relay',
+      event: relayResult.relay,
+      swimmers: JSON.stringify({
+        swimmers: relayResult.swimmers,
+        totalTime: relayResult.totalTime
+      }),
+      totalTime: relayResult.totalTime,
+      createdAt: new Date().toISOString()
+    });
+  }
+  
+  console.log(`BACKEND: Saved ${results.individual.length} individual and ${results.relay.length} relay results to database`);
+  
+  // Update team status to "selected" and current step to results (4)
+  await storage.updateTeam(teamId, { 
+    status: "selected",
+    currentStep: 4
+  });
+}
+
 function calculateAgeFromDateOfBirth(dateOfBirth: string, competitionType?: string): number {
   try {
     // Parse date in YYYY-MM-DD format
@@ -595,6 +710,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
   app.post("/api/optimize/:teamId", async (req, res) => {
     const teamId = parseInt(req.params.teamId);
     console.log(`Optimization endpoint called for team ${teamId}`);
+    const parsedOptions = parseOptimizerOptions(req.body);
+    if ('error' in parsedOptions) {
+      return res.status(400).json({ message: parsedOptions.error });
+    }
     
     // Check assignments in storage when optimization starts
     const testAssignments = await storage.getEventAssignments(teamId);
@@ -612,14 +731,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
       
       const teamEvents = await storage.getTeamEvents(teamId);
       
-      // Use fixed file names in the script directory
-      const scriptDir = path.join(process.cwd(), 'server');
-      const memberPbsPath = path.join(scriptDir, 'member_pbs.csv');
-      const countyTimesPath = path.join(scriptDir, 'county_times_cleaned.csv');
-      const preAssignmentsPath = path.join(scriptDir, 'pre_assignments.json');
-      const eventListPath = path.join(scriptDir, 'event_list.json');
-      const configPath = path.join(scriptDir, 'optimization_config.json');
-
       // Get pre-assignments from storage BEFORE clearing anything
       const eventAssignments = await storage.getEventAssignments(teamId);
       const relayAssignments = await storage.getRelayAssignments(teamId);
@@ -672,19 +783,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
         competitionType: team.competitionType,
         totalEvents: teamEvents.length,
         individualEvents: teamEvents.filter(e => !e.isRelay).length,
-        relayEvents: teamEvents.filter(e => e.isRelay).length
+        relayEvents: teamEvents.filter(e => e.isRelay).length,
+        ...parsedOptions.options
       };
       
       console.log(`BACKEND: Generated event list with ${allEvents.length} total events (${teamEvents.filter(e => !e.isRelay).length} individual, ${teamEvents.filter(e => e.isRelay).length} relay) for ${team.competitionType}`);
       console.log(`BACKEND: Max individual events per swimmer: ${optimizationConfig.maxIndividualEvents}`);
       
-      // Save files for Python optimizer
-      fs.writeFileSync(preAssignmentsPath, JSON.stringify(preAssignments, null, 2));
-      fs.writeFileSync(eventListPath, JSON.stringify(allEvents, null, 2));
-      fs.writeFileSync(configPath, JSON.stringify(optimizationConfig, null, 2));
-      
-      console.log('Pre-assignments saved to file:', preAssignments);
-      console.log('Event list saved for optimizer:', allEvents.slice(0, 5), '...');
+      console.log('Event list for optimizer:', allEvents.slice(0, 5), '...');
 
       // Export swimmer data to CSV - ALL SWIMMERS WITH AVAILABILITY STATUS
       const swimmerTimes = await storage.getSwimmerTimes(teamId);
@@ -707,28 +813,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
         const swimmer = allSwimmers.find(s => s.id === time.swimmerId);
         if (swimmer) {
           csvRowCount++;
-          const availabilityStatus = swimmer.isAvailable ? 'true' : 'false';
-          
-          // Build CSV row with explicit column mapping - ensuring no undefined values
-          const csvRow = [
-            swimmer.firstName || '',
-            swimmer.lastName || '',
-            swimmer.asaNo || '',
-            swimmer.dateOfBirth || '',
-            time.meet || '',
-            time.date || '',
-            time.event || '',
-            time.time || '',
-            time.course || '',
-            swimmer.gender || '',
-            calculateAgeFromDateOfBirth(swimmer.dateOfBirth, team.competitionType) || '',
-            '', // County_QT (empty)
-            '', // Count_CT (empty)
-            time.countyQualify || 'No',
-            time.timeInSeconds || '',
-            availabilityStatus
-          ];
           
+          const csvRow = memberPbCsvRow(swimmer, time, team.competitionType);
           const csvRowString = csvRow.join(',');
           
           if (csvRowCount <= 3) { // Log first 3 rows for debugging
@@ -742,12 +828,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
       
       console.log(`BACKEND: Generated CSV with ${csvRowCount} data rows`);
       
-      fs.writeFileSync(memberPbsPath, csvContent);
-      
-      // Debug: Check what was actually written
-      const writtenContent = fs.readFileSync(memberPbsPath, 'utf8');
-      const lines = writtenContent.split('\n');
-      console.log(`BACKEND: CSV file written with ${lines.length} lines total`);
+      const lines = csvContent.split('\n');
+      console.log(`BACKEND: CSV has ${lines.length} lines total`);
       console.log(`BACKEND: Header line: ${lines[0]}`);
       if (lines.length > 1) {
         console.log(`BACKEND: First data line: ${lines[1]}`);
@@ -762,142 +844,96 @@ export async function registerRoutes(app: Express): Promise<Server> {
         countyTimesContent += `${time.event},${time.time},${time.ageCategory},${time.course},${time.timeType},${time.gender}\n`;
       }
       
-      fs.writeFileSync(countyTimesPath, countyTimesContent);
-
-      console.log('Files created successfully, running Python script...');
-
-      // Run Python optimization script
-      const pythonScript = path.join(process.cwd(), 'server', 'optimizer.py');
-      const python = spawn('python3', [pythonScript], {
-        cwd: scriptDir
-      });
-
-      let output = '';
-      let errorOutput = '';
-
-      python.stdout.on('data', (data) => {
-        output += data.toString();
-      });
-
-      python.stderr.on('data', (data) => {
-        errorOutput += data.toString();
-      });
-
-      python.on('close', async (code) => {
-        // Show Python debugging output
-        if (output) {
-          console.log('PYTHON STDOUT:');
-          console.log(output);
-        }
-        if (errorOutput) {
-          console.log('PYTHON STDERR:');
-          console.log(errorOutput);
-        }
-        
-        console.log(`PYTHON SCRIPT: Exited with code ${code}`);
+      console.log('Running optimizer...');
+
+      let results: any;
+      try {
+        results = await runOptimizer({
+          memberPbs: csvContent,
+          countyTimes: countyTimesContent,
+          events: allEvents,
+          preAssignments,
+          config: optimizationConfig,
+          team: `${team.id}-${team.name}`,
+          // Captures hold member names and PBs; only honoured when the server opts in
+          profile: process.env.OPTIMIZER_PROFILE === 'requests' && req.body?.profile === true
+        }, optimizerSession(teamId));
+      } catch (error) {
+        console.error('Optimizer error:', error);
+        return res.status(500).json({ message: 'Optimization failed', error: String(error) });
+      }
 
-        // Try to read debug log file
-        try {
-          const debugLogPath = path.join(scriptDir, 'debug.log');
-          if (fs.existsSync(debugLogPath)) {
-            const debugContent = fs.readFileSync(debugLogPath, 'utf8');
-            console.log('PYTHON DEBUG LOG:');
-            console.log(debugContent);
-            fs.unlinkSync(debugLogPath); // Clean up
-          }
-        } catch (e) {
-          console.log('No debug log found');
-        }
+      if (results.error) {
+        console.log('PYTHON: Handled error response:', results.error);
+        return res.json(results); // Return the structured error response
+      }
 
-        // Clean up temp files
-        try {
-          fs.unlinkSync(memberPbsPath);
-          fs.unlinkSync(countyTimesPath);
-          fs.unlinkSync(preAssignmentsPath);
-        } catch (e) {
-          console.log('Error cleaning up temp files:', e);
-        }
+      console.log(`PYTHON: Optimization completed successfully${results.cacheHit ? ' (result cache hit)' : ''}`);
+      
+      await saveOptimizationResults(teamId, results);
+      
+      res.json(results);
 
-        if (code !== 0) {
-          console.error('Python script error:', errorOutput);
-          
-          // Try to parse error output as JSON first (early exit case)
-          try {
-            const errorResult = JSON.parse(output);
-            if (errorResult.error) {
-              console.log('PYTHON: Handled error response:', errorResult.error);
-              return res.json(errorResult); // Return the structured error response
-            }
-          } catch (parseError) {
-            // Not JSON, treat as regular error
-            console.log('PYTHON: Non-JSON error output');
-          }
-          
-          return res.status(500).json({ message: 'Optimization failed', error: errorOutput });
-        }
+    } catch (error) {
+      console.error('Optimization error:', error);
+      res.status(500).json({ message: 'Optimization failed', error: String(error) });
+    }
+  });
 
-        try {
-          const results = JSON.parse(output);
-          console.log('PYTHON: Optimization completed successfully');
-          
-          // Clear previous optimization results for this team
-          await storage.clearOptimizationResults(teamId);
-          
-          // Generate a session ID for this optimization run
-          const sessionId = `team_${teamId}_${Date.now()}`;
-          
-          // Save individual event results to database
-          for (const individualResult of results.individual) {
-            await storage.createOptimizationResult({
-              teamId,
-              sessionId,
-              resultType: 'individual',
-              event: individualResult.event,
-              swimmers: JSON.stringify({
-                swimmer: individualResult.swimmer,
-                time: individualResult.time,
-                index: individualResult.index,
-                status: individualResult.status
-              }),
-              totalTime: individualResult.time,
-              createdAt: new Date().toISOString()
-            });
-          }
-          
-          // Save relay event results to database
-          for (const relayResult of results.relay) {
-            await storage.createOptimizationResult({
-              teamId,
-              sessionId,
-              resultType: 'relay',
-              event: relayResult.relay,
-              swimmers: JSON.stringify({
-                swimmers: relayResult.swimmers,
-                totalTime: relayResult.totalTime
-              }),
-              totalTime: relayResult.totalTime,
-              createdAt: new Date().toISOString()
-            });
+  // Re-optimize after small changes (availability, a new PB, a pre-assignment)
+  // without re-exporting the squad. Body: { delta: [...] } with optimizer delta ops;
+  // "addSwimmer" takes a swimmerId and the route exports that swimmer's PBs.
+  // Answers 409 when there is no kept session, and the client runs a full optimization.
+  app.post("/api/optimize/:teamId/delta", async (req, res) => {
+    const teamId = parseInt(req.params.teamId);
+    try {
+      const team = await storage.getTeam(teamId);
+      if (!team) {
+        return res.status(404).json({ message: "Team not found" });
+      }
+      if (!Array.isArray(req.body?.delta)) {
+        return res.status(400).json({ message: "delta must be an array" });
+      }
+      
+      const delta: OptimizeDelta[] = [];
+      for (const change of req.body.delta) {
+        if (change?.op === 'addSwimmer' && change.swimmerId !== undefined) {
+          const allSwimmers = await storage.getSwimmers(teamId);
+          const swimmer = allSwimmers.find(s => s.asaNo === String(change.swimmerId));
+          if (!swimmer) {
+            return res.status(400).json({ message: `Unknown swimmer ${change.swimmerId}` });
           }
-          
-          console.log(`BACKEND: Saved ${results.individual.length} individual and ${results.relay.length} relay results to database`);
-          
-          // Update team status to "selected" and current step to results (4)
-          await storage.updateTeam(teamId, { 
-            status: "selected",
-            currentStep: 4
+          const swimmerTimes = (await storage.getSwimmerTimes(teamId)).filter(t => t.swimmerId === swimmer.id);
+          delta.push({
+            op: 'addSwimmer',
+            memberPbs: swimmerTimes.map(time => memberPbCsvRow(swimmer, time, team.competitionType).join(',')).join('\n')
           });
-          
-          res.json(results);
-        } catch (parseError) {
-          console.error('Failed to parse optimization results:', parseError);
-          console.error('Raw output was:', output);
-          res.status(500).json({ message: 'Failed to parse optimization results' });
+        } else {
+          delta.push(change);
         }
-      });
-
+      }
+      
+      let results: any;
+      try {
+        results = await reoptimizeSession(optimizerSession(teamId), delta);
+      } catch (error) {
+        if (error instanceof OptimizerError && error.code === UNKNOWN_SESSION) {
+          return res.status(409).json({ message: 'No optimization session for this team - run a full optimization' });
+        }
+        console.error('Optimizer error:', error);
+        return res.status(500).json({ message: 'Optimization failed', error: String(error) });
+      }
+      
+      if (results.error) {
+        return res.json(results);
+      }
+      
+      await storage.clearNonPreAssignedEventAssignments(teamId);
+      await storage.clearNonPreAssignedRelayAssignments(teamId);
+      await saveOptimizationResults(teamId, results);
+      res.json(results);
     } catch (error) {
-      console.error('Optimization error:', error);
+      console.error('Incremental optimization error:', error);
       res.status(500).json({ message: 'Optimization failed', error: String(error) });
     }
   });
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# optimizer.py runs as a script from server/; the benchmarks package lives at the root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'server'), ROOT]
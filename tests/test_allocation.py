@@ -0,0 +1,87 @@
+"""AllocationState bookkeeping against the list scans it replaced."""
+import random
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+EVENTS = [('50m Freestyle', 11, 'Male'), ('50m Backstroke', 11, 'Male'), ('50m Freestyle', 13, 'Female')]
+
+def random_instance(rng):
+    """(event_list, full_list, protected_events, swimmer_event_count) with pre-assignments."""
+    names = [f'Swimmer {number}' for number in range(rng.randint(1, 6))]
+    event_list = [list(event) + ['Not allocated'] for event in EVENTS for _ in range(rng.randint(1, 2))]
+    full_list = [list(event) + [round(rng.uniform(-0.2, 0.3), 3), name]
+                 for event in EVENTS for name in names if rng.random() < 0.7]
+    full_list.sort(key=lambda entry: entry[-2])
+    protected_events, swimmer_event_count = set(), {}
+    for event in event_list:
+        if rng.random() < 0.2:
+            event[-1] = rng.choice(names)
+            protected_events.add(tuple(event[:3]))
+            swimmer_event_count[event[-1]] = swimmer_event_count.get(event[-1], 0) + 1
+    return event_list, full_list, protected_events, swimmer_event_count
+
+def scan_greedy(event_list, full_list, protected_events, swimmer_event_count, max_events):
+    """The original greedy: rescan event_list for a free slot on every entry."""
+    for entry in full_list:
+        swimmer_name, event_key = entry[-1], tuple(entry[:3])
+        if swimmer_event_count.get(swimmer_name, 0) >= max_events or event_key in protected_events:
+            continue
+        for event in event_list:
+            if tuple(event[:3]) == event_key and event[-1] == 'Not allocated':
+                event[-1] = swimmer_name
+                swimmer_event_count[swimmer_name] = swimmer_event_count.get(swimmer_name, 0) + 1
+                break
+
+@pytest.mark.parametrize('seed', range(100))
+def test_greedy_matches_scan(seed):
+    rng = random.Random(seed)
+    event_list, full_list, protected_events, swimmer_event_count = random_instance(rng)
+    max_events = rng.randint(1, 2)
+    open_list = [list(event) for event in event_list]
+    expected = [list(event) for event in event_list]
+    expected_counts = dict(swimmer_event_count)
+    scan_greedy(expected, full_list, protected_events, expected_counts, max_events)
+
+    state = optimizer.AllocationState(event_list, protected_events, swimmer_event_count, full_list)
+    assigned = optimizer.allocate_individual_greedy(full_list, state, max_events)
+
+    assert event_list == expected
+    assert swimmer_event_count == expected_counts
+    assert assigned == sum(before[-1] == 'Not allocated' != after[-1] for before, after in zip(open_list, expected))
+
+def test_state_tracks_open_slots_and_counts():
+    event_list = [['50m Freestyle', 11, 'Male', 'Not allocated'], ['50m Freestyle', 11, 'Male', 'Not allocated'],
+                  ['50m Backstroke', 11, 'Male', 'Ann Lee']]
+    full_list = [['50m Freestyle', 11, 'Male', 0.1, 'Bob Ray'], ['50m Freestyle', 11, 'Male', 0.2, 'Bob Ray']]
+    counts = {'Ann Lee': 1}
+    state = optimizer.AllocationState(event_list, {('50m Backstroke', 11, 'Male')}, counts, full_list)
+
+    assert state.open_slot(('50m Backstroke', 11, 'Male')) is None
+    assert state.open_slot(('50m Freestyle', 11, 'Male')) == 0
+    state.assign(0, 'Bob Ray')
+
+    assert state.open_slot(('50m Freestyle', 11, 'Male')) == 1
+    assert event_list[0][-1] == 'Bob Ray'
+    # The swimmer's best entry for the event, not the later one
+    assert state.entries[0] is full_list[0]
+    assert counts == {'Ann Lee': 1, 'Bob Ray': 1}
+    assert not state.has_capacity('Bob Ray', 1) and state.has_capacity('Bob Ray', 2)
+
+def test_results_carry_the_winning_entry():
+    swimmers, events, standards, pre_assignments, config = optimizer.parse_document(generate_club(60, 'arena_league', 7))
+    result = optimizer.optimize(swimmers, events, standards, pre_assignments, config)
+
+    events_by_label = {f'{age}U {gender} {event_name}': (event_name, age, gender) for event_name, age, gender in events}
+    assert result.individual
+    for entry in result.individual:
+        event_name, age, gender = events_by_label[entry['event']]
+        # full_list is sorted by index, so the first matching entry is the swimmer's fastest eligible PB
+        best = min(swimmer.time for swimmer in swimmers
+                   if f'{swimmer.first_name} {swimmer.last_name}' == entry['swimmer'] and swimmer.event == event_name
+                   and swimmer.gender == gender and swimmer.age <= age)
+        assert entry['time'] == f'{best:.2f}s'
+        qualifying_time = optimizer.county_standard(standards, event_name, age, gender)
+        assert entry['index'] == round(round(best - qualifying_time, 2) / qualifying_time, 3)
@@ -0,0 +1,43 @@
+"""Top-K alternative line-ups against brute force."""
+import random
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+from test_optimizer import brute_lineups, random_entries
+
+@pytest.mark.parametrize('seed', range(200))
+def test_alternatives_match_brute_force(seed):
+    rng = random.Random(seed)
+    event_list, full_list = random_entries(rng)
+    max_events = rng.randint(1, 2)
+    count = rng.randint(1, 6)
+    state = optimizer.AllocationState([list(event) for event in event_list], set(), {}, full_list)
+
+    rows = optimizer.individual_alternatives(full_list, state, max_events, count)
+
+    slot_events, _, best_cost = optimizer.build_individual_slots(full_list, state.event_list, set())
+    slot_keys = [tuple(event_list[position][:3]) for position in slot_events]
+    ranked = {}
+    for lineup in brute_lineups(slot_keys, best_cost, max_events):
+        # Swapping swimmers between duplicate event rows gives the same line-up
+        key = tuple(sorted((slot_keys[slot], name) for slot, name in lineup.items()))
+        index = sum(state.best_entries[(name, slot_keys[slot])][-2] for slot, name in lineup.items())
+        ranked[key] = (-len(lineup), round(index, 6))
+    ranked = sorted(ranked.values())
+    expected = [(ranked[0][0] - events, round(index - ranked[0][1], 3)) for events, index in ranked[1:count + 1]]
+    assert [(row['individualEventsDelta'], row['indexDelta']) for row in rows] == expected
+
+def test_alternatives_need_sequential_exact_solver(capsys):
+    swimmers, events, standards, pre_assignments, config = optimizer.parse_document(generate_club(30, 'arena_league', 14))
+
+    exact = optimizer.optimize(swimmers, events, standards, pre_assignments, dict(config, alternatives=2))
+    joint = optimizer.optimize(swimmers, events, standards, pre_assignments, dict(config, alternatives=2, solverMode='joint'))
+    greedy = optimizer.optimize(swimmers, events, standards, pre_assignments,
+                                dict(config, alternatives=2, individualSolver='greedy'))
+
+    assert [row['rank'] for row in exact.alternatives] == [1, 2]
+    assert joint.alternatives is None and greedy.alternatives is None
+    err = capsys.readouterr().err
+    assert 'not available in joint mode' in err and 'need the exact individual solver' in err
@@ -0,0 +1,31 @@
+"""Indexed eligibility against the nested event × swimmer scan it replaced."""
+import random
+
+import pytest
+
+import optimizer
+
+EVENTS = ['50m Freestyle', '50m Backstroke', '100m Individual Medley']
+GENDERS = ['Male', 'Female']
+
+def random_rows(rng):
+    """member_pbs rows: [first, last, event, gender, age, time, asa]"""
+    rows = []
+    for number in range(rng.randint(0, 30)):
+        gender, age = rng.choice(GENDERS), rng.randint(8, 18)
+        for event_name in rng.sample(EVENTS, rng.randint(1, len(EVENTS))):
+            rows.append(['Swimmer', str(number), event_name, gender, str(age), str(rng.uniform(30, 90)), str(number)])
+    rng.shuffle(rows)
+    return rows
+
+@pytest.mark.parametrize('seed', range(50))
+def test_eligible_rows_match_scan(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng)
+    swimmer_index = optimizer.build_swimmer_index(rows)
+
+    for event_name in EVENTS + ['200m Butterfly']:
+        for gender in GENDERS:
+            for age in (10, 11, 13, 15, 99):
+                expected = [row for row in rows if row[2] == event_name and row[3] == gender and int(row[4]) <= age]
+                assert optimizer.eligible_rows(swimmer_index, event_name, age, gender) == expected
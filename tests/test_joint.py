@@ -0,0 +1,52 @@
+"""Joint individual + relay optimisation under shared per-swimmer caps."""
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+@pytest.fixture(scope='module')
+def inputs():
+    return optimizer.parse_document(generate_club(60, 'arena_league', 5))
+
+def solve(inputs, **config):
+    swimmers, events, standards, pre_assignments, base_config = inputs
+    return optimizer.optimize(swimmers, events, standards, pre_assignments, dict(base_config, **config))
+
+def loads(result):
+    """{swimmer: [individual events, relay legs]}"""
+    load = {}
+    for entry in result.individual:
+        load.setdefault(entry['swimmer'], [0, 0])[0] += 1
+    for team in result.relay:
+        for swimmer in team['swimmers']:
+            load.setdefault(swimmer['name'], [0, 0])[1] += 1
+    return load
+
+def test_without_shared_caps_matches_sequential(inputs):
+    joint = solve(inputs, solverMode='joint')
+    sequential = solve(inputs)
+
+    assert optimizer.lineup_summary(joint) == optimizer.lineup_summary(sequential)
+
+@pytest.mark.parametrize('max_total, max_relay', [(3, 2), (2, 1), (2, None)])
+def test_caps_hold(inputs, max_total, max_relay):
+    result = solve(inputs, solverMode='joint', maxTotalEvents=max_total, maxRelayEvents=max_relay)
+
+    for individual, relay in loads(result).values():
+        assert individual <= 2
+        assert individual + relay <= max_total
+        assert max_relay is None or relay <= max_relay
+
+def test_caps_cost_relay_time_not_events(inputs):
+    free = optimizer.lineup_summary(solve(inputs, solverMode='joint'))
+    capped = optimizer.lineup_summary(solve(inputs, solverMode='joint', maxTotalEvents=3, maxRelayEvents=2))
+
+    assert capped['individualEvents'] == free['individualEvents']
+    assert capped['relayTeams'] == free['relayTeams']
+    assert capped['relayTime'] >= free['relayTime']
+
+@pytest.mark.parametrize('option, value', [('maxTotalEvents', -1), ('maxRelayEvents', 1.5),
+                                           ('relayWeight', 'heavy'), ('maxIndividualEvents', True)])
+def test_invalid_options_fall_back_to_defaults(option, value, capsys):
+    assert optimizer.checked_config({option: value, 'solverMode': 'joint'}) == {'solverMode': 'joint'}
+    assert f'Invalid {option}' in capsys.readouterr().err
@@ -0,0 +1,50 @@
+"""Importable optimizer API against the file-driven script."""
+import copy
+import json
+import os
+import subprocess
+import sys
+
+import optimizer
+from benchmarks.synthetic import generate_club, write_club
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server', 'optimizer.py')
+
+def test_read_member_pbs():
+    lines = [
+        optimizer.MEMBER_PBS_HEADER,
+        'Ann,Lee,1,2014-01-01,Gala,2025-01-01,50m Freestyle,35.20,SC,Female,11,,,,35.2,true',
+        'Bob,Ray,2,2014-01-01,Gala,2025-01-01,50m Freestyle,33.10,SC,Male,11,,,,33.1,false',
+        'Cy,Dee,3,2012-01-01,Gala,2025-01-01,50m Backstroke,40.00,LC,Male,13,,,,40.0',
+        'Di,Fox,4,2012-01-01,Gala,2025-01-01,50m Backstroke,,LC,Female,13,,,,NT,true',
+        'too,short',
+    ]
+
+    swimmers, rows = optimizer.read_member_pbs(lines)
+
+    assert rows == 5
+    assert swimmers == [optimizer.SwimmerPB('Ann', 'Lee', '50m Freestyle', 'Female', 11, 35.2, '1'),
+                        optimizer.SwimmerPB('Cy', 'Dee', '50m Backstroke', 'Male', 13, 40.0, '3')]
+
+def test_optimize_leaves_inputs_alone():
+    inputs = optimizer.parse_document(generate_club(40, 'arena_league', 8))
+    before = copy.deepcopy(inputs)
+
+    result = optimizer.optimize(*inputs)
+
+    assert result.error is None and result.individual
+    assert inputs == before
+
+def test_optimize_matches_script(tmp_path):
+    document = generate_club(40, 'arena_league', 8)
+    write_club(str(tmp_path), document)
+
+    run = subprocess.run([sys.executable, SCRIPT], cwd=tmp_path, capture_output=True, text=True, check=True)
+
+    assert json.loads(run.stdout) == optimizer.optimize_document(document).to_dict()
+
+def test_no_available_swimmers():
+    result = optimizer.optimize([], [['50m Freestyle', 11, 'Male']], {})
+
+    assert result.error == "No available swimmers found for optimization"
+    assert result.to_dict()['error'] == result.error
@@ -0,0 +1,58 @@
+"""Leveled, lazily formatted logger."""
+import io
+import json
+
+import pytest
+
+import optimizer
+
+class Unformattable:
+    def __format__(self, spec):
+        raise AssertionError('formatted below the log level')
+
+def logger(level, **options):
+    stream = io.StringIO()
+    return optimizer.Logger(level, stream=stream, **options), stream
+
+def test_messages_below_level_are_not_formatted():
+    log, stream = logger('warning')
+
+    log.debug("row {}", Unformattable())
+    log.info("row {}", Unformattable())
+    log.warning("WARNING: {} rows", 3)
+
+    assert stream.getvalue() == "WARNING: 3 rows\n"
+
+def test_json_lines():
+    log, stream = logger('info', json_lines=True)
+
+    log.info("PYTHON: {} events", 12)
+    log.error("ERROR: {}", 'bad')
+
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [
+        {'level': 'info', 'msg': 'PYTHON: 12 events'}, {'level': 'error', 'msg': 'ERROR: bad'}]
+
+def test_sampled_messages():
+    log, stream = logger('debug', sample_every=3)
+
+    for row in range(7):
+        log.sampled("row {}", row)
+
+    assert stream.getvalue().splitlines() == ['row 0', 'row 3', 'row 6']
+    quiet, quiet_stream = logger('info', sample_every=3)
+    quiet.sampled("row {}", Unformattable())
+    assert quiet_stream.getvalue() == ''
+
+@pytest.mark.parametrize('argv, environ, expected', [
+    ([], {}, (30, False, 100)),
+    (['--log-level', 'debug', '--log-json', '--log-sample', '5'], {}, (10, True, 5)),
+    ([], {'OPTIMIZER_LOG_LEVEL': 'info', 'OPTIMIZER_LOG_FORMAT': 'json', 'OPTIMIZER_LOG_SAMPLE': '7'}, (20, True, 7)),
+    (['--log-level', 'loud', '--log-sample', 'often'], {}, (30, False, 100)),
+])
+def test_configure_logging(argv, environ, expected):
+    try:
+        optimizer.configure_logging(argv, environ)
+        log = optimizer.log
+        assert (log.threshold, log.json_lines, log.sample_every) == expected
+    finally:
+        optimizer.configure_logging([], {})
@@ -0,0 +1,48 @@
+"""Solver checks against brute force on small seeded instances."""
+import itertools
+import random
+
+import pytest
+
+import optimizer
+
+EVENTS = [('50m Freestyle', 11, 'Male'), ('50m Backstroke', 11, 'Male'), ('50m Butterfly', 11, 'Male')]
+
+def random_entries(rng):
+    """(event_list, full_list) with 1-2 rows per event and up to 4 swimmers."""
+    event_list = [list(event) + ['Not allocated'] for event in EVENTS for _ in range(rng.randint(1, 2))]
+    full_list = []
+    for number in range(rng.randint(1, 4)):
+        for event in EVENTS:
+            if rng.random() < 0.6:
+                full_list.append(list(event) + [round(rng.uniform(0.9, 1.2), 2), f'Swimmer {number}'])
+    full_list.sort(key=lambda entry: entry[-2])
+    return event_list, full_list
+
+def brute_lineups(slot_keys, best_cost, max_events):
+    """Every line-up as {slot -> swimmer}, empty slots left out."""
+    options = [[None] + [name for name, event_key in best_cost if event_key == key] for key in slot_keys]
+    for picks in itertools.product(*options):
+        names = [name for name in picks if name is not None]
+        if all(names.count(name) <= max_events for name in names):
+            yield {slot: name for slot, name in enumerate(picks) if name is not None}
+
+@pytest.mark.parametrize('seed', range(200))
+def test_individual_flow_matches_brute_force(seed):
+    rng = random.Random(seed)
+    event_list, full_list = random_entries(rng)
+    max_events = rng.randint(1, 2)
+    slot_events, slots_by_key, best_cost = optimizer.build_individual_slots(full_list, event_list, set())
+    slot_keys = [tuple(event_list[position][:3]) for position in slot_events]
+    capacities = {name: max_events for name, _ in best_cost}
+
+    assignment, _ = optimizer.solve_individual_flow(len(slot_events), slots_by_key, best_cost, capacities)
+
+    def rank(lineup):
+        # Most events filled first, then the lowest summed cost
+        return -len(lineup), sum(best_cost[(name, slot_keys[slot])] for slot, name in lineup.items())
+
+    best = min(rank(lineup) for lineup in brute_lineups(slot_keys, best_cost, max_events))
+    assert rank(assignment) == best
+    assert all((name, slot_keys[slot]) in best_cost for slot, name in assignment.items())
+    assert all(list(assignment.values()).count(name) <= max_events for name in assignment.values())
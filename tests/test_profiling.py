@@ -0,0 +1,57 @@
+"""Profiling captures: opt-in, naming and rotation."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server')
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    optimizer.configure_profiling([], {'OPTIMIZER_PROFILE': 'requests', 'OPTIMIZER_PROFILE_DIR': str(tmp_path),
+                                       'OPTIMIZER_PROFILE_KEEP': '2'})
+    yield tmp_path
+    optimizer.configure_profiling([], {})
+
+def captures(directory):
+    return sorted(name[:-len('.input.json')] for name in os.listdir(directory) if name.endswith('.input.json'))
+
+def test_capture_needs_profile_flag(profile_dir):
+    assert optimizer.run_profiled({'team': '7-Sharks'}, lambda: 42) == 42
+    assert captures(profile_dir) == []
+
+def test_capture_is_named_by_team_and_session(profile_dir):
+    document = {'team': '7-Sharks', 'session': 'team_7', 'profile': True}
+
+    assert optimizer.run_profiled(document, lambda: 42) == 42
+
+    [stem] = captures(profile_dir)
+    assert stem.startswith('7-Sharks_team-7_')
+    assert sorted(os.listdir(profile_dir)) == [stem + suffix for suffix in ('.alloc.txt', '.input.json', '.pstats')]
+    with open(profile_dir / (stem + '.input.json')) as f:
+        assert json.load(f) == {'team': '7-Sharks', 'session': 'team_7'}
+
+def test_only_newest_captures_are_kept(profile_dir):
+    for run in range(3):
+        optimizer.run_profiled({'team': '7-Sharks', 'session': f'run{run}', 'profile': True}, lambda: None)
+        stem = captures(profile_dir)[-1]
+        os.utime(profile_dir / (stem + '.input.json'), (run, run))
+
+    assert [stem.split('_')[1] for stem in captures(profile_dir)] == ['run1', 'run2']
+    assert len(os.listdir(profile_dir)) == 6
+
+def test_stdin_run_names_capture_by_session(tmp_path):
+    document = dict(generate_club(20, 'arena_league', 0), team='7-Sharks', session='team_7', profile=True)
+    env = dict(os.environ, OPTIMIZER_PROFILE='requests', OPTIMIZER_PROFILE_DIR=str(tmp_path))
+
+    run = subprocess.run([sys.executable, 'optimizer.py', '--stdin'], input=json.dumps(document), cwd=SERVER,
+                         env=env, capture_output=True, text=True, check=True)
+
+    assert json.loads(run.stdout)['individual']
+    [stem] = captures(tmp_path)
+    assert stem.startswith('7-Sharks_team-7_')
@@ -0,0 +1,217 @@
+"""Relay team building: leg assignment and the per-event builder."""
+import itertools
+import random
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+@pytest.mark.parametrize('seed', range(200))
+def test_leg_assignment_matches_brute_force(seed):
+    rng = random.Random(seed)
+    leg_count = rng.randint(1, 4)
+    names = [f'Swimmer {number}' for number in range(rng.randint(1, 6))]
+    leg_costs = [{name: rng.randint(25, 40) for name in names if rng.random() < 0.7} for _ in range(leg_count)]
+
+    cost, team = optimizer.solve_leg_assignment(leg_costs)
+
+    teams = [picks for picks in itertools.permutations(names, leg_count)
+             if all(name in costs for name, costs in zip(picks, leg_costs))]
+    if not teams:
+        assert (cost, team) == (None, None)
+        return
+    best = min(sum(costs[name] for name, costs in zip(picks, leg_costs)) for picks in teams)
+    assert cost == best
+    assert len(set(team)) == leg_count
+    assert sum(costs[name] for name, costs in zip(team, leg_costs)) == best
+
+@pytest.fixture(scope='module')
+def relay_inputs():
+    swimmers, events, _, _, _ = optimizer.parse_document(generate_club(40, 'county_relays', 3))
+    relay_swimmers = optimizer.build_relay_swimmers(optimizer.build_swimmer_index([row.as_row() for row in swimmers]))
+    relay_events = {}
+    for event_name, age, gender in (event[:3] for event in events if optimizer.is_relay_event(event[0])):
+        if optimizer.relay_event_kind(event_name) in ('freestyle', 'medley') and gender != 'Mixed':
+            relay_events.setdefault((age, gender), []).append(event_name)
+    return relay_swimmers, relay_events
+
+def brute_team_time(legs, relay_swimmers, fixed):
+    """Fastest total over every team of distinct eligible swimmers, or None."""
+    pools = [{name: time for name, time in optimizer.leg_candidates(leg, relay_swimmers).items()
+              if fixed.get(position, name) == name} for position, leg in enumerate(legs)]
+    best = None
+    for picks in itertools.product(*pools):
+        if len(set(picks)) == len(picks):
+            total = sum(pool[name] for name, pool in zip(picks, pools))
+            best = total if best is None else min(best, total)
+    return best
+
+def test_teams_are_fastest(relay_inputs):
+    relay_swimmers, relay_events = relay_inputs
+    freestyle, medley = optimizer.build_relay_teams(relay_events, relay_swimmers, {})
+
+    teams = {team['relay']: team for team in freestyle + medley}
+    for (age, gender), event_names in relay_events.items():
+        for event_name in event_names:
+            plan = {'kind': optimizer.relay_event_kind(event_name), 'event_name': event_name, 'age': age, 'gender': gender}
+            best = brute_team_time(optimizer.relay_legs(event_name, age, gender), relay_swimmers, {})
+            team = teams.get(optimizer.relay_team_name(plan))
+            assert (team is None) == (best is None)
+            if team is not None:
+                assert optimizer.convert_to_seconds_with_milliseconds(team['totalTime']) == pytest.approx(best, abs=0.01)
+
+def test_pre_assigned_leg_stays_fixed(relay_inputs):
+    relay_swimmers, relay_events = relay_inputs
+    (age, gender), event_names = next((key, names) for key, names in relay_events.items()
+                                      if any('Medley' in name for name in names))
+    event_name = next(name for name in event_names if 'Medley' in name)
+    legs = optimizer.relay_legs(event_name, age, gender)
+    # The slowest eligible breaststroker, so the optimal team would not pick them
+    candidates = optimizer.leg_candidates(legs[1], relay_swimmers)
+    swimmer_name = max(candidates, key=candidates.get)
+    protected = {(event_name, age, gender): {2: {'swimmer': swimmer_name, 'stroke': 'Breaststroke'}}}
+
+    _, medley = optimizer.build_relay_teams({(age, gender): [event_name]}, relay_swimmers, protected)
+
+    assert [swimmer['stroke'] for swimmer in medley[0]['swimmers'] if swimmer['name'] == swimmer_name] == ['Breaststroke']
+    best = brute_team_time(legs, relay_swimmers, {1: swimmer_name})
+    assert optimizer.convert_to_seconds_with_milliseconds(medley[0]['totalTime']) == pytest.approx(best, abs=0.01)
+
+@pytest.fixture(scope='module')
+def arena_swimmers():
+    swimmers, _, _, _, _ = optimizer.parse_document(generate_club(40, 'arena_league', 3))
+    return optimizer.build_relay_swimmers(optimizer.build_swimmer_index([row.as_row() for row in swimmers]))
+
+def test_mixed_medley_takes_two_of_each_gender(arena_swimmers):
+    teams = optimizer.build_squadrun_relay([['4x50m Medley', 11, 'Mixed']], arena_swimmers, {})
+
+    assert [team['relay'] for team in teams] == ['11U Mixed 4x50m Medley']
+    names = [swimmer['name'] for swimmer in teams[0]['swimmers']]
+    assert sorted(arena_swimmers[name].gender for name in names) == ['Female', 'Female', 'Male', 'Male']
+    # Fastest over every stroke order of two girls and two boys
+    slots = [optimizer.relay_time_slot(stroke, 50) for stroke in optimizer.MEDLEY_STROKES]
+    eligible = [swimmer for swimmer in arena_swimmers.values() if swimmer.age <= 11]
+    best = min(sum(swimmer.times[slot] for swimmer, slot in zip(picks, slots))
+               for picks in itertools.permutations(eligible, 4)
+               if all(swimmer.times[slot] is not None for swimmer, slot in zip(picks, slots))
+               and sorted(swimmer.gender for swimmer in picks) == ['Female', 'Female', 'Male', 'Male'])
+    assert optimizer.convert_to_seconds_with_milliseconds(teams[0]['totalTime']) == pytest.approx(best, abs=0.01)
+
+def test_squadrun_legs_follow_positions(arena_swimmers):
+    legs = optimizer.relay_legs('Squadrun', 998, 'Mixed')
+    teams = optimizer.build_squadrun_relay([['Squadrun', 998, 'Mixed']], arena_swimmers, {})
+
+    assert [(leg['age_group'], leg['gender']) for leg in legs] == optimizer.SQUADRUN_POSITIONS
+    swimmers = teams[0]['swimmers']
+    assert len({swimmer['name'] for swimmer in swimmers}) == len(legs)
+    for leg, swimmer in zip(legs, swimmers):
+        relay_swimmer = arena_swimmers[swimmer['name']]
+        assert (swimmer['ageGroup'], swimmer['gender']) == (leg['age_group'], relay_swimmer.gender)
+        assert leg['max_age'] is None or relay_swimmer.age <= leg['max_age']
+
+def test_unknown_relay_is_logged(arena_swimmers, capsys):
+    plans = optimizer.build_relay_plans([['4x50m Breaststroke Relay', 11, 'Male']], arena_swimmers, {})
+
+    assert plans == []
+    assert 'Skipping 4x50m Breaststroke Relay 11 Male' in capsys.readouterr().err
+
+def test_relay_swimmer_times_by_slot():
+    rows = [
+        ['Ann', 'Lee', '50m Freestyle', 'Female', '11', '35.00', '1'],
+        ['Ann', 'Lee', '100m Backstroke', 'Female', '11', '90.50', '1'],
+        ['Ann', 'Lee', '50m Freestyle', 'Female', '11', '34.20', '1'],
+        ['Bob', 'Ray', '50m Butterfly', 'Male', '12', '40.00', '2'],
+        ['Cy', 'Dee', '100m Individual Medley', 'Male', '12', '80.00', '3'],
+    ]
+
+    relay_swimmers = optimizer.build_relay_swimmers(optimizer.build_swimmer_index(rows))
+
+    assert list(relay_swimmers) == ['Ann Lee', 'Bob Ray']
+    ann = relay_swimmers['Ann Lee']
+    assert (ann.age, ann.gender) == (11, 'Female')
+    # The later of two rows for a stroke wins
+    assert ann.times[optimizer.relay_time_slot('Freestyle', 50)] == 34.2
+    assert ann.times[optimizer.relay_time_slot('Backstroke', 100)] == 90.5
+    assert sum(time is not None for time in ann.times) == 2
+    assert not hasattr(ann, '__dict__')
+
+@pytest.fixture(scope='module')
+def squad_inputs():
+    return optimizer.parse_document(generate_club(80, 'arena_league', 6))
+
+def squads(result):
+    """{relay event: [(label, seconds, swimmer names)]} for labelled teams."""
+    grouped = {}
+    for team in result.relay:
+        event, _, label = team['relay'].rpartition(' ')
+        if label in tuple(optimizer.RELAY_TEAM_LABELS):
+            names = [swimmer['name'] for swimmer in team['swimmers']]
+            grouped.setdefault(event, []).append(
+                (label, optimizer.convert_to_seconds_with_milliseconds(team['totalTime']), names))
+    return grouped
+
+def test_squads_are_disjoint_and_ranked(squad_inputs):
+    swimmers, events, standards, pre_assignments, config = squad_inputs
+    result = optimizer.optimize(swimmers, events, standards, pre_assignments, dict(config, relayTeamsPerEvent=3))
+
+    grouped = squads(result)
+    assert any(len(teams) == 3 for teams in grouped.values())
+    for teams in grouped.values():
+        assert [label for label, _, _ in teams] == list('ABC'[:len(teams)])
+        names = [name for _, _, team in teams for name in team]
+        assert len(names) == len(set(names))
+        times = [seconds for _, seconds, _ in teams]
+        assert times == sorted(times)
+
+def test_squads_respect_joint_relay_cap(squad_inputs):
+    swimmers, events, standards, pre_assignments, config = squad_inputs
+    result = optimizer.optimize(swimmers, events, standards, pre_assignments,
+                                dict(config, solverMode='joint', maxRelayEvents=2, relayTeamsPerEvent=2))
+
+    legs = {}
+    for team in result.relay:
+        for swimmer in team['swimmers']:
+            legs[swimmer['name']] = legs.get(swimmer['name'], 0) + 1
+    assert max(legs.values()) <= 2
+    assert any(team['relay'].endswith(' B') for team in result.relay)
+
+def random_plans(rng):
+    names = [f'Swimmer {number}' for number in range(rng.randint(2, 5))]
+    plans = []
+    for event in range(rng.randint(1, 3)):
+        legs = rng.randint(1, 2)
+        candidates = [{name: rng.randint(25, 40) for name in names if rng.random() < 0.7} for _ in range(legs)]
+        reference, _ = optimizer.solve_leg_assignment(candidates)
+        if reference is not None:
+            plans.append({'event_name': f'Relay {event}', 'age': 11, 'gender': 'Male', 'legs': [{}] * legs,
+                          'fixed': {}, 'candidates': candidates, 'reference': reference})
+    return plans
+
+@pytest.mark.parametrize('seed', range(200))
+def test_global_relays_match_brute_force(seed):
+    rng = random.Random(seed)
+    plans = random_plans(rng)
+    max_relay = rng.randint(1, 2)
+
+    picks = optimizer.allocate_relays_global(plans, max_relay)
+
+    def cost(p, team):
+        return sum(round(plans[p]['candidates'][leg][name] / plans[p]['reference'] * 1000000)
+                   for leg, name in enumerate(team))
+
+    options = [[team for team in itertools.permutations(
+        {name for costs in plan['candidates'] for name in costs}, len(plan['legs']))
+        if all(name in costs for name, costs in zip(team, plan['candidates']))] for plan in plans]
+    feasible = [teams for teams in itertools.product(*options)
+                if all(sum(team.count(name) for team in teams) <= max_relay for team in teams for name in team)]
+    legs = {}
+    for team in picks.values():
+        for name in team or ():
+            legs[name] = legs.get(name, 0) + 1
+    assert all(count <= max_relay for count in legs.values())
+    if feasible:
+        # Every event can have a team within the cap, so the flow is exact
+        assert None not in picks.values()
+        assert sum(cost(p, team) for p, team in picks.items()) == min(
+            sum(cost(p, team) for p, team in enumerate(teams)) for teams in feasible)
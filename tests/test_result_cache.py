@@ -0,0 +1,66 @@
+"""Content-addressed result cache."""
+import os
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+@pytest.fixture
+def cache(tmp_path):
+    optimizer.configure_result_cache(['--cache-dir', str(tmp_path)], {})
+    yield optimizer.result_cache
+    optimizer.configure_result_cache([], {})
+
+@pytest.fixture(scope='module')
+def inputs():
+    return optimizer.parse_document(generate_club(40, 'arena_league', 12))
+
+def test_hit_returns_the_stored_result(cache, inputs):
+    first = optimizer.optimize(*inputs)
+    second = optimizer.optimize(*inputs)
+
+    assert (first.cache_hit, second.cache_hit) == (False, True)
+    assert second.individual == first.individual
+    assert second.relay == first.relay
+
+def test_timed_out_result_is_not_stored(cache, inputs):
+    swimmers, events, standards, pre_assignments, config = inputs
+    config = dict(config, timeLimitMs=0)
+
+    first = optimizer.optimize(swimmers, events, standards, pre_assignments, config)
+    second = optimizer.optimize(swimmers, events, standards, pre_assignments, config)
+
+    assert first.search['timedOut']
+    assert second.cache_hit is False
+
+def test_key_covers_every_input(inputs):
+    swimmers, events, standards, pre_assignments, config = inputs
+    key = optimizer.input_fingerprint(*inputs)
+    slower = [optimizer.SwimmerPB(**{**vars(swimmers[0]), 'time': swimmers[0].time + 0.01})] + swimmers[1:]
+
+    assert optimizer.input_fingerprint(*inputs) == key
+    assert optimizer.input_fingerprint(slower, events, standards, pre_assignments, config) != key
+    assert optimizer.input_fingerprint(swimmers, events[1:], standards, pre_assignments, config) != key
+    assert optimizer.input_fingerprint(swimmers, events, standards, pre_assignments, dict(config, maxIndividualEvents=1)) != key
+    assert optimizer.input_fingerprint(*inputs, relays=False) != key
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = optimizer.ResultCache(str(tmp_path))
+    for number, key in enumerate('abc'):
+        cache.put(key, {'individual': ['x' * 90], 'relay': []})
+        os.utime(cache.path(key), (number, number))
+    cache.max_bytes = 250  # room for two entries
+    assert cache.get('a') is not None  # refreshes 'a'
+
+    cache.put('d', {'individual': ['x' * 90], 'relay': []})
+
+    assert sorted(name for name in os.listdir(tmp_path)) == ['a.json', 'd.json']
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = optimizer.ResultCache(str(tmp_path))
+    with open(cache.path('broken'), 'w') as f:
+        f.write('{"individual": ')
+
+    assert cache.get('broken') is None
+    assert cache.get('missing') is None
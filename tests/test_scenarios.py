@@ -0,0 +1,50 @@
+"""Batched what-if scenarios."""
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+@pytest.fixture(scope='module')
+def inputs():
+    return optimizer.parse_document(generate_club(50, 'arena_league', 13))
+
+@pytest.fixture(scope='module')
+def scenarios(inputs):
+    base = optimizer.optimize(*inputs)
+    names = list(dict.fromkeys(entry['swimmer'] for entry in base.individual))[:3]
+    asa_by_name = {f'{row.first_name} {row.last_name}': row.asa_number for row in inputs[0]}
+    return [
+        {'name': 'drop three', 'delta': [{'op': 'removeSwimmer', 'swimmerId': asa_by_name[name]} for name in names]},
+        {'delta': []},
+    ]
+
+def test_rows_match_direct_solves(inputs, scenarios):
+    swimmers, events, standards, pre_assignments, config = inputs
+    base, rows = optimizer.evaluate_scenarios(*inputs, scenarios, max_workers=1)
+
+    assert [row['scenario'] for row in rows] == ['drop three', 'Scenario 2']
+    for scenario, row in zip(scenarios, rows):
+        changed, changed_pre, _ = optimizer.apply_delta(swimmers, pre_assignments, scenario['delta'])
+        result = optimizer.optimize(changed, events, standards, changed_pre, config)
+        assert {key: row[key] for key in optimizer.lineup_summary(result)} == optimizer.lineup_summary(result)
+        assert row['changes'] == optimizer.lineup_changes(base, result)
+    assert rows[1]['changes'] == [] and rows[1]['indexDelta'] == 0
+    assert rows[0]['changes']
+
+def test_process_pool_matches_serial(inputs, scenarios):
+    _, serial = optimizer.evaluate_scenarios(*inputs, scenarios, max_workers=1)
+    _, pooled = optimizer.evaluate_scenarios(*inputs, scenarios, max_workers=2)
+
+    assert pooled == serial
+
+def test_lineup_changes():
+    base = optimizer.OptimizationResult(individual=[{'event': 'E1', 'swimmer': 'Ann'}, {'event': 'E2', 'swimmer': 'Bob'}],
+                                        relay=[{'relay': 'R1', 'swimmers': [{'name': 'Ann'}, {'name': 'Cy'}]}])
+    scenario = optimizer.OptimizationResult(individual=[{'event': 'E1', 'swimmer': 'Di'}, {'event': 'E3', 'swimmer': 'Bob'}],
+                                            relay=[{'relay': 'R1', 'swimmers': [{'name': 'Ann'}, {'name': 'Cy'}]}])
+
+    assert optimizer.lineup_changes(base, scenario) == [
+        {'event': 'E1', 'before': 'Ann', 'after': 'Di'},
+        {'event': 'E2', 'before': 'Bob', 'after': None},
+        {'event': 'E3', 'before': None, 'after': 'Bob'},
+    ]
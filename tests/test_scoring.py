@@ -0,0 +1,54 @@
+"""NumPy index backend against the Python one."""
+import random
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+np = pytest.importorskip('numpy')
+
+def random_full_list(rng):
+    """Eligible entries with two-decimal times over one-decimal standards, so
+    many diffs / QT land on rounding ties."""
+    full_list = []
+    for number in range(rng.randint(0, 60)):
+        event = rng.choice([('50m Freestyle', 11, 'Male'), ('50m Backstroke', 13, 'Female'), ('100m Butterfly', 99, 'Male')])
+        full_list.append([*event, 'Swimmer', str(number), round(rng.uniform(25, 95), 2), str(number)])
+    return full_list
+
+def random_standards(rng):
+    standards = {}
+    for event in [('50m Freestyle', 11, 'Male'), ('50m Backstroke', 13, 'Female')]:
+        if rng.random() < 0.8:
+            standards[(*event, None, 'QT')] = round(rng.uniform(28, 60), 1)
+    return standards
+
+@pytest.mark.parametrize('seed', range(100))
+def test_backends_agree(seed):
+    rng = random.Random(seed)
+    full_list, standards = random_full_list(rng), random_standards(rng)
+    python_rows = [list(row) for row in full_list]
+    numpy_rows = [list(row) for row in full_list]
+
+    optimizer.score_entries(python_rows, standards)
+    optimizer.score_entries_columnar(numpy_rows, standards)
+
+    assert numpy_rows == python_rows
+
+def test_round_columns_matches_round():
+    rng = random.Random(0)
+    values = [rng.randint(-5000, 5000) / 1000 + rng.choice([0, 0.0005, -0.0005]) for _ in range(5000)]
+
+    rounded = optimizer.round_columns(np.array(values), 3).tolist()
+
+    assert rounded == [round(value, 3) for value in values]
+
+def test_optimize_backends_agree():
+    inputs = optimizer.parse_document(generate_club(100, 'custom', 11))
+    swimmers, events, standards, pre_assignments, config = inputs
+
+    python_result = optimizer.optimize(swimmers, events, standards, pre_assignments, dict(config, indexBackend='python'))
+    numpy_result = optimizer.optimize(swimmers, events, standards, pre_assignments, dict(config, indexBackend='numpy'))
+
+    assert numpy_result.to_dict() == python_result.to_dict()
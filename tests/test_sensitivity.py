@@ -0,0 +1,42 @@
+"""Leave-one-out sensitivity report."""
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+@pytest.fixture(scope='module')
+def inputs():
+    return optimizer.parse_document(generate_club(60, 'arena_league', 2))
+
+def without(swimmers, name):
+    return [swimmer for swimmer in swimmers if f'{swimmer.first_name} {swimmer.last_name}' != name]
+
+def test_rows_match_full_solves(inputs):
+    swimmers, events, standards, pre_assignments, config = inputs
+    base, rows = optimizer.sensitivity_report(*inputs, max_workers=1)
+
+    base_summary = optimizer.lineup_summary(base)
+    for row in rows[:5]:
+        result = optimizer.optimize(without(swimmers, row['swimmer']), events, standards, pre_assignments, config)
+        summary = optimizer.lineup_summary(result)
+        index_loss, relay_time_loss = optimizer.shared_losses(base, result)
+        assert row['individualEventsLost'] == base_summary['individualEvents'] - summary['individualEvents']
+        assert row['relayTeamsLost'] == base_summary['relayTeams'] - summary['relayTeams']
+        assert row['indexLoss'] == index_loss
+        assert row['relayTimeLoss'] == relay_time_loss
+
+def test_rows_are_ranked(inputs):
+    _, rows = optimizer.sensitivity_report(*inputs, max_workers=1)
+
+    keys = [(-(row['individualEventsLost'] + row['relayTeamsLost']), -row['indexLoss'], -row['relayTimeLoss'])
+            for row in rows]
+    assert keys == sorted(keys)
+
+def test_individual_part_builds_no_relays(inputs):
+    swimmers, events, standards, pre_assignments, config = inputs
+    individual = [event for event in events if not optimizer.is_relay_event(event[0])]
+
+    result = optimizer.optimize(swimmers, individual, standards, None, config, relays=False)
+
+    assert result.relay == []
+    assert result.individual == optimizer.optimize(swimmers, individual, standards, None, config).individual
@@ -0,0 +1,70 @@
+"""LineupSession delta handling."""
+import copy
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+def relay_names(result):
+    return {swimmer['name'] for team in result.relay for swimmer in team['swimmers']}
+
+@pytest.fixture(scope='module')
+def document():
+    return generate_club(60, 'arena_league', 0)
+
+def test_session_removes_swimmer_from_fallback_relays(document):
+    # With no relay events listed, solve_lineup still builds the default 4x50m relays
+    events = [event for event in document['events'] if 'Individual Medley' in event[0]]
+    swimmers, _, standards, pre_assignments, config = optimizer.parse_document(document)
+    session = optimizer.LineupSession(swimmers, events, standards, pre_assignments, config)
+    assert session.result.relay
+
+    individual = {entry['swimmer'] for entry in session.result.individual}
+    name = sorted(relay_names(session.result) - individual)[0]
+    swimmer = next(row for row in swimmers if f'{row.first_name} {row.last_name}' == name)
+    result = session.apply([{'op': 'removeSwimmer', 'swimmerId': swimmer.asa_number}])
+
+    assert name not in relay_names(result)
+
+def test_session_delta_matches_full_solve(document):
+    session = optimizer.LineupSession(*optimizer.parse_document(document))
+    name = session.result.individual[0]['swimmer']
+    swimmer = next(row for row in session.swimmers if f'{row.first_name} {row.last_name}' == name)
+
+    result = session.apply([{'op': 'removeSwimmer', 'swimmerId': swimmer.asa_number}])
+
+    swimmers, events, standards, pre_assignments, config = optimizer.parse_document(document)
+    swimmers = [row for row in swimmers if row.asa_number != swimmer.asa_number]
+    expected = optimizer.optimize(swimmers, events, standards, pre_assignments, config)
+    assert result.individual == expected.individual
+    assert result.relay == expected.relay
+
+def test_session_skips_no_op_delta(document):
+    session = optimizer.LineupSession(*optimizer.parse_document(document))
+    swimmer = session.swimmers[0]
+    before = session.result
+
+    result = session.apply([{'op': 'setTime', 'swimmerId': swimmer.asa_number, 'event': swimmer.event,
+                             'time': swimmer.time}])
+
+    assert result is before
+
+def test_session_delta_is_atomic(document):
+    session = optimizer.LineupSession(*optimizer.parse_document(document))
+    swimmers, pre_assignments, result = list(session.swimmers), copy.deepcopy(session.pre_assignments), session.result
+    name = sorted(relay_names(result))[0]
+    swimmer = next(row for row in swimmers if f'{row.first_name} {row.last_name}' == name)
+    delta = [
+        {'op': 'removeSwimmer', 'swimmerId': swimmer.asa_number},
+        {'op': 'addPreAssignment', 'individual': {'swimmerId': swimmer.asa_number, 'event': '50m Freestyle',
+                                                  'ageCategory': 11, 'gender': 'Male'}},
+        {'op': 'renameSwimmer'},
+    ]
+
+    with pytest.raises(optimizer.DeltaError):
+        session.apply(delta)
+
+    assert session.swimmers == swimmers
+    assert session.pre_assignments == pre_assignments
+    assert session.result is result
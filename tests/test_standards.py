@@ -0,0 +1,41 @@
+"""County standards index and its compiled fallback rules."""
+import optimizer
+
+HEADER = 'Event,Time,Age Category,Course,Time Type,Gender'
+
+def standards(*rows):
+    return optimizer.build_county_standards([HEADER, *rows])
+
+def test_open_uses_age_17():
+    index = standards('50m Freestyle,00:00:28.50,17,SC,QT,Male', '50m Freestyle,00:00:30.10,16,SC,QT,Male')
+
+    assert optimizer.county_standard(index, '50m Freestyle', 99, 'Male') == 28.5
+    assert optimizer.county_standard(index, '50m Freestyle', 99, 'Female') is None
+
+def test_own_open_standard_wins():
+    index = standards('50m Freestyle,00:00:28.50,17,SC,QT,Male', '50m Freestyle,00:00:27.90,99,SC,QT,Male')
+
+    assert optimizer.county_standard(index, '50m Freestyle', 99, 'Male') == 27.9
+
+def test_ten_and_under_use_age_11():
+    index = standards('50m Backstroke,00:00:40.00,11,SC,QT,Female', '50m Backstroke,00:00:44.00,9,SC,QT,Female')
+
+    assert optimizer.county_standard(index, '50m Backstroke', 10, 'Female') == 40.0
+    assert optimizer.county_standard(index, '50m Backstroke', 9, 'Female') == 44.0
+    assert optimizer.county_standard(index, '50m Backstroke', 12, 'Female') is None
+
+def test_course_and_time_type():
+    index = standards('100m Breaststroke,00:01:30.00,13,LC,QT,Male', '100m Breaststroke,00:01:25.00,13,SC,QT,Male',
+                      '100m Breaststroke,00:01:35.00,13,SC,CT,Male', '100m Breaststroke,,13,SC,QT,Female')
+
+    assert optimizer.county_standard(index, '100m Breaststroke', 13, 'Male', course='SC') == 85.0
+    # An unknown course compares with the first row in the file
+    assert optimizer.county_standard(index, '100m Breaststroke', 13, 'Male') == 90.0
+    assert optimizer.county_standard(index, '100m Breaststroke', 13, 'Male', 'CT') == 95.0
+    assert optimizer.county_standard(index, '100m Breaststroke', 13, 'Female') is None
+
+def test_qualifying_status():
+    assert optimizer.qualifying_status(29.0, 29.5, 31.0) == 'QT'
+    assert optimizer.qualifying_status(30.0, 29.5, 31.0) == 'CT'
+    assert optimizer.qualifying_status(32.0, 29.5, 31.0) is None
+    assert optimizer.qualifying_status(30.0, None, None) is None
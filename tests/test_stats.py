@@ -0,0 +1,75 @@
+"""Phase timings and work counters (``collectStats``)."""
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+@pytest.fixture(scope='module')
+def document():
+    return generate_club(60, 'arena_league', 14)
+
+def test_no_stats_by_default(document):
+    result = optimizer.optimize_document(document)
+
+    assert result.stats is None
+    assert 'stats' not in result.to_dict()
+
+def test_stats_do_not_change_the_lineup(document):
+    plain = optimizer.optimize_document(document)
+    result = optimizer.optimize_document(dict(document, config=dict(document['config'], collectStats=True)))
+
+    assert result.individual == plain.individual
+    assert result.relay == plain.relay
+    assert set(result.stats) == {'timings', 'counters'}
+    assert {'parse', 'eligibility', 'standards', 'preAssignments', 'relaySwimmers', 'individual', 'relays',
+            'results', 'total'} <= set(result.stats['timings'])
+    assert all(ms >= 0 for ms in result.stats['timings'].values())
+    assert result.stats['timings']['total'] >= sum(ms for phase, ms in result.stats['timings'].items()
+                                                   if phase != 'total') - 0.01
+
+def test_counters(document):
+    swimmers, events, standards, pre_assignments, config = optimizer.parse_document(document)
+
+    result = optimizer.optimize(swimmers, events, standards, pre_assignments, dict(config, collectStats=True))
+
+    counters = result.stats['counters']
+    assert counters['swimmerRows'] == len(swimmers)
+    assert counters['eligibleEntries'] > 0
+    assert counters['relaySwimmers'] > 0
+    assert counters['relayAssignments'] > 0
+    assert counters['relayCandidates'] >= counters['relayCandidatesPruned'] >= 0
+
+def test_relay_counters_without_relays(document):
+    swimmers, events, standards, pre_assignments, config = optimizer.parse_document(document)
+
+    result = optimizer.optimize(swimmers, events, standards, pre_assignments, dict(config, collectStats=True),
+                                relays=False)
+
+    assert result.relay == []
+    assert 'relayAssignments' not in result.stats['counters']
+
+def test_run_stats_lap_and_count(monkeypatch):
+    clock = iter([10.0, 10.002, 10.005, 10.006, 10.010])
+    monkeypatch.setattr(optimizer, 'perf_counter', lambda: next(clock))
+    stats = optimizer.RunStats()
+
+    stats.lap('parse')
+    stats.lap('individual')
+    stats.lap('parse')
+    stats.count('flowSearches')
+    stats.count('flowSearches', 2)
+
+    assert stats.to_dict() == {'timings': {'parse': 3.0, 'individual': 3.0, 'total': 10.0},
+                               'counters': {'flowSearches': 3}}
+
+def test_nested_collection_adds_to_the_outer_one():
+    stats = optimizer.RunStats()
+
+    with optimizer.collecting_stats({}, stats) as outer:
+        with optimizer.collecting_stats({'collectStats': True}) as inner:
+            optimizer.stats_count('rowsRead', 4)
+        optimizer.stats_count('rowsRead')
+
+    assert outer is inner is stats
+    assert stats.counters == {'rowsRead': 5}
+    assert optimizer.run_stats is None
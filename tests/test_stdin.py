@@ -0,0 +1,43 @@
+"""One-shot runs from an input document on stdin."""
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server')
+
+def run_stdin(text):
+    return subprocess.run([sys.executable, 'optimizer.py', '--stdin'], input=text, cwd=SERVER,
+                          capture_output=True, text=True)
+
+@pytest.mark.parametrize('text, message', [
+    ('{"memberPbs": ', 'Invalid input document: '),
+    ('[]', 'Invalid input document: missing memberPbs, countyTimes, events'),
+    ('{"memberPbs": "", "events": []}', 'Invalid input document: missing countyTimes'),
+])
+def test_read_input_document_errors(text, message):
+    document, error = optimizer.read_input_document(io.StringIO(text))
+
+    assert document is None
+    assert error.startswith(message)
+
+def test_stdin_run_matches_optimize_document():
+    document = generate_club(30, 'county_relays', 10)
+
+    run = run_stdin(json.dumps(document))
+
+    assert run.returncode == 0
+    assert json.loads(run.stdout) == optimizer.optimize_document(document).to_dict()
+    assert not os.path.exists(os.path.join(SERVER, 'member_pbs.csv'))
+
+def test_stdin_error_is_a_document():
+    run = run_stdin('{"events": []}')
+
+    assert run.returncode == 1
+    assert json.loads(run.stdout)['error'] == 'Invalid input document: missing memberPbs, countyTimes'
@@ -0,0 +1,64 @@
+"""Seeded synthetic clubs and the benchmark regression check."""
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import optimizer
+from benchmarks import run
+from benchmarks.synthetic import CONFIGS, MEMBER_PBS_HEADER, generate_club, write_club
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server', 'optimizer.py')
+
+def test_same_seed_same_club():
+    assert generate_club(60, 'custom', 4) == generate_club(60, 'custom', 4)
+    assert generate_club(60, 'custom', 4) != generate_club(60, 'custom', 5)
+
+def test_unknown_competition():
+    with pytest.raises(ValueError, match="Unknown competition 'gala'"):
+        generate_club(10, 'gala')
+
+@pytest.mark.parametrize('competition', sorted(CONFIGS))
+def test_document_parses(competition):
+    document = generate_club(80, competition, 1)
+
+    swimmers, events, standards, pre_assignments, config = optimizer.parse_document(document)
+
+    assert config == CONFIGS[competition]
+    assert len(events) == len(document['events'])
+    assert 0 < len({row.asa_number for row in swimmers}) <= 80  # unavailable swimmers are dropped
+    assert all(8 <= row.age <= 18 for row in swimmers)
+    assert standards and pre_assignments == {'individual': [], 'relay': []}
+
+def test_member_pbs_rows():
+    rows = list(csv.reader(io.StringIO(generate_club(25, 'arena_league', 2)['memberPbs'])))
+    events_by_swimmer = {}
+    for row in rows[1:]:
+        events_by_swimmer.setdefault(row[2], set()).add(row[6])
+
+    assert rows[0] == MEMBER_PBS_HEADER
+    assert len(events_by_swimmer) == 25
+    assert all(4 <= len(events) <= 12 for events in events_by_swimmer.values())
+
+def test_written_club_matches_document(tmp_path):
+    document = generate_club(30, 'arena_league', 3)
+    write_club(str(tmp_path), document)
+
+    files = subprocess.run([sys.executable, SCRIPT], cwd=tmp_path, capture_output=True, text=True, check=True)
+
+    assert json.loads(files.stdout) == optimizer.optimize_document(document).to_dict()
+
+def case(phase_ms, competition='custom', swimmers=50):
+    return {'competition': competition, 'swimmers': swimmers,
+            'timings': {phase: {'min': ms, 'median': ms} for phase, ms in phase_ms.items()}}
+
+def test_compare_flags_only_real_regressions():
+    baseline = {'results': [case({'individual': 10.0, 'relays': 0.2, 'total': 20.0})]}
+    results = {'results': [case({'individual': 12.5, 'relays': 0.9, 'total': 23.0}),
+                           case({'individual': 99.0}, swimmers=200)]}
+
+    assert run.compare(results, baseline) == ['custom 50 individual: 10.0 -> 12.5 ms (1.25x)']
@@ -0,0 +1,97 @@
+"""timeLimitMs: the anytime individual solver, the joint search under a
+deadline and alternatives ranked against the returned line-up."""
+import random
+from time import perf_counter
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+def solve(document, **config):
+    swimmers, events, standards, pre_assignments, base_config = optimizer.parse_document(document)
+    return optimizer.solve_lineup(swimmers, events, standards, pre_assignments, dict(base_config, **config))
+
+def event_counts(result):
+    counts = {}
+    for entry in result.individual:
+        counts[entry['swimmer']] = counts.get(entry['swimmer'], 0) + 1
+    return counts
+
+@pytest.fixture(scope='module')
+def document():
+    return generate_club(80, 'arena_league', 1)
+
+def test_generous_limit_matches_unbounded_solver(document):
+    unbounded = solve(document)
+    result = solve(document, timeLimitMs=60000)
+
+    assert result.individual == unbounded.individual
+    assert result.search['method'] in ('exact', 'greedy')
+    assert result.search['optimal'] and result.search['gap'] == 0
+    assert unbounded.search is None
+
+def test_expired_limit_returns_feasible_greedy_lineup(document):
+    result = solve(document, timeLimitMs=0)
+
+    assert result.search['timedOut']
+    assert result.search['method'] == 'greedy'
+    assert result.search['lowerBound'] is None and result.search['gap'] is None
+    assert result.individual
+    assert max(event_counts(result).values()) <= 2
+
+def test_expired_limit_in_joint_mode_returns_greedy_start(document):
+    result = solve(document, solverMode='joint', timeLimitMs=0, maxTotalEvents=3)
+
+    assert result.search['timedOut'] and result.search['lowerBound'] is None
+    assert result.individual and result.relay
+    loads = event_counts(result)
+    for team in result.relay:
+        for swimmer in team['swimmers']:
+            loads[swimmer['name']] = loads.get(swimmer['name'], 0) + 1
+    assert max(loads.values()) <= 3
+
+def test_alternatives_rank_against_returned_lineup(document):
+    result = solve(document, alternatives=3, timeLimitMs=60000)
+
+    chosen = {entry['event']: entry['swimmer'] for entry in result.individual}
+    assert len(result.alternatives) == 3
+    for row in result.alternatives:
+        assert row['indexDelta'] >= 0
+        assert all(chosen.get(change['event']) == change['before'] for change in row['changes'])
+
+def test_alternatives_skipped_when_lineup_unproven(document):
+    result = solve(document, alternatives=3, timeLimitMs=0)
+
+    assert not result.search['optimal']
+    assert result.alternatives is None
+
+@pytest.mark.parametrize('seed', range(100))
+def test_improve_lineup_keeps_caps_and_never_worsens(seed):
+    rng = random.Random(seed)
+    names = [f'Swimmer {number}' for number in range(rng.randint(2, 6))]
+    slots_by_key = {}
+    slot_count = 0
+    for event_key in rng.sample(range(8), rng.randint(2, 6)):
+        rows = rng.randint(1, 2)
+        slots_by_key[event_key] = list(range(slot_count, slot_count + rows))
+        slot_count += rows
+    best_cost = {(name, event_key): rng.randint(900, 1200)
+                 for name in names for event_key in slots_by_key if rng.random() < 0.6}
+    capacities = {name: rng.randint(1, 2) for name in names}
+    slot_keys = {slot: event_key for event_key, slots in slots_by_key.items() for slot in slots}
+    assignment = optimizer.extend_greedily({}, slots_by_key, best_cost, capacities)
+    unfilled_cost = optimizer.default_unfilled_cost(list(best_cost.values()), slot_count)
+
+    def cost(lineup):
+        return (sum(best_cost[(name, slot_keys[slot])] for slot, name in lineup.items())
+                + (slot_count - len(lineup)) * unfilled_cost)
+
+    before = cost(assignment)
+    optimizer.improve_lineup(assignment, slots_by_key, best_cost, capacities, unfilled_cost, perf_counter() + 10)
+
+    assert cost(assignment) <= before
+    assert all((name, slot_keys[slot]) in best_cost for slot, name in assignment.items())
+    assert all(list(assignment.values()).count(name) <= capacities[name] for name in capacities)
+    _, optimum = optimizer.solve_individual_flow(slot_count, slots_by_key, best_cost, capacities, unfilled_cost)
+    assert cost(assignment) >= optimum
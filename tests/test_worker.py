@@ -0,0 +1,61 @@
+"""JSON-RPC worker: framing, errors and kept sessions."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import optimizer
+from benchmarks.synthetic import generate_club
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server', 'optimizer.py')
+
+@pytest.fixture(scope='module')
+def document():
+    return generate_club(40, 'arena_league', 9)
+
+def call(worker, method, params=None, request_id=1):
+    return worker.handle(json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}))
+
+def test_optimize_matches_optimize_document(document):
+    worker = optimizer.OptimizerWorker()
+
+    response = call(worker, 'optimize', document)
+
+    assert response == {'jsonrpc': '2.0', 'id': 1, 'result': optimizer.optimize_document(document).to_dict()}
+    assert call(worker, 'ping')['result'] == {'standardsCached': 1, 'sessions': 0}
+
+@pytest.mark.parametrize('line, code', [
+    ('{not json', optimizer.RPC_PARSE_ERROR),
+    ('[1, 2]', optimizer.RPC_INVALID_REQUEST),
+    ('{"id": 1, "method": "solve"}', optimizer.RPC_METHOD_NOT_FOUND),
+    ('{"id": 1, "method": "optimize", "params": [1]}', optimizer.RPC_INVALID_PARAMS),
+    ('{"id": 1, "method": "optimize", "params": {"memberPbs": ""}}', optimizer.RPC_INVALID_PARAMS),
+    ('{"id": 1, "method": "reoptimize", "params": {"session": "team_1", "delta": []}}', optimizer.RPC_UNKNOWN_SESSION),
+])
+def test_errors(line, code):
+    assert optimizer.OptimizerWorker().handle(line)['error']['code'] == code
+
+def test_session_delta(document):
+    worker = optimizer.OptimizerWorker()
+    call(worker, 'optimize', dict(document, session='team_1'))
+    asa_number = optimizer.parse_document(document)[0][0].asa_number
+
+    result = call(worker, 'reoptimize', {'session': 'team_1', 'delta': [{'op': 'removeSwimmer', 'swimmerId': asa_number}]})
+    bad = call(worker, 'reoptimize', {'session': 'team_1', 'delta': [{'op': 'renameSwimmer'}]})
+
+    assert worker.sessions.keys() == {'team_1'}
+    swimmers, events, standards, pre_assignments, config = optimizer.parse_document(document)
+    expected = optimizer.optimize([row for row in swimmers if row.asa_number != asa_number], events, standards,
+                                  pre_assignments, config)
+    assert result['result'] == expected.to_dict()
+    assert bad['error']['code'] == optimizer.RPC_INVALID_PARAMS
+
+def test_serve_answers_each_line():
+    requests = [{'jsonrpc': '2.0', 'id': number, 'method': 'ping'} for number in range(3)]
+    stdin = '\n'.join(json.dumps(request) for request in requests) + '\n\n'
+
+    run = subprocess.run([sys.executable, SCRIPT, '--worker'], input=stdin, capture_output=True, text=True, check=True)
+
+    assert [json.loads(line)['id'] for line in run.stdout.splitlines()] == [0, 1, 2]